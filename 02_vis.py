@@ -1,12 +1,36 @@
+import gzip
+import hashlib
 import json
 import os
 import html
+import re
+
+import graph_codec
+import graph_edges
+import profiling
+import schema
+import span_align
+import text_index
+from doc_loader import DocStore
+from graph_edges import infer_edges, settings as edge_settings
+from schema import SCHEMA_FIELDS, canonical_class, primary_cause_of
+from span_align import align_document, is_aligned
 
 def _truncate(s, n=40):
     s = str(s or "")
     return s if len(s) <= n else s[:n-1] + "…"
 
-def build_graph_from_extractions(extractions):
+# 규칙: data/graph_schema.json과 같은 클래스 연결 (라벨 없음)
+FALLBACK_EDGE_RULES = [
+    {"from": "Condition", "to": "Human_Action"},
+    {"from": "Procedure_or_Regulation", "to": "Human_Action"},
+    {"from": "Human_Action", "to": "Outcome"},
+    {"from": "Cause", "to": "Outcome"},
+    {"from": "CorrectiveAction", "to": "Procedure_or_Regulation"},
+    {"from": "CorrectiveAction", "to": "Outcome"},
+]
+
+def build_graph_from_extractions(extractions, text=None):
     """
     Extractions만으로 간단 그래프 생성:
       Condition → Human_Action
@@ -14,14 +38,14 @@ def build_graph_from_extractions(extractions):
       Human_Action → Outcome
       Cause → Outcome
       CorrectiveAction → Procedure_or_Regulation (없으면 Outcome)
+    GRAPH_EDGES=proximity: 같은 문장 / 가까운 span끼리만 연결 (graph_edges.py, `text`로 문장 구분)
     """
-    nodes, edges = [], []
+    nodes = []
     by_cls = {}
+    spans = {}
     # 노드: 추출 항목 하나당 1개
     for idx, e in enumerate(extractions or []):
-        cls = e.get("extraction_class") or "Unknown"
-        if cls == "Corrective_Action":
-            cls = "CorrectiveAction"
+        cls = canonical_class(e.get("extraction_class")) or e.get("extraction_class") or "Unknown"
         node_id = f"e{idx}"
         label = _truncate(e.get("extraction_text") or e.get("text") or "")
         title = (e.get("extraction_text") or "")  # 툴팁
@@ -32,31 +56,16 @@ def build_graph_from_extractions(extractions):
             "title": title
         })
         by_cls.setdefault(cls, []).append(node_id)
-
-    def connect(src_cls, dst_cls):
-        for s in by_cls.get(src_cls, []):
-            for d in by_cls.get(dst_cls, []):
-                edges.append({"from": s, "to": d})
+        ci = e.get("char_interval") or {}
+        if ci.get("start_pos") is not None and ci.get("end_pos") is not None:
+            spans[node_id] = (int(ci["start_pos"]), int(ci["end_pos"]))
 
     # 규칙 연결
-    connect("Condition", "Human_Action")
-    connect("Procedure_or_Regulation", "Human_Action")
-    connect("Human_Action", "Outcome")
-    connect("Cause", "Outcome")
-    if by_cls.get("CorrectiveAction"):
-        if by_cls.get("Procedure_or_Regulation"):
-            connect("CorrectiveAction", "Procedure_or_Regulation")
-        else:
-            connect("CorrectiveAction", "Outcome")
-
+    edges = infer_edges(by_cls, spans, FALLBACK_EDGE_RULES, text, labels=False)
     return {"nodes": nodes, "edges": edges}
 
 
-def create_visualization_html(jsonl_path, html_output_path):
-    """
-    LER 시각화 HTML 생성 (Text / Graph 라디오 토글은 네비게이션 위로 분리, Lock 버튼 제거)
-    """
-    html_template = """
+HTML_TEMPLATE = """
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -72,6 +81,8 @@ def create_visualization_html(jsonl_path, html_output_path):
             .document-container { border:1px solid #e0e0e0; border-radius:6px; padding:15px; margin-bottom:20px; background:#fff; display:none; }
             .metadata { font-size:.9em; margin-bottom:12px; padding-bottom:10px; border-bottom:1px solid #eee; }
             .metadata span { font-weight:bold; color:#555; }
+            .metadata span.similar { font-weight:normal; }
+            .metadata .similar a, .metadata .similar i { margin-right:10px; }
 
             .view-controls { display:flex; align-items:center; justify-content:center; gap:14px; margin:8px 0 10px; }
             .view-controls label { font-size:0.95em; }
@@ -162,6 +173,7 @@ def create_visualization_html(jsonl_path, html_output_path):
             if (el) el.checked = true;
           }
 
+{graph_decoder}
           function drawGraph(container, graphData) {
             if (!container || !graphData || !Array.isArray(graphData.nodes)) return;
             if (networks[container.id]) return;
@@ -189,9 +201,12 @@ def create_visualization_html(jsonl_path, html_output_path):
             setRadioView(tabName);
             if (tabName === 'graph') {
               const graphContainer = doc.querySelector('.graph-container');
-              if (graphContainer && graphContainer.dataset.graph) {
+              if (graphContainer && (graphContainer.dataset.graphz || graphContainer.dataset.graph)) {
                 try {
-                  const graphData = JSON.parse(graphContainer.dataset.graph);
+                  const textEl = doc.querySelector('.text-content');
+                  const graphData = graphContainer.dataset.graphz
+                    ? decodeGraph(JSON.parse(graphContainer.dataset.graphz), textEl ? textEl.textContent : '')
+                    : JSON.parse(graphContainer.dataset.graph);
                   drawGraph(graphContainer, graphData);
                 } catch(e) {}
               }
@@ -269,31 +284,42 @@ def create_visualization_html(jsonl_path, html_output_path):
               });
             });
 
-            if (documents.length > 0) { showDocument(currentIndex); }
+            // #ler-<number>: open that document (links from "Similar LERs")
+            function showFromHash() {
+              const m = decodeURIComponent(location.hash || '').match(/^#ler-(.+)$/);
+              if (!m) return false;
+              const idx = Array.prototype.findIndex.call(documents, d => d.dataset.ler === m[1]);
+              if (idx < 0) return false;
+              currentIndex = idx;
+              showDocument(currentIndex);
+              return true;
+            }
+            window.addEventListener('hashchange', showFromHash);
+            if (documents.length > 0 && !showFromHash()) { showDocument(currentIndex); }
           });
         </script>
     </body>
     </html>
     """
 
-    all_docs_html = []
-
-    extraction_classes = {
-        "Condition": "#d1e9f7",
-        "Procedure_or_Regulation": "#d1f7e9",
-        "Human_Action": "#e9d1f7",
-        "Outcome": "#f7d1d1",
-        "Cause": "#f7f1d1",
-        "CorrectiveAction": "#d1f7f7",
-    }
+EXTRACTION_CLASSES = {
+    "Condition": "#d1e9f7",
+    "Procedure_or_Regulation": "#d1f7e9",
+    "Human_Action": "#e9d1f7",
+    "Outcome": "#f7d1d1",
+    "Cause": "#f7f1d1",
+    "CorrectiveAction": "#d1f7f7",
+}
 
+def legend_html():
     legend_items_html = "".join(
-        [f'<li style="background:{color}">{cls.replace("_"," ")}</li>' for cls, color in extraction_classes.items()]
+        [f'<li style="background:{color}">{cls.replace("_"," ")}</li>' for cls, color in EXTRACTION_CLASSES.items()]
     )
-    legend_html = f'<div class="legend"><h3>Highlights Legend</h3><ul>{legend_items_html}</ul></div>'
-        # --- graph.json 불러오기 (LER → graph 매핑) ---
+    return f'<div class="legend"><h3>Highlights Legend</h3><ul>{legend_items_html}</ul></div>'
+
+def load_graph_index(graph_json_path='graph.json'):
+    """graph.json 불러오기 (LER → graph 매핑)"""
     graph_index = {}
-    graph_json_path = 'graph.json'
     if os.path.exists(graph_json_path):
         try:
             with open(graph_json_path, 'r', encoding='utf-8') as gf:
@@ -305,106 +331,514 @@ def create_visualization_html(jsonl_path, html_output_path):
                         graph_index[str(ler_id)] = gobj
         except Exception:
             graph_index = {}
+    return graph_index
+
+# ---------------------------
+# corpus dashboard (analyze.py → dashboard.json)
+# ---------------------------
+DASHBOARD_PATH = os.path.join("out_extracted_code", "dashboard.json")
+
+DASHBOARD_TEMPLATE = """
+<details class="dashboard" open>
+  <summary>Corpus Dashboard</summary>
+  <style>
+    .dashboard { margin:0 0 16px; padding:12px 15px; background:#f9f9f9; border:1px solid #e6e6e6; border-radius:6px; font-size:.88em; }
+    .dashboard summary { cursor:pointer; font-weight:700; color:#555; font-size:1.1em; }
+    .dash-filters { display:flex; gap:14px; align-items:center; flex-wrap:wrap; margin:10px 0; }
+    .dash-filters select { max-width:260px; }
+    .dash-grid { display:grid; grid-template-columns:repeat(auto-fit, minmax(320px, 1fr)); gap:14px; }
+    .dash-grid h4 { margin:0 0 6px; color:#555; }
+    .dash-bar { display:flex; align-items:center; gap:6px; margin:2px 0; }
+    .dash-bar .lab { width:170px; overflow:hidden; text-overflow:ellipsis; white-space:nowrap; }
+    .dash-bar .bar { height:12px; background:#377cf5; border-radius:2px; }
+    .dash-table { border-collapse:collapse; font-size:.92em; }
+    .dash-table th, .dash-table td { border:1px solid #e6e6e6; padding:3px 6px; text-align:right; }
+    .dash-table th:first-child, .dash-table td:first-child { text-align:left; }
+    .dash-legend span { display:inline-block; margin-right:10px; }
+    .dash-muted { color:#888; }
+  </style>
+  <div class="dash-filters">
+    <label>Facility <select id="dash-facility"><option value="-2">All</option></select></label>
+    <label>Event year <select id="dash-year"><option value="-2">All</option></select></label>
+    <span id="dash-total" class="dash-muted"></span>
+  </div>
+  <div class="dash-grid">
+    <div><h4>Cause categories</h4><div id="dash-cats"></div></div>
+    <div><h4>Monthly trend (top 5 categories)</h4><svg id="dash-trend" viewBox="0 0 420 170" width="100%"></svg><div id="dash-trend-legend" class="dash-legend"></div></div>
+    <div><h4>Category × System category</h4><div id="dash-heat"></div></div>
+    <div><h4>System-category concentration (HHI)</h4><div id="dash-hhi"></div></div>
+  </div>
+  <script type="application/json" id="dashboard-data">{dashboard_data}</script>
+  <script>
+  (function () {
+    const D = JSON.parse(document.getElementById('dashboard-data').textContent);
+    const L = D.labels, ALL = -2;
+    const COLORS = ['#377cf5', '#e8590c', '#2f9e44', '#ae3ec9', '#f08c00'];
+    const fSel = document.getElementById('dash-facility'), ySel = document.getElementById('dash-year');
+    L.facility.forEach((f, i) => fSel.add(new Option(f, i)));
+    L.year.forEach((y, i) => ySel.add(new Option(y, i)));
+    const monthYear = L.month.map(m => L.year.indexOf(m.slice(0, 4)));
+    const esc = s => String(s).replace(/[&<>"]/g, c => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'}[c]));
+
+    // rows are [facility, year|month, ..., count]; sums the counts of the rows passing the filter by key
+    function sum(rows, yearOf, key) {
+      const f = +fSel.value, y = +ySel.value, out = {};
+      rows.forEach(r => {
+        if ((f === ALL || r[0] === f) && (y === ALL || yearOf(r) === y)) {
+          const k = key(r);
+          out[k] = (out[k] || 0) + r[r.length - 1];
+        }
+      });
+      return out;
+    }
+    const top = (counts, n) => Object.keys(counts).sort((a, b) => counts[b] - counts[a] || a - b).slice(0, n);
+
+    function renderCats() {
+      const c = sum(D.cat_counts, r => r[1], r => r[2]);
+      const keys = top(c, L.category.length), max = Math.max(1, ...keys.map(k => c[k]));
+      const total = keys.reduce((a, k) => a + c[k], 0);
+      document.getElementById('dash-total').textContent = total + ' Cause extractions';
+      document.getElementById('dash-cats').innerHTML = keys.map(k =>
+        '<div class="dash-bar"><span class="lab" title="' + esc(L.category[k]) + '">' + esc(L.category[k]) + '</span>'
+        + '<span class="bar" style="width:' + (200 * c[k] / max).toFixed(1) + 'px"></span><span>' + c[k] + '</span></div>'
+      ).join('') || '<span class="dash-muted">No data</span>';
+    }
 
-    with open(jsonl_path, 'r', encoding='utf-8') as f:
-        for i, line in enumerate(f):
-            if not line.strip():
-                continue
-            doc = json.loads(line)
-
-            facility_name = doc.get("Facility_Name", "N/A")
-            unit = doc.get("Unit", "N/A")
-            ler = doc.get("ler", "N/A")
-            title = doc.get("Title", "N/A")
-            event_date = doc.get("Event_Date", "N/A")
-            cfr = doc.get("CFR", "N/A")
-            text = doc.get("text", "") or ""
-
-            extractions = doc.get("Extractions", []) or []
-
-            # 1) JSONL에 graph 있으면 사용
-            graph_data = doc.get("graph") or {}
-
-            # 2) 없거나 비어 있으면 graph.json에서 LER 매칭
-            if not (isinstance(graph_data, dict) and graph_data.get("nodes")):
-                graph_data = graph_index.get(str(ler), {}) or {}
-
-            # 3) 둘 다 없으면 Extractions 기반 자동 생성
-            if not (isinstance(graph_data, dict) and graph_data.get("nodes")):
-                graph_data = build_graph_from_extractions(extractions)
-
-
-            graph_json = json.dumps(graph_data, ensure_ascii=False)
+    function renderTrend() {
+      const c = sum(D.monthly, r => monthYear[r[1]], r => r[2] + ',' + r[1]);
+      const totals = {}, months = new Set();
+      Object.keys(c).forEach(k => { const [cat, m] = k.split(',').map(Number); totals[cat] = (totals[cat] || 0) + c[k]; months.add(m); });
+      const cats = top(totals, 5), ms = [...months].sort((a, b) => a - b);
+      const svg = document.getElementById('dash-trend');
+      if (!ms.length) { svg.innerHTML = ''; document.getElementById('dash-trend-legend').innerHTML = '<span class="dash-muted">No data</span>'; return; }
+      const W = 420, H = 170, P = 28, max = Math.max(1, ...Object.values(c));
+      const x = i => P + (ms.length > 1 ? i * (W - 2 * P) / (ms.length - 1) : (W - 2 * P) / 2);
+      const y = v => H - P - v * (H - 2 * P) / max;
+      let out = '<line x1="' + P + '" y1="' + (H - P) + '" x2="' + (W - P) + '" y2="' + (H - P) + '" stroke="#bbb"/>'
+        + '<text x="2" y="' + (P - 6) + '" font-size="10" fill="#777">' + max + '</text>'
+        + '<text x="' + P + '" y="' + (H - 8) + '" font-size="10" fill="#777">' + esc(L.month[ms[0]]) + '</text>'
+        + '<text x="' + (W - P) + '" y="' + (H - 8) + '" font-size="10" fill="#777" text-anchor="end">' + esc(L.month[ms[ms.length - 1]]) + '</text>';
+      cats.forEach((cat, j) => {
+        const pts = ms.map((m, i) => x(i).toFixed(1) + ',' + y(c[cat + ',' + m] || 0).toFixed(1)).join(' ');
+        out += '<polyline fill="none" stroke-width="2" stroke="' + COLORS[j] + '" points="' + pts + '"/>';
+      });
+      svg.innerHTML = out;
+      document.getElementById('dash-trend-legend').innerHTML = cats.map((cat, j) =>
+        '<span style="color:' + COLORS[j] + '">&#9632; ' + esc(L.category[cat]) + '</span>').join('');
+    }
 
+    function renderHeatAndHHI() {
+      const c = sum(D.cat_by_system, r => r[1], r => r[2] + ',' + r[3]);
+      const catN = {}, sysN = {};
+      Object.keys(c).forEach(k => { const [a, b] = k.split(',').map(Number); catN[a] = (catN[a] || 0) + c[k]; sysN[b] = (sysN[b] || 0) + c[k]; });
+      const cats = top(catN, 8), systems = top(sysN, 8), max = Math.max(1, ...Object.values(c));
+      document.getElementById('dash-heat').innerHTML = cats.length
+        ? '<table class="dash-table"><tr><th></th>' + systems.map(s => '<th>' + esc(L.system[s]) + '</th>').join('') + '</tr>'
+          + cats.map(a => '<tr><td>' + esc(L.category[a]) + '</td>' + systems.map(b => {
+              const v = c[a + ',' + b] || 0;
+              return '<td style="background:rgba(55,124,245,' + (0.85 * v / max).toFixed(2) + ')">' + (v || '') + '</td>';
+            }).join('') + '</tr>').join('') + '</table>'
+        : '<span class="dash-muted">No data</span>';
+
+      // whole corpus: analyze.py's HHI with bootstrap CI; filtered: HHI of the filtered table (no CI)
+      const filtered = +fSel.value !== ALL || +ySel.value !== ALL;
+      let rows;
+      if (!filtered && D.hhi) {
+        const col = name => D.hhi.columns.indexOf(name);
+        rows = D.hhi.rows.map(r => [r[col('Extracted_Cause_Category')], r[col('N')], r[col('HHI_SystemCategory')], r[col('HHI_ci_low')], r[col('HHI_ci_high')]]);
+      } else {
+        rows = top(catN, L.category.length).map(a => {
+          let h = 0;
+          Object.keys(sysN).forEach(b => { const v = c[a + ',' + b] || 0; h += (v / catN[a]) * (v / catN[a]); });
+          return [L.category[a], catN[a], h, null, null];
+        });
+      }
+      const f3 = v => (v === null || v === undefined) ? '' : (+v).toFixed(3);
+      document.getElementById('dash-hhi').innerHTML = rows.length
+        ? '<table class="dash-table"><tr><th>Category</th><th>N</th><th>HHI</th><th>95% CI</th></tr>'
+          + rows.map(r => '<tr><td>' + esc(r[0]) + '</td><td>' + r[1] + '</td><td>' + f3(r[2]) + '</td><td>'
+            + (r[3] === null ? '<span class="dash-muted">-</span>' : f3(r[3]) + ' – ' + f3(r[4])) + '</td></tr>').join('') + '</table>'
+        : '<span class="dash-muted">No data</span>';
+    }
 
-            metadata_html = f"""
-            <div class="metadata">
-                <span>LER Code:</span> {html.escape(str(ler))}<br>
-                <span>Title:</span> {html.escape(str(title))}<br>
-                <span>Facility/Unit:</span> {html.escape(str(facility_name))} / {html.escape(str(unit))}<br>
-                <span>Event Date:</span> {html.escape(str(event_date))}<br>
-                <span>Reported Basis:</span> {html.escape(str(cfr))}
-            </div>
-            """
-
-            highlightable = [e for e in extractions if e.get("char_interval")]
-            highlightable.sort(key=lambda x: x["char_interval"]["start_pos"])
-            highlighted_parts = []
-            cur = 0
-            for e in highlightable:
-                start = int(e["char_interval"]["start_pos"])
-                end = int(e["char_interval"]["end_pos"])
-                cls = e.get("extraction_class", "Unknown")
-                if cls == "Corrective_Action":
-                    cls = "CorrectiveAction"
-                details_json = json.dumps(e, ensure_ascii=False)
-
-                highlighted_parts.append(html.escape(text[cur:start]))
-                highlighted_parts.append(
-                    f'<span class="highlight highlight-{cls}" data-details=\'{details_json}\' title="{html.escape(str(cls))}">'
-                    f'{html.escape(e.get("extraction_text",""))}'
-                    f'</span>'
-                )
-                cur = end
-            if text:
-                highlighted_parts.append(html.escape(text[cur:]))
-                highlighted_text = "".join(highlighted_parts)
-            else:
-                highlighted_text = "No narrative text available."
-
-            doc_html = f"""
-            <div class="document-container" id="doc-{i}">
-                {metadata_html}
-                <div class="tabs">
-                    <button class="tab-button" data-tab="text">Text View</button>
-                    <button class="tab-button" data-tab="graph">Graph View</button>
-                </div>
-                <div class="tab-content" data-tab="text">
-                    <div class="text-content">{highlighted_text}</div>
-                </div>
-                <div class="tab-content" data-tab="graph">
-                    <div id="graph-container-{i}" class="graph-container" data-graph='{graph_json}'></div>
-                </div>
-            </div>
-            """
-            all_docs_html.append(doc_html)
+    function render() { renderCats(); renderTrend(); renderHeatAndHHI(); }
+    fSel.addEventListener('change', render);
+    ySel.addEventListener('change', render);
+    render();
+  })();
+  </script>
+</details>
+"""
+
+def dashboard_html(dashboard_path=DASHBOARD_PATH):
+    """Dashboard block with analyze.py's dashboard.json embedded; "" when the file does not exist."""
+    if not dashboard_path or not os.path.exists(dashboard_path):
+        return ""
+    with open(dashboard_path, "r", encoding="utf-8") as f:
+        data = json.dumps(json.load(f), ensure_ascii=False, separators=(",", ":"))
+    return DASHBOARD_TEMPLATE.replace("{dashboard_data}", data.replace("</", "<\\/"))
+
+def render_document(doc, i, graph_index=None, compact=True, similar=None):
+    """
+    HTML of one document (`doc-{i}`): metadata, highlighted text and graph.
+    compact=True embeds the graph in the graph_codec encoding (`data-graphz`).
+    similar: [(ler, title, score, href or None)] listed under the metadata.
+    """
+    graph_index = graph_index or {}
+
+    facility_name = doc.get("Facility_Name", "N/A")
+    unit = doc.get("Unit", "N/A")
+    ler = doc.get("ler", "N/A")
+    title = doc.get("Title", "N/A")
+    event_date = doc.get("Event_Date", "N/A")
+    cfr = doc.get("CFR", "N/A")
+    text = doc.get("text", "") or ""
+
+    extractions = doc.get("Extractions", []) or []
+
+    # 1) JSONL에 graph 있으면 사용
+    graph_data = doc.get("graph") or {}
+
+    # 2) 없거나 비어 있으면 graph.json에서 LER 매칭
+    if not (isinstance(graph_data, dict) and graph_data.get("nodes")):
+        graph_data = graph_index.get(str(ler), {}) or {}
+
+    # 3) 둘 다 없으면 Extractions 기반 자동 생성
+    if not (isinstance(graph_data, dict) and graph_data.get("nodes")):
+        graph_data = build_graph_from_extractions(extractions, text)
+
+
+    if compact:
+        payload = graph_codec.dumps(graph_codec.encode_graph(graph_data, text))
+        # single-quoted attribute: only & ' < need escaping, the JSON quotes stay as they are
+        graph_attr = "data-graphz='" + payload.replace("&", "&amp;").replace("'", "&#39;").replace("<", "&lt;") + "'"
+    else:
+        graph_attr = f"data-graph='{json.dumps(graph_data, ensure_ascii=False)}'"
+
+
+    metadata_html = f"""
+    <div class="metadata">
+        <span>LER Code:</span> {html.escape(str(ler))}<br>
+        <span>Title:</span> {html.escape(str(title))}<br>
+        <span>Facility/Unit:</span> {html.escape(str(facility_name))} / {html.escape(str(unit))}<br>
+        <span>Event Date:</span> {html.escape(str(event_date))}<br>
+        <span>Reported Basis:</span> {html.escape(str(cfr))}{similar_html(similar)}
+    </div>
+    """
 
-    final_html = (
-        html_template
-        .replace("{content}", "".join(all_docs_html))
-        .replace("{legend_content}", legend_html)
+    # char_interval is repaired when the record is written; older records are aligned here
+    aligned = extractions if is_aligned(doc) else align_document(doc)[0]
+    highlightable = [e for e in aligned if e.get("char_interval")]
+    highlightable.sort(key=lambda x: (x["char_interval"]["start_pos"], -x["char_interval"]["end_pos"]))
+    highlighted_parts = []
+    cur = 0
+    for e in highlightable:
+        start = int(e["char_interval"]["start_pos"])
+        end = int(e["char_interval"]["end_pos"])
+        if start < cur:
+            continue  # overlaps the previous highlight
+        cls = canonical_class(e.get("extraction_class")) or e.get("extraction_class", "Unknown")
+        details_json = html.escape(json.dumps(e, ensure_ascii=False), quote=True)
+
+        highlighted_parts.append(html.escape(text[cur:start]))
+        highlighted_parts.append(
+            f'<span class="highlight highlight-{cls}" data-details=\'{details_json}\' title="{html.escape(str(cls))}">'
+            f'{html.escape(text[start:end])}'
+            f'</span>'
+        )
+        cur = end
+    if text:
+        highlighted_parts.append(html.escape(text[cur:]))
+        highlighted_text = "".join(highlighted_parts)
+    else:
+        highlighted_text = "No narrative text available."
+
+    doc_html = f"""
+    <div class="document-container" id="doc-{i}" data-ler="{html.escape(str(ler), quote=True)}">
+        {metadata_html}
+        <div class="tabs">
+            <button class="tab-button" data-tab="text">Text View</button>
+            <button class="tab-button" data-tab="graph">Graph View</button>
+        </div>
+        <div class="tab-content" data-tab="text">
+            <div class="text-content">{highlighted_text}</div>
+        </div>
+        <div class="tab-content" data-tab="graph">
+            <div id="graph-container-{i}" class="graph-container" {graph_attr}></div>
+        </div>
+    </div>
+    """
+    return doc_html
+
+def similar_html(similar):
+    if not similar:
+        return ""
+    links = []
+    for ler, title, score, href in similar:
+        label = f"{html.escape(str(ler))} ({score:.2f})"
+        tip = html.escape(str(title or ""), quote=True)
+        links.append(f'<a href="{html.escape(href, quote=True)}" title="{tip}">{label}</a>' if href
+                     else f'<i title="{tip}">{label}</i>')
+    return '<br><span>Similar LERs:</span> <span class="similar">' + "".join(links) + "</span>"
+
+def neighbor_list(ler, neighbors, titles, href):
+    """[(ler, title, score, href)] for render_document from the similar.py neighbor table."""
+    return [(n, titles.get(n, ""), score, href(n)) for n, score in neighbors.get(str(ler), [])]
+
+def assemble_page(doc_htmls, header=""):
+    return (
+        HTML_TEMPLATE
+        .replace("{content}", "".join(doc_htmls))
+        .replace("{legend_content}", header + legend_html())
+        .replace("{graph_decoder}", graph_codec.JS_DECODER)
     )
 
-    with open(html_output_path, 'w', encoding='utf-8') as f:
-        f.write(final_html)
-
+def precompress(path):
+    """Writes <path>.gz (and <path>.br when the brotli module is installed) for static serving."""
+    with open(path, "rb") as f:
+        data = f.read()
+    with gzip.open(path + ".gz", "wb", compresslevel=9) as f:
+        f.write(data)
+    try:
+        import brotli
+    except ImportError:
+        return
+    with open(path + ".br", "wb") as f:
+        f.write(brotli.compress(data))
+
+def create_visualization_html(jsonl_path, html_output_path, compact=True, compress=False,
+                              dashboard=DASHBOARD_PATH):
+    """
+    LER 시각화 HTML 생성 (Text / Graph 라디오 토글은 네비게이션 위로 분리, Lock 버튼 제거)
+    dashboard: analyze.py의 dashboard.json (있으면 페이지 위에 대시보드로 포함)
+    """
+    all_docs_html = []
+    with profiling.stage("load"):
+        from similar import load_neighbors   # pulls in NumPy; only needed once a page is built
+        graph_index = load_graph_index('graph.json')
+        neighbors = load_neighbors(jsonl_path)   # similar.py build
+    with DocStore(jsonl_path) as store, profiling.stage("render") as st:
+        titles = {str(d.get("ler")): d.get("Title") for d in store.iter_docs(["ler", "Title"])} if neighbors else {}
+        href = lambda n: f"#ler-{n}" if n in titles else None
+        for i, doc in enumerate(store.iter_docs()):
+            all_docs_html.append(render_document(doc, i, graph_index, compact,
+                                                 neighbor_list(doc.get("ler"), neighbors, titles, href)))
+        st["items"] = len(all_docs_html)
+
+    with profiling.stage("write") as st:
+        page = assemble_page(all_docs_html, dashboard_html(dashboard))
+        with open(html_output_path, 'w', encoding='utf-8') as f:
+            f.write(page)
+        if compress:
+            precompress(html_output_path)
+        st["bytes"] = len(page)
+
+
+
+# ---------------------------
+# sharded static site (facility / event year)
+# ---------------------------
+SITE_PAGE_SIZE = 100
+MANIFEST_NAME = "manifest.json"
+
+INDEX_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title}</title>
+    <style>
+        body { font-family: 'Montserrat','Segoe UI',Tahoma,Geneva,Verdana,sans-serif; color:#333; background:#f4f4f4; margin:0; }
+        .container { width:80%; max-width:1200px; padding:30px; background:#fff; border-radius:8px; box-shadow:0 2px 10px rgba(0,0,0,0.1); margin:20px auto; }
+        h1 { color:#19181d; margin:0 0 20px; }
+        table { border-collapse:collapse; width:100%; font-size:.9em; }
+        th, td { border-bottom:1px solid #e0e0e0; padding:6px 8px; text-align:left; vertical-align:top; }
+        th { background:#fafafa; }
+        td.num { text-align:right; }
+        .cats span { display:inline-block; margin:0 6px 4px 0; padding:1px 6px; border-radius:4px; background:#f7f1d1; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        {body}
+    </div>
+</body>
+</html>
+"""
+
+def slugify(name):
+    return re.sub(r"[^A-Za-z0-9]+", "-", str(name or "")).strip("-").lower() or "unknown"
+
+def event_year(date):
+    years = re.findall(r"(?:19|20)\d{2}", str(date or ""))
+    return years[-1] if years else "unknown"
+
+def _cats_html(counts):
+    return '<span class="cats">' + "".join(
+        f'<span>{html.escape(str(c))}: {n}</span>' for c, n in sorted(counts.items(), key=lambda x: (-x[1], str(x[0])))
+    ) + "</span>"
+
+def _write_if_changed(path, content):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read() == content:
+                return False
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return True
+
+def create_sharded_site(jsonl_path, site_dir, page_size=SITE_PAGE_SIZE, graph_json_path='graph.json',
+                        compact=True, compress=False, dashboard=DASHBOARD_PATH):
+    """
+    Static site: one page per facility and event year (split every `page_size`
+    documents), a facility index and a top index with Cause category counts
+    (and the dashboard when `dashboard` exists).
+    A page is re-rendered only when the hash of its documents, header (and of
+    this renderer) differs from `manifest.json`. Returns (written, skipped) page counts.
+    """
+    from similar import load_neighbors
+    profiling.begin("load")
+    graph_index = load_graph_index(graph_json_path)
+    neighbors = load_neighbors(jsonl_path)
+    # pages also depend on the edge settings (GRAPH_EDGES / GRAPH_MAX_FANOUT / GRAPH_EDGE_WINDOW)
+    # and on the modules that build the graphs and the highlights
+    h = hashlib.sha256(f"compact={compact} edges={json.dumps(edge_settings(), sort_keys=True)}".encode())
+    for src in (__file__, graph_codec.__file__, graph_edges.__file__, text_index.__file__,
+                span_align.__file__, schema.__file__):
+        with open(src, "rb") as f:
+            h.update(f.read())
+    renderer = h.hexdigest()
+    manifest_path = os.path.join(site_dir, MANIFEST_NAME)
+    old = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            old = json.load(f).get("pages", {})
+
+    with DocStore(jsonl_path) as store:
+        # 1) shard assignment + per-shard content hash, one pass over the records
+        profiling.begin("shard")
+        shards, names, titles = {}, {}, {}
+        for k, doc in enumerate(store.iter_docs(["ler", "Title", "Facility_Name", "Event_Date", "Extractions",
+                                                 *SCHEMA_FIELDS])):
+            fac = doc.get("Facility_Name") or "Unknown"
+            key = (slugify(fac), event_year(doc.get("Event_Date")))
+            names.setdefault(key[0], fac)
+            titles[str(doc.get("ler"))] = doc.get("Title")
+            sh = shards.setdefault(key, {"docs": [], "causes": {}})
+            sh["docs"].append(k)
+            cat = (primary_cause_of(doc) or {}).get("category") or "no_cause"
+            sh["causes"][cat] = sh["causes"].get(cat, 0) + 1
+
+        # page of every LER (targets of the "Similar LERs" links)
+        for (fac, year), sh in sorted(shards.items()):
+            parts = [sh["docs"][i:i + page_size] for i in range(0, len(sh["docs"]), page_size)]
+            sh["parts"] = parts
+            sh["pages"] = [f"{fac}/{year}.html" if p == 1 else f"{fac}/{year}-{p}.html" for p in range(1, len(parts) + 1)]
+        page_of = {str(store.entries[k][0]): rel for sh in shards.values() for rel, docs in zip(sh["pages"], sh["parts"])
+                   for k in docs}
+        href = lambda n: f"../{page_of[n]}#ler-{n}" if n in page_of else None
+
+        profiling.end(items=len(store), shards=len(shards))
+        profiling.begin("render")
+        pages, written, skipped = {}, 0, 0
+        for (fac, year), sh in sorted(shards.items()):
+            parts = sh["parts"]
+            for p, (rel, docs) in enumerate(zip(sh["pages"], parts), start=1):
+                part = f" (page {p}/{len(parts)})" if len(parts) > 1 else ""
+                header = (f'<p><a href="../index.html">All facilities</a> / <a href="index.html">'
+                          f'{html.escape(names[fac])}</a> / {html.escape(year)}{part}</p>')
+                h = hashlib.sha256(renderer.encode())
+                h.update(header.encode())      # page count and facility name are part of the page
+                for k in docs:
+                    ler = str(store.entries[k][0])
+                    h.update(store.raw_at(k))
+                    h.update(json.dumps(graph_index.get(ler), sort_keys=True).encode())
+                    h.update(json.dumps(neighbor_list(ler, neighbors, titles, href)).encode())
+                digest = h.hexdigest()
+                pages[rel] = {"hash": digest, "docs": len(docs)}
+                path = os.path.join(site_dir, rel)
+                if old.get(rel, {}).get("hash") == digest and os.path.exists(path):
+                    skipped += 1
+                    continue
+                doc_htmls = [render_document(store.doc_at(k), i, graph_index, compact,
+                                             neighbor_list(store.entries[k][0], neighbors, titles, href))
+                             for i, k in enumerate(docs)]
+                _write_if_changed(path, assemble_page(doc_htmls, header))
+                if compress:
+                    precompress(path)
+                written += 1
+
+    profiling.end(items=written, skipped=skipped)
+    # 2) index pages (small; rewritten only when their content changes)
+    profiling.begin("write")
+    by_fac = {}
+    for (fac, year), sh in shards.items():
+        by_fac.setdefault(fac, []).append((year, sh))
+    rows, total = [], {}
+    for fac in sorted(by_fac, key=lambda f: names[f].lower()):
+        years = sorted(by_fac[fac], key=lambda x: x[0])
+        fac_counts = {}
+        fac_rows = []
+        for year, sh in years:
+            for c, n in sh["causes"].items():
+                fac_counts[c] = fac_counts.get(c, 0) + n
+            links = " ".join(f'<a href="{os.path.basename(rel)}">{html.escape(year)}{"" if i == 0 else f" ({i + 1})"}</a>'
+                             for i, rel in enumerate(sh["pages"]))
+            fac_rows.append(f'<tr><td>{links}</td><td class="num">{len(sh["docs"])}</td><td>{_cats_html(sh["causes"])}</td></tr>')
+        for c, n in fac_counts.items():
+            total[c] = total.get(c, 0) + n
+        n_docs = sum(len(sh["docs"]) for _, sh in years)
+        body = (f'<p><a href="../index.html">All facilities</a></p><h1>{html.escape(names[fac])}</h1>'
+                f'<table><tr><th>Event year</th><th>LERs</th><th>Cause categories</th></tr>{"".join(fac_rows)}</table>')
+        _write_if_changed(os.path.join(site_dir, fac, "index.html"),
+                          INDEX_TEMPLATE.replace("{title}", html.escape(names[fac])).replace("{body}", body))
+        year_links = " ".join(f'<a href="{sh["pages"][0]}">{html.escape(y)}</a>' for y, sh in years)
+        rows.append(f'<tr><td><a href="{fac}/index.html">{html.escape(names[fac])}</a></td>'
+                    f'<td class="num">{n_docs}</td><td>{year_links}</td><td>{_cats_html(fac_counts)}</td></tr>')
+    body = (f'<h1>Licensee Event Reports Analysis</h1><p>{sum(total.values())} LERs, {len(by_fac)} facilities</p>'
+            f'<p>{_cats_html(total)}</p>{dashboard_html(dashboard)}'
+            f'<table><tr><th>Facility</th><th>LERs</th><th>Event years</th><th>Cause categories</th></tr>{"".join(rows)}</table>')
+    _write_if_changed(os.path.join(site_dir, "index.html"),
+                      INDEX_TEMPLATE.replace("{title}", "Licensee Event Reports Analysis").replace("{body}", body))
+
+    # 3) drop pages of shards that no longer exist
+    for rel in set(old) - set(pages):
+        path = os.path.join(site_dir, rel)
+        if os.path.exists(path):
+            os.remove(path)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"renderer": renderer, "pages": pages}, f, indent=1)
+    profiling.end(items=len(by_fac) + 1)
+    return written, skipped
 
 # Default script execution
-jsonl_file_path = 'extracted_keyword.jsonl'
-html_file_path = 'index.html'
-
-if os.path.exists(jsonl_file_path):
-    create_visualization_html(jsonl_file_path, html_file_path)
-    print(f"Successfully generated '{html_file_path}' from '{jsonl_file_path}'.")
-else:
-    print(f"Error: '{jsonl_file_path}' not found. Please check the path.")
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="LER viewer: one index.html, or a sharded static site (--site).")
+    ap.add_argument("jsonl", nargs="?", default='extracted_keyword.jsonl')
+    ap.add_argument("-o", "--output", default='index.html')
+    ap.add_argument("--site", default=None, help="write per-facility/per-year pages into this folder instead")
+    ap.add_argument("--page-size", type=int, default=SITE_PAGE_SIZE, help="documents per site page")
+    ap.add_argument("--full-graphs", action="store_true", help="embed plain graph JSON instead of the compact encoding")
+    ap.add_argument("--precompress", action="store_true", help="also write .gz (and .br with brotli) next to each page")
+    ap.add_argument("--dashboard", default=DASHBOARD_PATH,
+                    help="analyze.py dashboard.json shown above the documents ('' to leave out; 기본: %(default)s)")
+    profiling.add_argument(ap)
+    args = ap.parse_args()
+    profiling.start("02_vis", args.profile)
+    jsonl_file_path = args.jsonl
+    html_file_path = args.output
+
+    if not os.path.exists(jsonl_file_path):
+        print(f"Error: '{jsonl_file_path}' not found. Please check the path.")
+    elif args.site:
+        written, skipped = create_sharded_site(jsonl_file_path, args.site, args.page_size,
+                                               compact=not args.full_graphs, compress=args.precompress,
+                                               dashboard=args.dashboard)
+        print(f"Site '{args.site}': {written} page(s) written, {skipped} unchanged.")
+    else:
+        create_visualization_html(jsonl_file_path, html_file_path, not args.full_graphs, args.precompress,
+                                  args.dashboard)
+        print(f"Successfully generated '{html_file_path}' from '{jsonl_file_path}'.")
+    profiling.finish()
@@ -4,56 +4,22 @@
 
 import json, argparse
 from pathlib import Path
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-
-def load_jsonl(path):
-    rows = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            s = line.strip()
-            if not s:
-                continue
-            try:
-                rows.append(json.loads(s))
-            except Exception:
-                continue
-    return rows
+
+import profiling
+from schema import SCHEMA_FIELDS, SCHEMA_VERSION, cause_rank
+
+# pandas / NumPy / matplotlib (and the modules built on them) are imported where they are
+# used, so importing this module (watch.py, `visler.py analyze --help`) stays fast.
+
+META_FIELDS = ["ler", "Facility_Name", "Unit", "Event_Date", "CFR", "Title"]
+CORPUS_FIELDS = META_FIELDS + SCHEMA_FIELDS
 
 def to_df_jsonl_meta(rows):
-    keep = ["ler", "Facility_Name", "Unit", "Event_Date", "CFR", "Title"]
-    return pd.DataFrame([{k:r.get(k) for k in keep} for r in rows])
-
-def load_system_map(sys_json):
-    with open(sys_json, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    sysmap, alias_to_code = {}, {}
-    for s in data.get("systems", []):
-        code = (s.get("code") or "").upper()
-        if not code: 
-            continue
-        sysmap[code] = {
-            "name": s.get("name"),
-            "category": s.get("category", "unknown"),
-            "aliases": [a.upper() for a in (s.get("aliases") or [])]
-        }
-        for a in sysmap[code]["aliases"]:
-            alias_to_code[a] = code
-    return sysmap, alias_to_code
-
-def map_system_category(system_code, sysmap, aliasmap):
-    if not isinstance(system_code, str) or not system_code:
-        return "unknown", None
-    sc = system_code.upper()
-    if sc in sysmap:
-        return sysmap[sc].get("category","unknown"), sc
-    if sc in aliasmap:
-        base = aliasmap[sc]
-        return sysmap.get(base,{}).get("category","unknown"), base
-    return "unknown", None
+    import pandas as pd
+    return pd.DataFrame([{k:r.get(k) for k in META_FIELDS} for r in rows])
 
 def tidy_dates(df):
+    import pandas as pd
     def parse_date(x):
         if not isinstance(x, str): return pd.NaT
         x = x.strip()
@@ -67,39 +33,146 @@ def tidy_dates(df):
     df["Event_Year"] = df["Event_Date_parsed"].dt.year
     return df
 
-def extract_cause_from_jsonl(rows):
-    recs = []
-    for r in rows:
-        ler = r.get("ler") or r.get("LER")
-        if not ler: 
+def primary_cause_table(lers, primaries):
+    """df_primary from stored Primary_Cause values (schema.py); the best-ranked one per LER."""
+    import pandas as pd
+    best = {}
+    for ler, pc in zip(lers, primaries):
+        if not ler or not pc:
             continue
-        for e in r.get("Extractions", []) or []:
-            if (e or {}).get("extraction_class") == "Cause":
-                attrs = e.get("attributes") or {}
-                recs.append({
-                    "ler": ler,
-                    "extraction_text": e.get("extraction_text"),
-                    "extraction_category": attrs.get("category"),
-                    "extraction_code": attrs.get("code"),
-                })
-    df = pd.DataFrame(recs)
-    if df.empty:
-        return df, df
+        if ler not in best or cause_rank(pc) > cause_rank(best[ler]):
+            best[ler] = pc
+    return pd.DataFrame([{"ler": ler, "extraction_text": pc.get("text"), "extraction_category": pc.get("category"),
+                          "extraction_code": pc.get("code")} for ler, pc in sorted(best.items())],
+                        columns=["ler", "extraction_text", "extraction_category", "extraction_code"])
+
+def extract_cause_from_corpus(corpus):
+    """
+    (every Cause extraction, primary Cause per LER) as DataFrames with ler / extraction_text /
+    extraction_category / extraction_code; one vectorized pass over the CompactCorpus columns.
+    """
+    import numpy as np
+    import pandas as pd
+    cols = corpus.numpy()
+    empty = pd.DataFrame()
+    if "Cause" not in corpus.class_ids:
+        return empty, empty
+    rows = np.flatnonzero(cols["cls"] == corpus.class_ids["Cause"])
+    lers = np.array(corpus.lers + [None], dtype=object)[cols["doc"][rows]]
+    keep = pd.notna(lers) & (lers != "")
+    rows, lers = rows[keep], lers[keep]
+    if not len(rows):
+        return empty, empty
+    values = corpus.decoded_pool(corpus.attr_values)
+    texts = corpus.decoded_pool(corpus.texts)
+    none_ids = np.full(corpus.n_extractions, -1, dtype=np.int32)
+    df = pd.DataFrame({
+        "ler": lers,
+        "extraction_text": texts[cols["text_id"][rows]],
+        "extraction_category": values[cols.get("attr:category", none_ids)[rows]],
+        "extraction_code": values[cols.get("attr:code", none_ids)[rows]],
+    })
+    if corpus.meta and all(m.get("Schema_Version") == SCHEMA_VERSION for m in corpus.meta):
+        # normalized records carry their primary Cause
+        return df, primary_cause_table(corpus.lers, [m.get("Primary_Cause") for m in corpus.meta])
     df["has_both"] = df["extraction_code"].notna() & df["extraction_category"].notna()
     df["has_code"] = df["extraction_code"].notna()
-    df = df.sort_values(by=["ler","has_both","has_code"], ascending=[True,False,False])
+    df = df.sort_values(by=["ler","has_both","has_code"], ascending=[True,False,False], kind="stable")
     df_primary = df.groupby("ler", as_index=False).first().drop(columns=["has_both","has_code"])
     return df, df_primary
 
+def merge_tables(cf, meta, df_c_primary, resolver):
+    """component failure records + LER metadata + system category + primary extracted Cause"""
+    import pandas as pd
+    # base join
+    df = pd.merge(cf, meta, on="ler", how="left")
+    cats, bases, methods = resolver.resolve(df["System"], with_method=True)
+    df["System_Category"] = cats; df["System_BaseCode"] = bases; df["System_Resolution"] = methods
+    df["is_quality_ok"] = ~df["flags"].apply(lambda x: isinstance(x, list) and ("record_low_quality" in x))
+
+    if not df_c_primary.empty:
+        df = pd.merge(df, df_c_primary.rename(columns={
+            "extraction_text":"Extracted_Cause_Text",
+            "extraction_category":"Extracted_Cause_Category",
+            "extraction_code":"Extracted_Cause_Code"
+        }), on="ler", how="left")
+    return df
+
+def build_dashboard(df_c_multi, meta, df, hhi_df=None):
+    """
+    dashboard.json for the viewer (02_vis.py --dashboard): the tables of cat_counts.csv,
+    cat_by_system_category.csv and cat_monthly_counts.csv split by facility and event year,
+    so the page filters them without the documents, plus the HHI table (whole corpus).
+    Rows are label indices (-1: missing) followed by the count.
+    """
+    import pandas as pd
+    def year(v):
+        return v.map(lambda y: str(int(y)) if pd.notna(y) else None)
+    def by_count(*cols):
+        counts = pd.concat(cols).value_counts()
+        return sorted(counts.index, key=lambda k: (-counts[k], k))
+
+    m = meta.drop_duplicates("ler").set_index("ler")
+    cc = df_c_multi[df_c_multi["extraction_category"].notna()]
+    cc = pd.DataFrame({"facility": cc["ler"].map(m["Facility_Name"]),
+                       "year": year(cc["ler"].map(m["Event_Year"])),
+                       "category": cc["extraction_category"]})
+    d = df[df["Extracted_Cause_Category"].notna()]
+    d = pd.DataFrame({"facility": d["Facility_Name"], "year": year(d["Event_Year"]),
+                      "month": d["Event_YYYYMM"].where(d["Event_YYYYMM"] != "NaT"),
+                      "category": d["Extracted_Cause_Category"], "system": d["System_Category"]})
+    labels = {
+        "facility": sorted(set(cc["facility"].dropna()) | set(d["facility"].dropna())),
+        "year": sorted(set(cc["year"].dropna()) | set(d["year"].dropna())),
+        "month": sorted(d["month"].dropna().unique()),
+        "category": by_count(cc["category"], d["category"]),
+        "system": by_count(d["system"].dropna()),
+    }
+    def table(frame, dims):
+        codes = pd.DataFrame({k: pd.Categorical(frame[k], categories=labels[k]).codes for k in dims})
+        return codes.groupby(dims).size().reset_index(name="count").values.tolist()
+
+    out = {
+        "version": 1,
+        "labels": labels,
+        "columns": {"cat_counts": ["facility", "year", "category", "count"],
+                    "cat_by_system": ["facility", "year", "category", "system", "count"],
+                    "monthly": ["facility", "month", "category", "count"]},
+        # Cause extractions (cat_counts.csv)
+        "cat_counts": table(cc, ["facility", "year", "category"]),
+        # merged rows with a system category (cat_by_system_category.csv)
+        "cat_by_system": table(d[d["system"].notna()], ["facility", "year", "category", "system"]),
+        # merged rows with an event month (cat_monthly_counts.csv)
+        "monthly": table(d[d["month"].notna()], ["facility", "month", "category"]),
+    }
+    if hhi_df is not None:
+        out["hhi"] = {"columns": list(hhi_df.columns), "rows": json.loads(hhi_df.to_json(orient="values"))}
+    return out
+
 # plotting helpers
-def barplot(pdf, x, y, title, outpng, rotate=45):
+def _pyplot():
+    # the Agg backend is selected only once something is actually plotted
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+def barplot(pdf, x, y, title, outpng, rotate=45, ci=None):
+    # ci: optional (low column, high column) drawn as error bars
+    import numpy as np
+    plt = _pyplot()
     plt.figure(figsize=(8,4))
-    plt.bar(pdf[x].astype(str), pdf[y].values)
+    yerr = None
+    if ci:
+        lo, hi = pdf[ci[0]].values, pdf[ci[1]].values
+        yerr = np.vstack([np.clip(pdf[y].values - lo, 0, None), np.clip(hi - pdf[y].values, 0, None)])
+    plt.bar(pdf[x].astype(str), pdf[y].values, yerr=yerr, capsize=3 if ci else 0)
     plt.title(title); plt.xlabel(x); plt.ylabel(y)
     plt.xticks(rotation=rotate, ha="right")
     plt.tight_layout(); plt.savefig(outpng, dpi=150); plt.close()
 
 def lineplot_multi(pdf, x, ycols, title, outpng):
+    plt = _pyplot()
     plt.figure(figsize=(8,4))
     for col in ycols:
         plt.plot(pdf[x].astype(str), pdf[col].values, label=str(col))
@@ -108,54 +181,122 @@ def lineplot_multi(pdf, x, ycols, title, outpng):
     plt.legend(); plt.tight_layout(); plt.savefig(outpng, dpi=150); plt.close()
 
 def heatmap(piv, title, outpng):
+    import numpy as np
+    plt = _pyplot()
     fig = plt.figure(figsize=(8,5)); ax = plt.gca()
     im = ax.imshow(piv.values, aspect="auto")
     ax.set_xticks(np.arange(piv.shape[1])); ax.set_xticklabels(piv.columns, rotation=45, ha="right")
     ax.set_yticks(np.arange(piv.shape[0])); ax.set_yticklabels(piv.index)
     ax.set_title(title); fig.tight_layout(); plt.savefig(outpng, dpi=150); plt.close()
 
-def hhi(series_counts):
-    s = series_counts.astype(float)
-    tot = s.sum()
-    if tot == 0: return np.nan
-    shares = s / tot
-    return float((shares**2).sum())
+# charts: drawn from the same tables that are written as CSV, so one chart can be redrawn
+# from an existing output folder without re-running the analysis (`visler.py chart <name>`)
+def chart_cat_counts(cat_counts, outdir):
+    if not cat_counts.empty:
+        barplot(cat_counts, "extraction_category", "count", "Extracted Cause category counts",
+                outdir/"cat_counts.png")
+
+def chart_cat_by_system_category(cxs, outdir):
+    # limit to top 8 categories & top 8 system-cats
+    top_cats = (cxs.groupby("Extracted_Cause_Category")["count"].sum()
+                  .sort_values(ascending=False).head(8).index.tolist())
+    top_syscats = (cxs.groupby("System_Category")["count"].sum()
+                      .sort_values(ascending=False).head(8).index.tolist())
+    piv = (cxs[cxs["Extracted_Cause_Category"].isin(top_cats) &
+               cxs["System_Category"].isin(top_syscats)]
+           .pivot(index="Extracted_Cause_Category", columns="System_Category", values="count").fillna(0)
+           .reindex(index=top_cats, columns=top_syscats))
+    if not piv.empty:
+        heatmap(piv, "Category × System category (Top)", outdir/"cat_by_system_category_heatmap.png")
+
+def chart_cat_iris_ratio(piv2, outdir):
+    barplot(piv2, "Extracted_Cause_Category", "yes_ratio",
+            "IRIS Yes ratio by Category (95% CI)", outdir/"cat_iris_ratio.png",
+            ci=("yes_ratio_ci_low","yes_ratio_ci_high"))
+
+def chart_cat_monthly_trend(monthly, cat_counts, outdir):
+    # pivot for top categories
+    if cat_counts.empty:
+        return
+    topcats = cat_counts.head(5)["extraction_category"].tolist()
+    pivm = (monthly[monthly["Extracted_Cause_Category"].isin(topcats)]
+            .pivot(index="Event_YYYYMM", columns="Extracted_Cause_Category", values="count").fillna(0)
+            .sort_index().reset_index())
+    if not pivm.empty:
+        ycols = [c for c in pivm.columns if c != "Event_YYYYMM"]
+        lineplot_multi(pivm, "Event_YYYYMM", ycols,
+                       "Monthly trend (Top categories)", outdir/"cat_monthly_trend_top.png")
 
-def main():
+def chart_cat_system_category_hhi(hhi_df, outdir):
+    hplot = hhi_df.sort_values("HHI_SystemCategory", ascending=False, kind="stable")
+    if not hplot.empty:
+        barplot(hplot, "Extracted_Cause_Category", "HHI_SystemCategory",
+                "System-category concentration (HHI, 95% CI) by Category",
+                outdir/"cat_system_category_hhi.png", ci=("HHI_ci_low","HHI_ci_high"))
+
+# chart (= PNG name) -> (CSV files it is drawn from, chart function)
+CHARTS = {
+    "cat_counts": (["cat_counts.csv"], chart_cat_counts),
+    "cat_by_system_category_heatmap": (["cat_by_system_category.csv"], chart_cat_by_system_category),
+    "cat_iris_ratio": (["cat_iris_ratio_ci.csv"], chart_cat_iris_ratio),
+    "cat_monthly_trend_top": (["cat_monthly_counts.csv", "cat_counts.csv"], chart_cat_monthly_trend),
+    "cat_system_category_hhi": (["cat_system_category_hhi.csv"], chart_cat_system_category_hhi),
+}
+
+def redraw_chart(name, outdir="./out_extracted_code"):
+    """Redraws <outdir>/<name>.png from the CSVs of an earlier run; returns its path."""
+    import pandas as pd
+    if name not in CHARTS:
+        raise ValueError(f"unknown chart {name!r} (one of: {', '.join(CHARTS)})")
+    files, fn = CHARTS[name]
+    outdir = Path(outdir)
+    missing = [f for f in files if not (outdir/f).exists()]
+    if missing:
+        raise FileNotFoundError(f"{', '.join(missing)} not found in {outdir} (run analyze.py first)")
+    fn(*[pd.read_csv(outdir/f, keep_default_na=False, na_values=[""]) for f in files], outdir)
+    return outdir/f"{name}.png"
+
+def main(argv=None):
     ap = argparse.ArgumentParser()
     ap.add_argument("--cf", default="./preprocessing/component_failure.cleaned.json")
     ap.add_argument("--sys", default="./data/system_codes.json")
     ap.add_argument("--mode", default="./data/operating_mode.json")
     ap.add_argument("--ler", default="./extracted_text.jsonl")
     ap.add_argument("--outdir", default="./out_extracted_code")
-    args = ap.parse_args()
+    ap.add_argument("--system-fuzzy", action="store_true",
+                    help="also resolve OCR-damaged / prefixed / misspelled system codes (System_Resolution)")
+    profiling.add_argument(ap)
+    args = ap.parse_args(argv)
+    profiling.start("analyze", args.profile)
+
+    import numpy as np
+    import pandas as pd
+    from cause_cube import CauseCube
+    from cause_stats import association, bootstrap_ratio
+    from compact_corpus import CompactCorpus
+    from system_resolver import SystemResolver
 
     outdir = Path(args.outdir); outdir.mkdir(parents=True, exist_ok=True)
 
     # load
+    profiling.begin("load")
     cf = pd.read_json(args.cf)
-    sysmap, aliasmap = load_system_map(args.sys)
-    rows = load_jsonl(args.ler)
-    meta = tidy_dates(to_df_jsonl_meta(rows))
-    df_c_multi, df_c_primary = extract_cause_from_jsonl(rows)
+    resolver = SystemResolver.from_json(args.sys, fuzzy=args.system_fuzzy)
+    corpus = CompactCorpus.from_jsonl(args.ler, meta_fields=CORPUS_FIELDS)
+    meta = tidy_dates(to_df_jsonl_meta(corpus.meta))
+    df_c_multi, df_c_primary = extract_cause_from_corpus(corpus)
+    profiling.end(items=len(corpus), component_failures=len(cf))
 
-    # base join
-    df = pd.merge(cf, meta, on="ler", how="left")
-    cats, bases = [], []
-    for v in df["System"].fillna(""):
-        cat, base = map_system_category(v, sysmap, aliasmap)
-        cats.append(cat); bases.append(base)
-    df["System_Category"] = cats; df["System_BaseCode"] = bases
-    df["is_quality_ok"] = ~df["flags"].apply(lambda x: isinstance(x, list) and ("record_low_quality" in x))
+    profiling.begin("transform")
+    df = merge_tables(cf, meta, df_c_primary, resolver)
 
-    if not df_c_primary.empty:
-        df = pd.merge(df, df_c_primary.rename(columns={
-            "extraction_text":"Extracted_Cause_Text",
-            "extraction_category":"Extracted_Cause_Category",
-            "extraction_code":"Extracted_Cause_Code"
-        }), on="ler", how="left")
+    # pre-aggregated cube for roll-ups / trends (see cause_cube.py)
+    cube = CauseCube.from_frame(df)
+    cube.save(outdir/"cube.npz")
+    profiling.end(items=len(df))
 
     # ============= CATEGORY-LEVEL PATTERNS =============
+    profiling.begin("render")
     if not df_c_multi.empty:
         # 1) Category distribution
         cat_counts = (df_c_multi[df_c_multi["extraction_category"].notna()]
@@ -163,9 +304,7 @@ def main():
                       .size().rename(columns={"size":"count"})
                       .sort_values("count", ascending=False))
         cat_counts.to_csv(outdir/"cat_counts.csv", index=False)
-        if not cat_counts.empty:
-            barplot(cat_counts, "extraction_category", "count", "Extracted Cause category counts",
-                    outdir/"cat_counts.png")
+        chart_cat_counts(cat_counts, outdir)
 
         # 2) Category × System Category (heatmap top)
         if "Extracted_Cause_Category" in df.columns:
@@ -173,17 +312,7 @@ def main():
                    .groupby(["Extracted_Cause_Category","System_Category"], as_index=False)
                    .size().rename(columns={"size":"count"}))
             cxs.to_csv(outdir/"cat_by_system_category.csv", index=False)
-            # limit to top 8 categories & top 8 system-cats
-            top_cats = (cxs.groupby("Extracted_Cause_Category")["count"].sum()
-                          .sort_values(ascending=False).head(8).index.tolist())
-            top_syscats = (cxs.groupby("System_Category")["count"].sum()
-                              .sort_values(ascending=False).head(8).index.tolist())
-            piv = (cxs[cxs["Extracted_Cause_Category"].isin(top_cats) &
-                       cxs["System_Category"].isin(top_syscats)]
-                   .pivot(index="Extracted_Cause_Category", columns="System_Category", values="count").fillna(0)
-                   .reindex(index=top_cats, columns=top_syscats))
-            if not piv.empty:
-                heatmap(piv, "Category × System category (Top)", outdir/"cat_by_system_category_heatmap.png")
+            chart_cat_by_system_category(cxs, outdir)
 
         # 3) Category × Component (Top-10 per category)
         if "Component" in df.columns and "Extracted_Cause_Category" in df.columns:
@@ -203,49 +332,46 @@ def main():
             piv = iris.pivot(index="Extracted_Cause_Category", columns="Reportable_to_IRIS", values="count").fillna(0)
             if not piv.empty and "Yes" in piv.columns:
                 piv["total"] = piv.sum(axis=1)
-                piv = piv[piv["total"] >= 3]  # only with enough support
-                piv["yes_ratio"] = (piv["Yes"] / piv["total"]).fillna(0)
-                piv2 = piv.sort_values("total", ascending=False).reset_index()[["Extracted_Cause_Category","yes_ratio"]]
-                barplot(piv2, "Extracted_Cause_Category", "yes_ratio",
-                        "IRIS Yes ratio by Category", outdir/"cat_iris_ratio.png")
+                # bootstrap CI instead of a minimum-support cutoff
+                ratio, lo, hi = bootstrap_ratio(piv["Yes"].values, piv["total"].values)
+                piv["yes_ratio"] = np.nan_to_num(ratio)
+                piv["yes_ratio_ci_low"], piv["yes_ratio_ci_high"] = lo, hi
+                piv2 = piv.sort_values("total", ascending=False, kind="stable").reset_index()
+                piv2[["Extracted_Cause_Category","total","Yes","yes_ratio","yes_ratio_ci_low","yes_ratio_ci_high"]] \
+                    .to_csv(outdir/"cat_iris_ratio_ci.csv", index=False)
+                chart_cat_iris_ratio(piv2, outdir)
 
         # 5) Category 월별 추이 (Top categories)
         if "Event_YYYYMM" in df.columns and "Extracted_Cause_Category" in df.columns:
-            monthly = (df[df["Extracted_Cause_Category"].notna() & df["Event_YYYYMM"].notna()]
-                       .groupby(["Event_YYYYMM","Extracted_Cause_Category"], as_index=False)
-                       .size().rename(columns={"size":"count"}))
+            monthly = cube.rollup(["Event_YYYYMM","Extracted_Cause_Category"])
             monthly.to_csv(outdir/"cat_monthly_counts.csv", index=False)
-            # pivot for top categories
-            if not cat_counts.empty:
-                topcats = cat_counts.head(5)["extraction_category"].tolist()
-                pivm = (monthly[monthly["Extracted_Cause_Category"].isin(topcats)]
-                        .pivot(index="Event_YYYYMM", columns="Extracted_Cause_Category", values="count")
-                        .fillna(0).reset_index().sort_values("Event_YYYYMM"))
-                if not pivm.empty:
-                    ycols = [c for c in pivm.columns if c != "Event_YYYYMM"]
-                    lineplot_multi(pivm, "Event_YYYYMM", ycols,
-                                   "Monthly trend (Top categories)", outdir/"cat_monthly_trend_top.png")
+            chart_cat_monthly_trend(monthly, cat_counts, outdir)
 
         # 6) 집중도 지표(HHI): 카테고리별 시스템카테고리 분포 집중도
+        #    + bootstrap CI, permutation p-value, chi-square / Cramér's V (cause_stats.py)
         if "Extracted_Cause_Category" in df.columns:
-            hhi_rows = []
-            for cat in df["Extracted_Cause_Category"].dropna().unique():
-                q = df[df["Extracted_Cause_Category"]==cat]
-                counts = q["System_Category"].value_counts()
-                h = hhi(counts)
-                hhi_rows.append({"Extracted_Cause_Category": cat, "HHI_SystemCategory": h, "N": int(counts.sum())})
-            hhi_df = pd.DataFrame(hhi_rows).sort_values("N", ascending=False)
+            assoc, per_cat = association(df["Extracted_Cause_Category"], df["System_Category"])
+            hhi_df = (per_cat.rename(columns={"label":"Extracted_Cause_Category", "HHI":"HHI_SystemCategory"})
+                      [["Extracted_Cause_Category","HHI_SystemCategory","N","HHI_ci_low","HHI_ci_high","HHI_perm_p"]]
+                      .sort_values("N", ascending=False, kind="stable"))
             hhi_df.to_csv(outdir/"cat_system_category_hhi.csv", index=False)
-            # plot HHI for categories with N>=3
-            hplot = hhi_df[hhi_df["N"]>=3].sort_values("HHI_SystemCategory", ascending=False)
-            if not hplot.empty:
-                barplot(hplot, "Extracted_Cause_Category", "HHI_SystemCategory",
-                        "System-category concentration (HHI) by Category", outdir/"cat_system_category_hhi.png")
+            # NaN (e.g. Cramér's V with a single category or system) -> null, valid JSON
+            assoc = {k: None if isinstance(v, float) and not np.isfinite(v) else v for k, v in assoc.items()}
+            with open(outdir/"cat_system_association.json", "w", encoding="utf-8") as f:
+                json.dump(assoc, f, indent=2, allow_nan=False)
+            chart_cat_system_category_hhi(hhi_df, outdir)
+
+            # 7) 대시보드: 위 표들을 시설 / 연도별로 미리 집계 (02_vis.py 페이지에서 필터링)
+            with open(outdir/"dashboard.json", "w", encoding="utf-8") as f:
+                json.dump(build_dashboard(df_c_multi, meta, df, hhi_df), f, ensure_ascii=False, separators=(",", ":"))
 
     # save merged for reference
+    profiling.begin("write")
     df.to_csv(outdir/"merged_metadata_with_extracted.csv", index=False)
+    profiling.end(items=len(df))
 
     print("Category-level outputs written to:", outdir)
+    profiling.finish()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# benchmark.py
+"""
+Offline benchmark for the VisLER pipeline (no network, no model calls).
+
+A corpus of the requested size is synthesized from the shapes in
+`extracted_text.jsonl` and `preprocessing/component_failure.cleaned.json`,
+then every stage is timed and its peak RSS recorded (the same readings as
+profiling.py; tracemalloc would slow allocation-heavy stages several times
+over and skew the timings) and the results are stored as JSON so that runs
+can be compared.
+
+  python benchmark.py --size 10000 --out bench/results_10k.json
+  python benchmark.py compare bench/before.json bench/after.json
+"""
+import argparse, gc, importlib, json, os, platform, random, subprocess, sys, tempfile, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT / "preprocessing"))
+sys.path.insert(0, str(ROOT))
+
+SEED_JSONL = ROOT / "extracted_text.jsonl"
+SEED_CF = ROOT / "preprocessing" / "component_failure.cleaned.json"
+SYSTEM_CATEGORIES = ["electrical", "reactor_coolant", "feedwater", "steam", "safety_injection",
+                     "instrumentation", "containment", "auxiliary"]
+STAGES = ["preprocess", "filter", "cf_extract", "cf_clean", "build_graph", "vis", "analyze"]
+
+# graph schema with the same rules as build_graph_from_extractions (data/ is not shipped)
+DEFAULT_SCHEMA = {
+    "display": {"label_field_priority": ["extraction_text", "text"], "truncate": 60},
+    "edge_rules": [
+        {"from": "Condition", "to": "Human_Action", "relation": "triggers"},
+        {"from": "Procedure_or_Regulation", "to": "Human_Action", "relation": "guides"},
+        {"from": "Human_Action", "to": "Outcome", "relation": "leads_to"},
+        {"from": "Cause", "to": "Outcome", "relation": "causes"},
+        {"from": "CorrectiveAction", "to": "Procedure_or_Regulation", "relation": "revises"},
+        {"from": "CorrectiveAction", "to": "Outcome", "relation": "addresses"},
+    ],
+}
+
+# ---------------------------
+# corpus synthesis
+# ---------------------------
+def _load_seed():
+    from span_align import align_document, is_aligned
+    with open(SEED_JSONL, "r", encoding="utf-8") as f:
+        docs = [json.loads(line) for line in f if line.strip()]
+    # records as 01_run.py writes them now: char_interval repaired once (see span_align.py)
+    docs = [d if is_aligned(d) else dict(d, Extractions=align_document(d)[0]) for d in docs]
+    with open(SEED_CF, "r", encoding="utf-8") as f:
+        cf = json.load(f)
+    return docs, cf
+
+def synthesize(n, workdir, seed=0):
+    """Writes extracted.jsonl, component_failure.cleaned.json, merged.csv, system_codes.json
+    and LER text tails into `workdir`; returns their paths."""
+    rng = random.Random(seed)
+    docs, cf = _load_seed()
+    facilities = sorted({d.get("Facility_Name") or "Plant" for d in docs})
+    workdir = Path(workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    paths = {
+        "jsonl": workdir / "extracted.jsonl",
+        "cf": workdir / "component_failure.cleaned.json",
+        "merged": workdir / "merged.csv",
+        "sys": workdir / "system_codes.json",
+        "cf_texts": workdir / "cf_texts.jsonl",
+    }
+
+    lers = []
+    with open(paths["jsonl"], "w", encoding="utf-8") as f:
+        for i in range(n):
+            base = docs[rng.randrange(len(docs))]
+            ler = f"{rng.randint(200, 499):03d}{rng.randint(2015, 2024)}{i % 1000:03d}R0{i // 1000 % 3}_{i}"
+            lers.append(ler)
+            exts = list(base.get("Extractions") or [])
+            rng.shuffle(exts)
+            keep = exts[: max(1, rng.randint(len(exts) // 2, len(exts)))] if exts else []
+            doc = dict(base)
+            doc.update({
+                "ler": ler,
+                "Facility_Name": rng.choice(facilities),
+                "Event_Date": f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/{rng.randint(2015, 2024)}",
+                "Extractions": sorted(keep, key=lambda e: (e.get("char_interval") or {}).get("start_pos", 0)),
+            })
+            f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+
+    cf_rows = []
+    for ler in lers:
+        r = dict(cf[rng.randrange(len(cf))])
+        r["ler"] = ler
+        cf_rows.append(r)
+    paths["cf"].write_text(json.dumps(cf_rows, ensure_ascii=False), encoding="utf-8")
+
+    systems = sorted({r.get("System") for r in cf if r.get("System")})
+    paths["sys"].write_text(json.dumps({"systems": [
+        {"code": s, "name": s, "category": SYSTEM_CATEGORIES[k % len(SYSTEM_CATEGORIES)], "aliases": []}
+        for k, s in enumerate(systems)]}), encoding="utf-8")
+
+    # raw LER text tails for extract_component_failure.extract_one
+    with open(paths["cf_texts"], "w", encoding="utf-8") as f:
+        for r in cf_rows:
+            line = " ".join([r.get("Cause") or "X", r.get("System") or "XX", r.get("Component") or "XX",
+                             r.get("Manufacturer") or "Acme", "Y" if r.get("Reportable_to_IRIS") == "Yes" else "N"])
+            body = ("LICENSEE EVENT REPORT\n...\nCAUSE SYSTEM COMPONENT MANUFACTURER REPORTABLE TO IRIS\n"
+                    f"{line}\n14. SUPPLEMENTAL REPORT EXPECTED\n")
+            f.write(json.dumps(body) + "\n")
+
+    import pandas as pd
+    rows = []
+    with open(paths["jsonl"], "r", encoding="utf-8") as f:
+        for line in f:
+            d = json.loads(line)
+            rows.append({
+                "Facility Name": f"\"{d['Facility_Name']}\" Unit {d.get('Unit') or 1}",
+                "Title": d.get("Title"), "Event Date": d.get("Event_Date"), "Abstract": d.get("text"),
+                "Narrative": "", "File Name": d["ler"], "filename": d["ler"] + ".pdf", "CFR": d.get("CFR"),
+                "content_3": "", "content_4": "",
+            })
+    pd.DataFrame(rows).to_csv(paths["merged"], index=False)
+    return paths
+
+# ---------------------------
+# stage runner
+# ---------------------------
+def measure(fn):
+    """Wall / CPU time and peak RSS of one stage (per stage where Linux lets us reset the peak)."""
+    from profiling import _proc_rss, _reset_peak
+    gc.collect()
+    scope = "stage" if _reset_peak() else "process"
+    rss0, _ = _proc_rss()
+    t0, c0 = time.perf_counter(), time.process_time()
+    items = fn()
+    wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+    rss, peak = _proc_rss()
+    return {"seconds": round(wall, 4), "cpu_seconds": round(cpu, 4), "peak_mb": peak, "peak_scope": scope,
+            "rss_start_mb": rss0, "rss_mb": rss, "items": items}
+
+def run_stages(paths, outdir, stages):
+    import pandas as pd
+    state, results = {}, {}
+
+    def preprocess():
+        from preprocessing import preprocess_df
+        state["pre"] = preprocess_df(pd.read_csv(paths["merged"]))
+        return len(state["pre"])
+
+    def filter_():
+        from filter import filter_df
+        if "pre" not in state:
+            preprocess()
+        return len(filter_df(state["pre"]))
+
+    def cf_extract():
+        from extract_component_failure import extract_one
+        n = 0
+        with open(paths["cf_texts"], "r", encoding="utf-8") as f:
+            for line in f:
+                n += extract_one(json.loads(line)) is not None
+        return n
+
+    def cf_clean():
+        from extract_component_failure import clean_and_dedup
+        with open(paths["cf"], "r", encoding="utf-8") as f:
+            return len(clean_and_dedup(json.load(f)))
+
+    def build_graph():
+        bg = importlib.import_module("build_graph")
+        corpus = bg.CompactCorpus.from_jsonl(str(paths["jsonl"]), extra_fields=bg.label_fields(DEFAULT_SCHEMA))
+        edges = 0
+        for idx in range(len(corpus)):
+            edges += len(bg.build_graph_from_corpus(corpus, idx, DEFAULT_SCHEMA)["edges"])
+        return {"docs": len(corpus), "edges": edges}
+
+    def vis():
+        v = importlib.import_module("02_vis")
+        out = Path(outdir) / "index.html"
+        v.create_visualization_html(str(paths["jsonl"]), str(out))
+        return {"html_bytes": out.stat().st_size}
+
+    def analyze():
+        import matplotlib
+        matplotlib.use("Agg")
+        an = importlib.import_module("analyze")
+        argv = sys.argv
+        sys.argv = ["analyze.py", "--cf", str(paths["cf"]), "--sys", str(paths["sys"]),
+                    "--ler", str(paths["jsonl"]), "--outdir", str(Path(outdir) / "analyze")]
+        try:
+            an.main()
+        finally:
+            sys.argv = argv
+        return len(os.listdir(Path(outdir) / "analyze"))
+
+    fns = {"preprocess": preprocess, "filter": filter_, "cf_extract": cf_extract, "cf_clean": cf_clean,
+           "build_graph": build_graph, "vis": vis, "analyze": analyze}
+    for name in stages:
+        results[name] = measure(fns[name])
+        print(f"  {name:<12} {results[name]['seconds']:>9.3f}s  peak RSS {results[name]['peak_mb'] or 0:>8.1f} MB  "
+              f"items={results[name]['items']}")
+    return results
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+def compare(a_path, b_path):
+    a = json.loads(Path(a_path).read_text(encoding="utf-8"))
+    b = json.loads(Path(b_path).read_text(encoding="utf-8"))
+    print(f"A: {a_path} (size={a['meta']['size']}, rev={a['meta']['git_rev']})")
+    print(f"B: {b_path} (size={b['meta']['size']}, rev={b['meta']['git_rev']})")
+    if a["meta"].get("memory") != b["meta"].get("memory"):
+        # results without "memory" were timed under tracemalloc: seconds and MB are not comparable
+        print("note: A and B measured memory differently "
+              f"({a['meta'].get('memory', 'tracemalloc')} vs {b['meta'].get('memory', 'tracemalloc')})")
+    print(f"{'stage':<12}{'A s':>10}{'B s':>10}{'B/A':>8}{'A MB':>10}{'B MB':>10}")
+    for name in [s for s in STAGES if s in a["stages"] and s in b["stages"]]:
+        sa, sb = a["stages"][name], b["stages"][name]
+        ratio = sb["seconds"] / sa["seconds"] if sa["seconds"] else float("nan")
+        print(f"{name:<12}{sa['seconds']:>10.3f}{sb['seconds']:>10.3f}{ratio:>8.2f}"
+              f"{sa['peak_mb'] or 0:>10.1f}{sb['peak_mb'] or 0:>10.1f}")
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        ap = argparse.ArgumentParser(prog="benchmark.py compare")
+        ap.add_argument("a")
+        ap.add_argument("b")
+        args = ap.parse_args(sys.argv[2:])
+        compare(args.a, args.b)
+        return
+
+    ap = argparse.ArgumentParser(description="Offline VisLER pipeline benchmark.")
+    ap.add_argument("--size", type=int, default=1000, help="number of synthetic LERs (1k-1M)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--stages", nargs="*", default=STAGES, choices=STAGES)
+    ap.add_argument("--workdir", default=None, help="keep the synthetic corpus here (default: temp dir)")
+    ap.add_argument("--out", default=None, help="results JSON (default: bench/results_<size>.json)")
+    args = ap.parse_args()
+
+    out = Path(args.out or f"bench/results_{args.size}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="visler_bench_") as tmp:
+        workdir = Path(args.workdir or tmp)
+        t0 = time.perf_counter()
+        paths = synthesize(args.size, workdir, args.seed)
+        synth_s = time.perf_counter() - t0
+        print(f"Synthesized {args.size} LERs in {synth_s:.2f}s -> {workdir}")
+        stages = run_stages(paths, workdir, args.stages)
+
+    result = {
+        "meta": {"size": args.size, "seed": args.seed, "git_rev": _git_rev(),
+                 "python": platform.python_version(), "platform": platform.platform(),
+                 "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "synth_seconds": round(synth_s, 3),
+                 "memory": "rss"},
+        "stages": stages,
+    }
+    out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    print(f"Wrote {out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,15 @@
 
 import json, os, sys
 
+import profiling
+from compact_corpus import CompactCorpus
+from graph_edges import cartesian_edges, infer_edges, settings as edge_settings
+from schema import canonical_class
+
 SCHEMA_PATH = os.environ.get("GRAPH_SCHEMA_PATH", "data/graph_schema.json")
 INPUT_JSONL = os.environ.get("EXTRACTED_JSONL_PATH", "extracted_keyword.jsonl")
 OUTPUT_JSON = os.environ.get("GRAPH_OUTPUT_PATH", "graph_text.json")
+LABEL_PRIORITY = ["extraction_text", "text"]
 
 def _truncate(s: str, n: int = 60) -> str:
     s = (s or "")
@@ -13,31 +19,19 @@ def load_schema(path: str):
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def load_jsonl(path: str):
-    docs = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            docs.append(json.loads(line))
-    return docs
-
 def build_graph_for_doc(doc: dict, schema: dict, doc_idx: int):
     extractions = doc.get("Extractions") or []
     disp = schema.get("display", {})
-    label_priority = disp.get("label_field_priority", ["extraction_text", "text"])
+    label_priority = disp.get("label_field_priority", LABEL_PRIORITY)
     trunc_n = int(disp.get("truncate", 60))
 
     nodes = []
-    edges = []
     by_cls = {}
+    spans = {}
 
     # 1) nodes
     for i, e in enumerate(extractions):
-        cls = e.get("extraction_class") or "Unknown"
-        if cls == "Corrective_Action":
-            cls = "CorrectiveAction"
+        cls = canonical_class(e.get("extraction_class")) or e.get("extraction_class") or "Unknown"
         node_id = f"d{doc_idx}_n{i}"
         # label choose by priority
         val = None
@@ -52,44 +46,90 @@ def build_graph_for_doc(doc: dict, schema: dict, doc_idx: int):
             "label": label,
             "group": cls,
             "title": title,
-            "attributes": e.get("attributes", {})
+            "attributes": e.get("attributes") or {}
         })
         by_cls.setdefault(cls, []).append(node_id)
+        ci = e.get("char_interval") or {}
+        if ci.get("start_pos") is not None and ci.get("end_pos") is not None:
+            spans[node_id] = (int(ci["start_pos"]), int(ci["end_pos"]))
+
+    # 2) edges by rules (GRAPH_EDGES=proximity: by sentence / distance, see graph_edges.py)
+    edges = infer_edges(by_cls, spans, schema.get("edge_rules", []), doc.get("text"), edge_settings(schema))
+
+    return {"nodes": nodes, "edges": edges}
 
-    # 2) edges by rules
-    rules = schema.get("edge_rules", [])
-    for r in rules:
-        src_cls, dst_cls = r.get("from"), r.get("to")
-        rel = r.get("relation") or ""
-        src_ids = by_cls.get(src_cls, [])
-        dst_ids = by_cls.get(dst_cls, [])
+def rule_edges(by_cls: dict, schema: dict):
+    """Every node of `from` x every node of `to` for each edge rule."""
+    return cartesian_edges(by_cls, schema.get("edge_rules", []))
 
-        # special rule: CorrectiveAction -> Procedure_or_Regulation else Outcome
-        if src_cls == "CorrectiveAction" and dst_cls == "Outcome":
-            # only create CA->Outcome if there is NO Procedure_or_Regulation
-            if by_cls.get("Procedure_or_Regulation"):
-                continue
+def label_fields(schema: dict):
+    """Extraction keys besides extraction_text that node labels can come from
+    (the `extra_fields` a CompactCorpus needs for build_graph_from_corpus)."""
+    priority = schema.get("display", {}).get("label_field_priority", LABEL_PRIORITY)
+    return [k for k in priority if k != "extraction_text"]
 
-        for s in src_ids:
-            for d in dst_ids:
-                edges.append({"from": s, "to": d, "label": rel})
+def build_graph_from_corpus(corpus, doc_idx: int, schema: dict):
+    """Same graph as `build_graph_for_doc`, read from a CompactCorpus (built with
+    extra_fields=label_fields(schema))."""
+    disp = schema.get("display", {})
+    label_priority = disp.get("label_field_priority", LABEL_PRIORITY)
+    trunc_n = int(disp.get("truncate", 60))
+    names = [canonical_class(c) or c for c in corpus.class_names]
+    texts = corpus.texts.values
+
+    nodes = []
+    by_cls = {}
+    spans = {}
+    for i, row in enumerate(corpus.rows(doc_idx)):
+        cls = names[corpus.cls[row]]
+        node_id = f"d{doc_idx}_n{i}"
+        # label choose by priority
+        val = None
+        for key in label_priority:
+            v = texts[corpus.text_id[row]] if key == "extraction_text" else corpus.field(key, row)
+            if v:
+                val = v
+                break
+        nodes.append({
+            "id": node_id,
+            "label": _truncate(str(val or cls), trunc_n),
+            "group": cls,
+            "title": str(val or cls),
+            "attributes": corpus.attributes(row)
+        })
+        by_cls.setdefault(cls, []).append(node_id)
+        if corpus.start[row] >= 0 and corpus.end[row] >= 0:
+            spans[node_id] = (corpus.start[row], corpus.end[row])
 
+    text = corpus.doc_texts[doc_idx] if corpus.doc_texts else None
+    edges = infer_edges(by_cls, spans, schema.get("edge_rules", []), text, edge_settings(schema))
     return {"nodes": nodes, "edges": edges}
 
 def main():
-    schema = load_schema(SCHEMA_PATH)
-    docs = load_jsonl(INPUT_JSONL)
+    # PROFILE=1: per-stage time / memory -> metrics/build_graph_profile.json (profiling.py)
+    profiling.start("build_graph")
+    with profiling.stage("load") as st:
+        schema = load_schema(SCHEMA_PATH)
+        # abstracts are only needed for the sentences of GRAPH_EDGES=proximity
+        corpus = CompactCorpus.from_jsonl(INPUT_JSONL, keep_text=edge_settings(schema)["mode"] == "proximity",
+                                          extra_fields=label_fields(schema))
+        st["items"] = len(corpus)
 
     out = []
-    for idx, doc in enumerate(docs):
-        ler = doc.get("ler") or doc.get("LER") or f"doc_{idx}"
-        graph = build_graph_for_doc(doc, schema, idx)
-        out.append({"ler": ler, "graph": graph})
-
-    with open(OUTPUT_JSON, "w", encoding="utf-8") as f:
-        json.dump(out, f, ensure_ascii=False, indent=2)
+    with profiling.stage("transform") as st:
+        for idx in range(len(corpus)):
+            ler = corpus.lers[idx] or f"doc_{idx}"
+            graph = build_graph_from_corpus(corpus, idx, schema)
+            out.append({"ler": ler, "graph": graph})
+        st["items"] = len(out)
+        st["edges"] = sum(len(g["graph"]["edges"]) for g in out)
+
+    with profiling.stage("write"):
+        with open(OUTPUT_JSON, "w", encoding="utf-8") as f:
+            json.dump(out, f, ensure_ascii=False, indent=2)
 
     print(f"Wrote {OUTPUT_JSON} with {len(out)} graphs.")
+    profiling.finish()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# cascade.py
+"""
+Confidence-gated cascade for the extraction scripts.
+
+A small multinomial naive Bayes classifier over the abstract's words predicts
+the Cause code (MA1 ... NA-OP); the word evidence is scaled down to at most
+`evidence` words so the posteriors stay usable as confidences. Abstracts it is confident about
+(posterior >= threshold) are answered locally: the Cause with the predicted
+category/code on the sentence that best supports it, plus the rule-based
+Operating_Mode / Power_Level (rule_extract.py). Everything else, and an
+`audit` fraction of the confident ones, goes to the model.
+
+The classifier never trains on the abstracts it is about to route (they are
+left out of the training set even when an earlier output of the same run
+contains them), nor on records it answered itself: those carry
+`"Route": "local"` and are skipped by `training_data`, so a run does not
+learn from its own guesses.
+
+Every routing decision is written to `<TELEMETRY_DIR>/<run>_cascade.jsonl`
+together with the model's primary Cause code when the model was called, and
+`finish()` writes `<run>_cascade.json`: local share, agreement of the local
+code with the model, and per threshold the share that would stay local and
+the agreement measured on those.
+
+  CASCADE=1 CASCADE_THRESHOLD=0.9 CASCADE_AUDIT=0.1 python 01_run.py
+  python cascade.py eval extracted_text.jsonl extracted_keyword.jsonl     # cross-validated accuracy / coverage
+"""
+import argparse, json, math, os, random, re
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from schema import CODE_CATEGORIES, canonical_code, primary_cause_of
+from text_index import sentence_spans, tokenize
+
+THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99)
+_CAUSE_CUE = re.compile(r"\b(?:cause[ds]?|due to|result(?:ed)? (?:of|from)|attributed|because)\b", re.I)
+
+class CauseClassifier:
+    def __init__(self, alpha=0.5, evidence=5.0):
+        self.alpha = alpha
+        self.evidence = evidence
+        self.prior, self.loglik, self.unseen, self.vocab = {}, {}, {}, set()
+
+    def fit(self, texts, codes):
+        docs = Counter(codes)
+        words = defaultdict(Counter)
+        for text, code in zip(texts, codes):
+            words[code].update(set(tokenize(text)))    # presence counts keep long abstracts from dominating
+        vocab = {w for c in words.values() for w in c}
+        n = sum(docs.values())
+        self.prior = {c: math.log(k / n) for c, k in docs.items()}
+        self.loglik, self.unseen = {}, {}
+        for c in docs:
+            total = sum(words[c].values()) + self.alpha * (len(vocab) + 1)
+            self.loglik[c] = {w: math.log((k + self.alpha) / total) for w, k in words[c].items()}
+            self.unseen[c] = math.log(self.alpha / total)
+        self.vocab = vocab
+        return self
+
+    def scores(self, text):
+        toks = [t for t in set(tokenize(text)) if t in self.vocab]
+        scale = min(1.0, self.evidence / len(toks)) if toks else 1.0
+        return {c: p + scale * sum(self.loglik[c].get(t, self.unseen[c]) for t in toks) for c, p in self.prior.items()}
+
+    def predict_proba(self, text):
+        """[(code, posterior)] best first."""
+        s = self.scores(text)
+        if not s:
+            return []
+        top = max(s.values())
+        z = sum(math.exp(v - top) for v in s.values())
+        return sorted(((c, math.exp(v - top) / z) for c, v in s.items()), key=lambda x: (-x[1], x[0]))
+
+    @staticmethod
+    def training_data(jsonl_paths=(), examples=(), exclude=()):
+        """(texts, codes) from extraction JSONLs and examples.json cases with a Cause code (first label per text).
+
+        Texts in `exclude` and records the cascade answered locally are left out.
+        """
+        texts, codes, seen = [], [], {str(t).strip() for t in exclude}
+        for path in jsonl_paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    doc = json.loads(line)
+                    if doc.get("Route") == "local":
+                        continue
+                    code = (primary_cause_of(doc) or {}).get("code")
+                    text = str(doc.get("text") or "").strip()
+                    if code in CODE_CATEGORIES and text and text not in seen:
+                        seen.add(text)
+                        texts.append(doc["text"]); codes.append(code)
+        for case in examples:
+            cause = case.get("Cause")
+            cause = cause[0] if isinstance(cause, list) and cause else cause
+            code = canonical_code(((cause or {}).get("attributes") or {}).get("code"))
+            text = str(case.get("text") or "").strip()
+            if code in CODE_CATEGORIES and text and text not in seen:
+                seen.add(text)
+                texts.append(case["text"]); codes.append(code)
+        return texts, codes
+
+def cause_sentence(text, classifier, code):
+    """(start, end) of the sentence that best supports `code` (cause wording first)."""
+    best, best_key = None, None
+    for start, end in sentence_spans(text):
+        s = text[start:end]
+        sc = classifier.scores(s)
+        margin = sc[code] - max(v for c, v in sc.items() if c != code) if len(sc) > 1 else 0.0
+        key = (bool(_CAUSE_CUE.search(s)), margin)
+        if best_key is None or key > best_key:
+            best, best_key = (start, end), key
+    return best
+
+class Cascade:
+    def __init__(self, classifier, threshold=0.9, audit=0.0, log_path=None, seed=0):
+        self.classifier = classifier
+        self.threshold = threshold
+        self.audit = audit
+        self.rng = random.Random(seed)
+        self.log_path = Path(log_path) if log_path else None
+        self._fh = open(self.log_path, "w", encoding="utf-8") if self.log_path else None
+        self.decisions = []
+
+    def route(self, key, text):
+        """{"key", "code", "confidence", "route": local|model, "audit"}"""
+        proba = self.classifier.predict_proba(text)
+        code, p = proba[0] if proba else (None, 0.0)
+        confident = code is not None and p >= self.threshold
+        audit = confident and self.rng.random() < self.audit
+        return {"key": key, "code": code, "confidence": round(p, 4),
+                "route": "local" if confident and not audit else "model", "audit": audit}
+
+    def local_extractions(self, text, decision):
+        """Cause on the best-supporting sentence (the caller adds the rule classes)."""
+        text = str(text or "")
+        span = cause_sentence(text, self.classifier, decision["code"])
+        if span is None:
+            return []
+        start, end = span
+        return [{"extraction_class": "Cause", "extraction_text": text[start:end],
+                 "attributes": {"category": CODE_CATEGORIES[decision["code"]], "code": decision["code"]},
+                 "char_interval": {"start_pos": start, "end_pos": end}}]
+
+    def record(self, decision, model_extractions=None):
+        """Logs the decision; for model-routed ones, with the model's primary Cause code."""
+        rec = dict(decision)
+        if decision["route"] == "model":
+            rec["model_code"] = (primary_cause_of({"Extractions": model_extractions}) or {}).get("code")
+            rec["agree"] = rec["model_code"] == decision["code"] if rec["model_code"] else None
+        self.decisions.append(rec)
+        if self._fh:
+            self._fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self._fh.flush()
+        return rec
+
+    def summary(self):
+        recs = self.decisions
+        judged = [r for r in recs if r.get("agree") is not None]
+        out = {
+            "threshold": self.threshold, "audit": self.audit, "records": len(recs),
+            "local": sum(r["route"] == "local" for r in recs),
+            "model": sum(r["route"] == "model" for r in recs),
+            "audited": sum(r["audit"] for r in recs),
+            "agreement": round(sum(r["agree"] for r in judged) / len(judged), 4) if judged else None,
+            "agreement_audited": None,
+            "by_threshold": [],
+        }
+        audited = [r for r in judged if r["audit"]]
+        if audited:
+            out["agreement_audited"] = round(sum(r["agree"] for r in audited) / len(audited), 4)
+        for t in THRESHOLDS:
+            above = [r for r in judged if r["confidence"] >= t]
+            out["by_threshold"].append({
+                "threshold": t,
+                "local_share": round(sum(r["confidence"] >= t for r in recs) / len(recs), 4) if recs else None,
+                "judged": len(above),
+                "agreement": round(sum(r["agree"] for r in above) / len(above), 4) if above else None,
+            })
+        return out
+
+    def finish(self, summary_path=None):
+        if self._fh:
+            self._fh.close()
+        summary = self.summary()
+        summary_path = summary_path or (self.log_path.with_suffix(".json") if self.log_path else None)
+        if summary_path:
+            Path(summary_path).write_text(json.dumps(summary, indent=2), encoding="utf-8")
+        agree = "n/a" if summary["agreement"] is None else f"{summary['agreement']:.1%}"
+        print(f"[Cascade] {summary['local']} local / {summary['model']} model ({summary['audited']} audits), "
+              f"local vs model code agreement {agree}")
+        return summary
+
+def from_env(run_name, train_paths, examples_path=None, routed_texts=()):
+    """Cascade configured by CASCADE / CASCADE_THRESHOLD / CASCADE_AUDIT / CASCADE_TRAIN, or None.
+
+    `routed_texts` are the abstracts this run will route; they are kept out of training.
+    """
+    if os.getenv("CASCADE", "0") == "0":
+        return None
+    paths = [p for p in os.getenv("CASCADE_TRAIN", "").split(os.pathsep) if p] or list(train_paths)
+    examples = []
+    if examples_path and os.path.exists(examples_path):
+        with open(examples_path, "r", encoding="utf-8") as f:
+            examples = json.load(f)
+    texts, codes = CauseClassifier.training_data(paths, examples, exclude=routed_texts)
+    if not texts:
+        print("[Cascade] no labelled abstracts outside this run to train on (set CASCADE_TRAIN to a "
+              "separate labelled set); every abstract goes to the model")
+        return None
+    classifier = CauseClassifier().fit(texts, codes)
+    outdir = Path(os.getenv("TELEMETRY_DIR", "metrics"))
+    outdir.mkdir(parents=True, exist_ok=True)
+    print(f"[Cascade] classifier trained on {len(texts)} abstracts ({len(set(codes))} codes)")
+    return Cascade(classifier, float(os.getenv("CASCADE_THRESHOLD", "0.9")), float(os.getenv("CASCADE_AUDIT", "0.1")),
+                   outdir / f"{run_name}_cascade.jsonl")
+
+def main():
+    ap = argparse.ArgumentParser(description="Cross-validate the local Cause-code classifier of the cascade.")
+    ap.add_argument("command", choices=["eval"])
+    ap.add_argument("jsonl", nargs="+")
+    ap.add_argument("--folds", type=int, default=5)
+    args = ap.parse_args()
+
+    texts, codes = CauseClassifier.training_data(args.jsonl)
+    order = list(range(len(texts)))
+    random.Random(0).shuffle(order)
+    preds = []
+    for k in range(args.folds):
+        test = set(order[k::args.folds])
+        clf = CauseClassifier().fit([texts[i] for i in order if i not in test], [codes[i] for i in order if i not in test])
+        for i in test:
+            code, p = clf.predict_proba(texts[i])[0]
+            preds.append((p, code == codes[i]))
+    print(f"{len(texts)} labelled abstracts, {len(set(codes))} codes, {args.folds}-fold")
+    print(f"{'threshold':>9} {'local':>7} {'accuracy':>9}")
+    for t in (0.0,) + THRESHOLDS:
+        kept = [ok for p, ok in preds if p >= t]
+        acc = f"{sum(kept) / len(kept):.1%}" if kept else "n/a"
+        print(f"{t:>9.2f} {len(kept) / len(preds):>7.1%} {acc:>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# cause_cube.py
+"""
+Pre-aggregated count cube over the merged LER table.
+
+The cube holds one row per distinct combination of
+
+    Event_YYYYMM, Extracted_Cause_Category, Extracted_Cause_Code,
+    System_Category, Facility_Name, Unit, CFR, Reportable_to_IRIS
+
+with a `count` measure. Dimensions are dictionary-encoded (int32 codes,
+-1 = missing) and saved with np.savez_compressed, so roll-ups, rolling
+windows and year-over-year tables are answered from a few thousand rows
+instead of re-reading the JSONL. `Event_Year` is derived from Event_YYYYMM.
+
+  python cause_cube.py out_extracted_code/cube.npz rollup --by Event_Year Extracted_Cause_Category
+  python cause_cube.py out_extracted_code/cube.npz yoy --by Extracted_Cause_Category
+  python cause_cube.py out_extracted_code/cube.npz rolling --window 3 --where Facility_Name="Vogtle Electric Generating Plant"
+"""
+import argparse, json
+
+# NumPy / pandas are imported by the methods, so `visler.py cube --help` does not load them
+
+DIMENSIONS = [
+    "Event_YYYYMM", "Extracted_Cause_Category", "Extracted_Cause_Code", "System_Category",
+    "Facility_Name", "Unit", "CFR", "Reportable_to_IRIS",
+]
+DERIVED = {"Event_Year": ("Event_YYYYMM", lambda v: v.str[:4])}
+
+class CauseCube:
+    def __init__(self, codes, labels, counts):
+        self.codes = codes        # {dim: int32 array}
+        self.labels = labels      # {dim: [label, ...]}
+        self.counts = counts      # int64 array
+
+    def __len__(self):
+        return len(self.counts)
+
+    @classmethod
+    def from_frame(cls, df, dims=DIMENSIONS):
+        import numpy as np
+        import pandas as pd
+        dims = [d for d in dims if d in df.columns]
+        codes, labels = {}, {}
+        for d in dims:
+            c, uniq = pd.factorize(df[d].astype(object).where(df[d].notna(), None), use_na_sentinel=True)
+            codes[d] = c.astype(np.int32)
+            labels[d] = [str(u) for u in uniq]
+        if not dims:
+            return cls({}, {}, np.array([len(df)], dtype=np.int64))
+        key = np.stack([codes[d] for d in dims], axis=1)
+        uniq_rows, counts = np.unique(key, axis=0, return_counts=True)
+        return cls({d: uniq_rows[:, i].astype(np.int32) for i, d in enumerate(dims)}, labels,
+                   counts.astype(np.int64))
+
+    def merge(self, other, sign=1):
+        """New cube with the counts of `other` added (sign=-1: removed); empty cells are dropped."""
+        import numpy as np
+        dims = self.dims + [d for d in other.dims if d not in self.codes]
+        labels, cols = {}, []
+        for d in dims:
+            lab = list(self.labels.get(d, []))
+            pos = {l: i for i, l in enumerate(lab)}
+            for l in other.labels.get(d, []):
+                if l not in pos:
+                    pos[l] = len(lab); lab.append(l)
+            remap = np.array([pos[l] for l in other.labels.get(d, [])] + [-1], dtype=np.int32)
+            mine = self.codes.get(d, np.full(len(self.counts), -1, dtype=np.int32))
+            theirs = remap[other.codes[d]] if d in other.codes else np.full(len(other.counts), -1, dtype=np.int32)
+            labels[d] = lab
+            cols.append(np.concatenate([mine, theirs]))
+        counts = np.concatenate([self.counts, sign * other.counts])
+        if not dims:
+            return CauseCube({}, {}, np.array([counts.sum()], dtype=np.int64))
+        uniq_rows, inv = np.unique(np.stack(cols, axis=1), axis=0, return_inverse=True)
+        summed = np.bincount(inv.ravel(), weights=counts, minlength=len(uniq_rows)).astype(np.int64)
+        keep = summed > 0
+        return CauseCube({d: uniq_rows[keep, i].astype(np.int32) for i, d in enumerate(dims)}, labels,
+                         summed[keep])
+
+    def save(self, path):
+        import numpy as np
+        np.savez_compressed(path, counts=self.counts, labels=json.dumps(self.labels, ensure_ascii=False),
+                            **{f"dim__{d}": c for d, c in self.codes.items()})
+
+    @classmethod
+    def load(cls, path):
+        import numpy as np
+        z = np.load(path, allow_pickle=False)
+        labels = json.loads(str(z["labels"]))
+        codes = {k[5:]: z[k] for k in z.files if k.startswith("dim__")}
+        return cls(codes, labels, z["counts"])
+
+    @property
+    def dims(self):
+        return list(self.codes)
+
+    def frame(self, dims=None):
+        """Decoded cube rows (labels, missing -> NaN) for the requested dimensions."""
+        import pandas as pd
+        dims = self.dims if dims is None else dims
+        out = {}
+        for d in dims:
+            if d in DERIVED:
+                base, fn = DERIVED[d]
+                out[d] = fn(self._decode(base))
+            else:
+                out[d] = self._decode(d)
+        out = pd.DataFrame(out)
+        out["count"] = self.counts
+        return out
+
+    def _decode(self, d):
+        import numpy as np
+        import pandas as pd
+        lab = np.array(self.labels[d] + [None], dtype=object)
+        return pd.Series(lab[self.codes[d]], dtype=object)
+
+    def _mask(self, where):
+        import numpy as np
+        mask = np.ones(len(self.counts), dtype=bool)
+        for d, want in (where or {}).items():
+            want = {str(w) for w in (want if isinstance(want, (list, tuple, set)) else [want])}
+            if d in DERIVED:
+                vals = self.frame([d])[d]
+                mask &= vals.isin(want).to_numpy()
+            else:
+                ids = [i for i, lab in enumerate(self.labels[d]) if lab in want]
+                mask &= np.isin(self.codes[d], ids)
+        return mask
+
+    def rollup(self, by, where=None, dropna=True):
+        """Counts grouped by `by` (subset of dimensions + Event_Year), filtered by `where`."""
+        import pandas as pd
+        by = list(by)
+        f = self.frame(by)[self._mask(where)]
+        if not by:
+            return pd.DataFrame({"count": [int(f["count"].sum())]})
+        return (f.groupby(by, as_index=False, dropna=dropna)["count"].sum()
+                 .sort_values(by).reset_index(drop=True))
+
+    def pivot(self, index, columns, where=None, top=None):
+        r = self.rollup([index, columns], where)
+        if top:
+            keep = r.groupby(columns)["count"].sum().sort_values(ascending=False).head(top).index
+            r = r[r[columns].isin(keep)]
+        return r.pivot(index=index, columns=columns, values="count").fillna(0).sort_index()
+
+    def rolling(self, window=3, by="Extracted_Cause_Category", where=None, top=None):
+        """Rolling-window sums over consecutive months (missing months count as 0)."""
+        import pandas as pd
+        piv = self.pivot("Event_YYYYMM", by, where, top)
+        piv = piv[piv.index.str.match(r"^\d{4}-\d{2}$")]
+        if piv.empty:
+            return piv
+        months = pd.period_range(piv.index.min(), piv.index.max(), freq="M").astype(str)
+        return piv.reindex(months, fill_value=0).rolling(window, min_periods=1).sum()
+
+    def yoy(self, by="Extracted_Cause_Category", where=None):
+        """Counts per Event_Year with absolute and relative change vs the previous year."""
+        import numpy as np
+        import pandas as pd
+        r = self.rollup(["Event_Year", by], where)
+        r = r[r["Event_Year"].str.match(r"^\d{4}$", na=False)]
+        piv = r.pivot(index=by, columns="Event_Year", values="count").fillna(0)
+        piv = piv.reindex(columns=sorted(piv.columns))
+        rows = []
+        for key, s in piv.iterrows():
+            for prev, cur in zip(piv.columns[:-1], piv.columns[1:]):
+                rows.append({by: key, "year": cur, "count": int(s[cur]), "prev": int(s[prev]),
+                             "delta": int(s[cur] - s[prev]),
+                             "pct_change": (s[cur] - s[prev]) / s[prev] if s[prev] else np.nan})
+        return pd.DataFrame(rows)
+
+def _parse_where(items):
+    where = {}
+    for item in items or []:
+        k, _, v = item.partition("=")
+        where.setdefault(k, []).append(v)
+    return where
+
+def main():
+    ap = argparse.ArgumentParser(description="Query the pre-aggregated cause cube.")
+    ap.add_argument("cube", nargs="?", default="out_extracted_code/cube.npz")
+    ap.add_argument("query", choices=["rollup", "rolling", "yoy", "info"], nargs="?", default="info")
+    ap.add_argument("--by", nargs="*", default=None)
+    ap.add_argument("--where", nargs="*", default=None, help="DIM=VALUE (repeat a DIM for OR)")
+    ap.add_argument("--window", type=int, default=3)
+    ap.add_argument("--top", type=int, default=None)
+    ap.add_argument("--out", default=None, help="write the result as CSV")
+    args = ap.parse_args()
+
+    cube = CauseCube.load(args.cube)
+    where = _parse_where(args.where)
+    if args.query == "info":
+        print(f"{len(cube)} cells, {int(cube.counts.sum())} records")
+        for d in cube.dims:
+            print(f"  {d}: {len(cube.labels[d])} values")
+        return
+    if args.query == "rollup":
+        res = cube.rollup(args.by or ["Extracted_Cause_Category"], where)
+    elif args.query == "rolling":
+        res = cube.rolling(args.window, (args.by or ["Extracted_Cause_Category"])[0], where, args.top)
+    else:
+        res = cube.yoy((args.by or ["Extracted_Cause_Category"])[0], where)
+    print(res.to_string())
+    if args.out:
+        res.to_csv(args.out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# cause_stats.py
+"""
+Uncertainty for the category-level statistics in analyze.py.
+
+All resampling is vectorized: a bootstrap draws every resample at once
+(multinomial / binomial draws of shape (n_boot, ...)), and the permutation
+test draws all permuted contingency tables together from their
+margin-conditional (hypergeometric) distribution.
+"""
+import numpy as np
+import pandas as pd
+
+N_BOOT = 2000
+N_PERM = 2000
+ALPHA = 0.05
+
+def _rng(seed):
+    return seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+def hhi_from_counts(counts):
+    """HHI along the last axis (0..1); NaN where the total is 0."""
+    c = np.asarray(counts, dtype=float)
+    tot = c.sum(axis=-1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        shares = c / tot
+    out = (shares ** 2).sum(axis=-1)
+    return np.where(tot[..., 0] > 0, out, np.nan)
+
+def bootstrap_ratio(successes, totals, n_boot=N_BOOT, alpha=ALPHA, seed=0):
+    """Percentile CIs for many proportions at once; returns (ratio, lo, hi) arrays."""
+    k = np.asarray(successes, dtype=np.int64)
+    n = np.asarray(totals, dtype=np.int64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p = np.where(n > 0, k / np.maximum(n, 1), np.nan)
+    draws = _rng(seed).binomial(n, np.nan_to_num(p), size=(n_boot, len(n)))
+    lo, hi = np.full(len(n), np.nan), np.full(len(n), np.nan)
+    has = n > 0                     # empty groups have no CI (and would be all-NaN slices)
+    if has.any():
+        lo[has], hi[has] = np.quantile(draws[:, has] / n[has], [alpha / 2, 1 - alpha / 2], axis=0)
+    return p, lo, hi
+
+def chi2_stat(tables):
+    """Pearson chi-square along the last two axes of (…, r, c) tables."""
+    t = np.asarray(tables, dtype=float)
+    n = t.sum(axis=(-2, -1), keepdims=True)
+    expected = t.sum(axis=-1, keepdims=True) * t.sum(axis=-2, keepdims=True) / np.where(n > 0, n, 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        terms = np.where(expected > 0, (t - expected) ** 2 / expected, 0.0)
+    return terms.sum(axis=(-2, -1))
+
+def cramers_v(tables):
+    t = np.asarray(tables, dtype=float)
+    r = (t.sum(axis=-1) > 0).sum(axis=-1)
+    c = (t.sum(axis=-2) > 0).sum(axis=-1)
+    n = t.sum(axis=(-2, -1))
+    k = np.minimum(r, c) - 1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where((k > 0) & (n > 0), np.sqrt(chi2_stat(t) / (n * np.maximum(k, 1))), np.nan)
+
+def _encode(values):
+    codes, labels = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+    return codes, list(labels)
+
+def permuted_tables(row_n, col_n, n_perm=N_PERM, seed=0):
+    """
+    (n_perm, R, C) contingency tables under random relabelling with both margins fixed.
+
+    Shuffling the column labels of n records is equivalent to filling the table
+    cell by cell with hypergeometric draws, so each cell is one vectorized draw
+    over all permutations and the cost does not depend on n.
+    """
+    rng = _rng(seed)
+    row_n = np.asarray(row_n, dtype=np.int64)
+    R, C = len(row_n), len(col_n)
+    remaining = np.tile(np.asarray(col_n, dtype=np.int64), (n_perm, 1))
+    tabs = np.zeros((n_perm, R, C), dtype=np.int64)
+    for i in range(R - 1):
+        need = np.full(n_perm, row_n[i], dtype=np.int64)
+        pool = remaining.sum(axis=1)
+        for j in range(C - 1):
+            good = remaining[:, j]
+            x = rng.hypergeometric(good, pool - good, need)
+            tabs[:, i, j] = x
+            need -= x
+            pool -= good
+            remaining[:, j] -= x
+        tabs[:, i, C - 1] = need
+        remaining[:, C - 1] -= need
+    tabs[:, R - 1, :] = remaining
+    return tabs
+
+def association(rows, cols, n_boot=N_BOOT, n_perm=N_PERM, alpha=ALPHA, seed=0):
+    """
+    Category x system association and per-category concentration.
+
+    Returns (summary dict, per-row DataFrame). The summary holds chi-square,
+    its permutation p-value, Cramér's V with a bootstrap CI; the DataFrame
+    has for every row label its N, HHI with bootstrap CI and the permutation
+    p-value of "HHI higher than under random system assignment".
+    """
+    rows, cols = pd.Series(rows, dtype=object), pd.Series(cols, dtype=object)
+    keep = (rows.notna() & cols.notna()).to_numpy()
+    r_codes, r_labels = _encode(rows[keep])
+    c_codes, c_labels = _encode(cols[keep])
+    R, C, n = len(r_labels), len(c_labels), len(r_codes)
+    if n == 0 or R == 0 or C == 0:
+        return {"n": 0}, pd.DataFrame(columns=["label", "N", "HHI", "HHI_ci_low", "HHI_ci_high", "HHI_perm_p"])
+    rng = _rng(seed)
+    table = np.bincount(r_codes * C + c_codes, minlength=R * C).reshape(R, C)
+
+    chi2 = float(chi2_stat(table))
+    v = float(cramers_v(table))
+    row_hhi = hhi_from_counts(table)
+
+    # permutation null (system labels shuffled, row margins fixed)
+    tabs = permuted_tables(table.sum(axis=1), table.sum(axis=0), n_perm, rng)
+    ge_chi2 = int((chi2_stat(tabs) >= chi2 - 1e-12).sum())
+    ge_hhi = (hhi_from_counts(tabs) >= row_hhi[None, :] - 1e-12).sum(axis=0)
+
+    # bootstrap: resample the whole table (Cramér's V) and each row (HHI)
+    boot_tabs = rng.multinomial(n, (table / n).ravel(), size=n_boot).reshape(n_boot, R, C)
+    boot_v = cramers_v(boot_tabs)
+    # V is undefined (NaN in every resample) with a single row or system column
+    v_lo, v_hi = (np.nan, np.nan) if np.isnan(boot_v).all() else np.nanquantile(boot_v, [alpha / 2, 1 - alpha / 2])
+    row_n = table.sum(axis=1)
+    hhi_lo, hhi_hi = np.full(R, np.nan), np.full(R, np.nan)
+    for i in range(R):
+        if row_n[i]:
+            draws = rng.multinomial(row_n[i], table[i] / row_n[i], size=n_boot)
+            hhi_lo[i], hhi_hi[i] = np.quantile(hhi_from_counts(draws), [alpha / 2, 1 - alpha / 2])
+
+    dof = (int((table.sum(axis=1) > 0).sum()) - 1) * (int((table.sum(axis=0) > 0).sum()) - 1)
+    summary = {
+        "n": int(n), "rows": R, "cols": C, "chi2": chi2, "dof": dof,
+        "chi2_perm_p": (ge_chi2 + 1) / (n_perm + 1),
+        "cramers_v": v, "cramers_v_ci_low": float(v_lo), "cramers_v_ci_high": float(v_hi),
+        "n_boot": n_boot, "n_perm": n_perm, "alpha": alpha,
+    }
+    per_row = pd.DataFrame({
+        "label": r_labels, "N": row_n.astype(int), "HHI": row_hhi,
+        "HHI_ci_low": hhi_lo, "HHI_ci_high": hhi_hi,
+        "HHI_perm_p": (ge_hhi + 1) / (n_perm + 1),
+    })
+    return summary, per_row
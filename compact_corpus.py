@@ -0,0 +1,220 @@
+# compact_corpus.py
+"""
+Columnar in-memory form of the extracted_*.jsonl corpus.
+
+Instead of one dict per extraction, all extractions of the corpus live in
+flat arrays (CSR layout: `doc_ptr[i]:doc_ptr[i+1]` are the rows of document
+i):
+
+    cls          int16   interned class id (`class_names[id]`)
+    start / end  int32   char_interval, -1 when missing
+    text_id      int32   id in the extraction-text pool
+    attrs[key]   int32   id in the attribute-value pool, -1 when absent
+    fields[key]  int32   same for other top-level extraction keys requested
+                         with `extra_fields` (e.g. graph label fields)
+
+Repeated strings (class names, extraction texts, attribute values) are
+stored once. `numpy()` exposes the arrays without copying.
+"""
+import json
+import sys
+from array import array
+
+import numpy as np
+
+from doc_loader import DocStore
+
+class StringPool:
+    __slots__ = ("values", "ids")
+
+    def __init__(self):
+        self.values = []
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def intern(self, s):
+        i = self.ids.get(s)
+        if i is None:
+            i = self.ids[s] = len(self.values)
+            self.values.append(s)
+        return i
+
+    def get(self, i):
+        return self.values[i] if i >= 0 else None
+
+    def nbytes(self):
+        return sys.getsizeof(self.values) + sys.getsizeof(self.ids) + sum(sys.getsizeof(v) for v in self.values)
+
+def _attr_key(v):
+    # attribute values are pooled as JSON so that numbers / lists round-trip
+    return json.dumps(v, ensure_ascii=False, sort_keys=True)
+
+class CompactCorpus:
+    __slots__ = ("lers", "meta", "doc_texts", "class_names", "class_ids", "doc_ptr",
+                 "cls", "start", "end", "text_id", "texts", "attr_values", "attrs", "fields")
+
+    def __init__(self):
+        self.lers = []
+        self.meta = []            # per-document metadata dicts (without text / Extractions)
+        self.doc_texts = None     # list of abstracts when keep_text=True
+        self.class_names = []
+        self.class_ids = {}
+        self.doc_ptr = array("q", [0])
+        self.cls = array("h")
+        self.start = array("i")
+        self.end = array("i")
+        self.text_id = array("i")
+        self.texts = StringPool()
+        self.attr_values = StringPool()
+        self.attrs = {}           # attribute key -> array('i')
+        self.fields = {}          # extra extraction key -> array('i') into attr_values
+
+    def __len__(self):
+        return len(self.lers)
+
+    @property
+    def n_extractions(self):
+        return len(self.cls)
+
+    # ---------------------------
+    # building
+    # ---------------------------
+    def class_id(self, name):
+        i = self.class_ids.get(name)
+        if i is None:
+            i = self.class_ids[name] = len(self.class_names)
+            self.class_names.append(name)
+        return i
+
+    def add_doc(self, doc, meta_fields=(), keep_text=False, extra_fields=()):
+        self.lers.append(doc.get("ler") or doc.get("LER"))
+        self.meta.append({k: doc.get(k) for k in meta_fields})
+        if keep_text:
+            if self.doc_texts is None:
+                self.doc_texts = []
+            self.doc_texts.append(doc.get("text") or "")
+        for e in doc.get("Extractions") or []:
+            e = e or {}
+            row = len(self.cls)
+            self.cls.append(self.class_id(e.get("extraction_class") or "Unknown"))
+            ci = e.get("char_interval") or {}
+            s, t = ci.get("start_pos"), ci.get("end_pos")
+            self.start.append(int(s) if s is not None else -1)
+            self.end.append(int(t) if t is not None else -1)
+            self.text_id.append(self.texts.intern(e.get("extraction_text") or ""))
+            for k, v in (e.get("attributes") or {}).items():
+                col = self.attrs.get(k)
+                if col is None:
+                    col = self.attrs[k] = array("i", [-1]) * row
+                col.append(self.attr_values.intern(_attr_key(v)))
+            # pad columns this extraction has no value for
+            for col in self.attrs.values():
+                if len(col) == row:
+                    col.append(-1)
+            for k in extra_fields:
+                col = self.fields.get(k)
+                if col is None:
+                    col = self.fields[k] = array("i", [-1]) * row
+                v = e.get(k)
+                col.append(self.attr_values.intern(_attr_key(v)) if v is not None else -1)
+        self.doc_ptr.append(len(self.cls))
+
+    @classmethod
+    def from_docs(cls, docs, meta_fields=(), keep_text=False, extra_fields=()):
+        corpus = cls()
+        for doc in docs:
+            corpus.add_doc(doc, meta_fields, keep_text, extra_fields)
+        return corpus
+
+    @classmethod
+    def from_jsonl(cls, path, meta_fields=(), keep_text=False, extra_fields=()):
+        fields = ["ler", "LER", "Extractions", *meta_fields] + (["text"] if keep_text else [])
+        with DocStore(path) as store:
+            return cls.from_docs(store.iter_docs(fields), meta_fields, keep_text, extra_fields)
+
+    # ---------------------------
+    # access
+    # ---------------------------
+    def rows(self, i):
+        return range(self.doc_ptr[i], self.doc_ptr[i + 1])
+
+    def attr(self, key, row):
+        col = self.attrs.get(key)
+        if col is None or col[row] < 0:
+            return None
+        return json.loads(self.attr_values.values[col[row]])
+
+    def field(self, key, row):
+        """Value of an `extra_fields` key of one extraction (None when absent)."""
+        col = self.fields[key]
+        return json.loads(self.attr_values.values[col[row]]) if col[row] >= 0 else None
+
+    def attributes(self, row):
+        return {k: json.loads(self.attr_values.values[col[row]])
+                for k, col in self.attrs.items() if col[row] >= 0}
+
+    def extraction(self, row):
+        """Rebuilds the original dict for one extraction row."""
+        s, t = self.start[row], self.end[row]
+        return {
+            "extraction_class": self.class_names[self.cls[row]],
+            "extraction_text": self.texts.values[self.text_id[row]],
+            "attributes": self.attributes(row),
+            "char_interval": {"start_pos": s, "end_pos": t} if s >= 0 and t >= 0 else None,
+        }
+
+    def extractions(self, i):
+        return [self.extraction(r) for r in self.rows(i)]
+
+    def spans(self, i):
+        """(start, end, class name, row) of document i's located extractions, sorted by start."""
+        out = [(self.start[r], self.end[r], self.class_names[self.cls[r]], r)
+               for r in self.rows(i) if self.start[r] >= 0 and self.end[r] >= 0]
+        out.sort()
+        return out
+
+    def numpy(self):
+        """Zero-copy NumPy views of the columns, plus `doc` (document index per row)."""
+        ptr = np.frombuffer(self.doc_ptr, dtype=np.int64)
+        return {
+            "doc_ptr": ptr,
+            "doc": np.repeat(np.arange(len(self.lers)), np.diff(ptr)),
+            "cls": np.frombuffer(self.cls, dtype=np.int16),
+            "start": np.frombuffer(self.start, dtype=np.int32),
+            "end": np.frombuffer(self.end, dtype=np.int32),
+            "text_id": np.frombuffer(self.text_id, dtype=np.int32),
+            **{f"attr:{k}": np.frombuffer(col, dtype=np.int32) for k, col in self.attrs.items()},
+        }
+
+    def decoded_pool(self, pool):
+        """Pool as a NumPy object array (index with an id array; -1 -> last slot = None)."""
+        if pool is self.attr_values:
+            vals = [json.loads(v) for v in pool.values]
+        else:
+            vals = list(pool.values)
+        return np.array(vals + [None], dtype=object)
+
+    def nbytes(self):
+        arrays = [self.doc_ptr, self.cls, self.start, self.end, self.text_id, *self.attrs.values(),
+                  *self.fields.values()]
+        return (sum(a.itemsize * len(a) for a in arrays) + self.texts.nbytes() + self.attr_values.nbytes()
+                + sys.getsizeof(self.lers) + sum(sys.getsizeof(m) for m in self.meta))
+
+def dict_nbytes(docs):
+    """Approximate deep size of the dict-of-dicts form, for comparison with `nbytes()`."""
+    seen = set()
+
+    def size(o):
+        if id(o) in seen:
+            return 0
+        seen.add(id(o))
+        n = sys.getsizeof(o)
+        if isinstance(o, dict):
+            n += sum(size(k) + size(v) for k, v in o.items())
+        elif isinstance(o, (list, tuple)):
+            n += sum(size(v) for v in o)
+        return n
+
+    return sum(size(d) for d in docs)
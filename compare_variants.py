@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# compare_variants.py
+"""
+Compares two extraction outputs of the same corpus (by default the text
+variant of 01_run.py and the keyword variant of 01_run_keyword.py).
+
+Both JSONLs are read once and flattened into numpy arrays (one row per
+extraction: document, class, start, end); documents are aligned by `ler`.
+Spans of the same document and class are joined on the sorted
+(document, class) key and their IoU is computed vectorized; per variant
+a span counts as matched when the other variant has a span of the same
+class with IoU >= `--iou`. On top of that:
+
+  - class agreement: per class, documents where both / only one variant
+    found it (agreement rate and Cohen's kappa),
+  - primary Cause code confusion matrix (schema.primary_cause_of) and
+    code / category agreement,
+  - yield per variant (extractions, located spans, coded Causes per document)
+    and, with the telemetry summaries of both runs, prompt tokens per
+    document and per coded Cause.
+
+  python compare_variants.py                                           # text vs keyword
+  python compare_variants.py a.jsonl b.jsonl --iou 0.5 --out compare_variants.json --confusion cause_confusion.csv
+"""
+import argparse, csv, json, os, time
+
+# NumPy is imported by the functions below (`visler.py compare --help` stays fast)
+
+from doc_loader import DocStore
+from schema import CLASSES, CODE_CATEGORIES, canonical_class, primary_cause_of
+
+DEFAULT_VARIANTS = {
+    "text": ("extracted_text.jsonl", "metrics/extraction_text_summary.json"),
+    "keyword": ("extracted_keyword.jsonl", "metrics/extraction_keyword_summary.json"),
+}
+CODES = list(CODE_CATEGORIES) + ["none"]
+_CODE_ID = {c: i for i, c in enumerate(CODES)}
+_CLASS_ID = {c: i for i, c in enumerate(CLASSES)}
+
+def load_variant(path):
+    """
+    Flattened extractions of one JSONL:
+      lers [n_docs], code [n_docs] (index into CODES),
+      doc / cls / start / end [n_extractions] (start = end = -1 without a char_interval).
+    """
+    import numpy as np
+    lers, codes, doc, cls, start, end = [], [], [], [], [], []
+    with DocStore(path) as store:
+        for k, rec in enumerate(store.iter_docs(["ler", "LER", "text", "Extractions", "Primary_Cause", "Schema_Version"])):
+            lers.append(str(rec.get("ler") or rec.get("LER") or k))
+            codes.append(_CODE_ID.get((primary_cause_of(rec) or {}).get("code"), _CODE_ID["none"]))
+            for e in rec.get("Extractions") or []:
+                c = _CLASS_ID.get(canonical_class((e or {}).get("extraction_class")))
+                if c is None:
+                    continue
+                ci = e.get("char_interval") or {}
+                doc.append(k)
+                cls.append(c)
+                start.append(ci.get("start_pos", -1) if ci.get("start_pos") is not None else -1)
+                end.append(ci.get("end_pos", -1) if ci.get("end_pos") is not None else -1)
+    return {
+        "lers": np.array(lers, dtype=object), "code": np.array(codes, dtype=np.int16),
+        "doc": np.array(doc, dtype=np.int64), "cls": np.array(cls, dtype=np.int16),
+        "start": np.array(start, dtype=np.int64), "end": np.array(end, dtype=np.int64),
+    }
+
+def align_docs(a, b):
+    """(index in a, index in b) of the LERs present in both, in a's order; first record wins on duplicates."""
+    import numpy as np
+    pos_b = {}
+    for i, ler in enumerate(b["lers"]):
+        pos_b.setdefault(ler, i)
+    seen, ia, ib = set(), [], []
+    for i, ler in enumerate(a["lers"]):
+        j = pos_b.get(ler)
+        if j is not None and ler not in seen:
+            seen.add(ler)
+            ia.append(i); ib.append(j)
+    return np.array(ia, dtype=np.int64), np.array(ib, dtype=np.int64)
+
+def _remap(v, doc_index, n_docs):
+    """Spans of v restricted to aligned documents, with doc renumbered to the aligned position."""
+    import numpy as np
+    lut = np.full(n_docs, -1, dtype=np.int64)
+    lut[doc_index] = np.arange(len(doc_index))
+    d = lut[v["doc"]] if len(v["doc"]) else v["doc"]
+    keep = d >= 0
+    return {"doc": d[keep], "cls": v["cls"][keep], "start": v["start"][keep], "end": v["end"][keep]}
+
+def span_pairs(a, b):
+    """All (i, j, iou) of located spans i of a and j of b in the same document and class."""
+    import numpy as np
+    la = np.flatnonzero((a["start"] >= 0) & (a["end"] >= a["start"]))
+    lb = np.flatnonzero((b["start"] >= 0) & (b["end"] >= b["start"]))
+    n_cls = len(CLASSES)
+    ka = a["doc"][la] * n_cls + a["cls"][la]
+    kb = b["doc"][lb] * n_cls + b["cls"][lb]
+    order = np.argsort(kb, kind="stable")
+    lb, kb = lb[order], kb[order]
+    lo = np.searchsorted(kb, ka, "left")
+    cnt = np.searchsorted(kb, ka, "right") - lo
+    total = int(cnt.sum())
+    if not total:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0)
+    ia = np.repeat(la, cnt)
+    ib = lb[np.repeat(lo, cnt) + np.arange(total) - np.repeat(np.cumsum(cnt) - cnt, cnt)]
+    sa, ea, sb, eb = a["start"][ia], a["end"][ia], b["start"][ib], b["end"][ib]
+    inter = np.clip(np.minimum(ea, eb) - np.maximum(sa, sb), 0, None)
+    union = (ea - sa) + (eb - sb) - inter
+    same = (sa == sb) & (ea == eb)        # also covers empty spans
+    iou = np.where(same, 1.0, inter / np.maximum(union, 1))
+    return ia, ib, iou
+
+def span_agreement(a, b, iou_min):
+    """Per class: spans, located spans, matched spans (IoU >= iou_min) and mean best IoU of each side."""
+    import numpy as np
+    ia, ib, iou = span_pairs(a, b)
+    best_a = np.zeros(len(a["doc"])); np.maximum.at(best_a, ia, iou)
+    best_b = np.zeros(len(b["doc"])); np.maximum.at(best_b, ib, iou)
+    out = {}
+    for c, name in enumerate(CLASSES + ["all"]):
+        row = {}
+        for side, v, best in (("a", a, best_a), ("b", b, best_b)):
+            sel = v["cls"] == c if name != "all" else np.ones(len(v["cls"]), bool)
+            located = sel & (v["start"] >= 0)
+            row[f"spans_{side}"] = int(sel.sum())
+            row[f"located_{side}"] = int(located.sum())
+            row[f"matched_{side}"] = int((best[located] >= iou_min).sum())
+            row[f"mean_best_iou_{side}"] = round(float(best[located].mean()), 4) if located.any() else None
+        n = row["located_a"] + row["located_b"]
+        row["span_f1"] = round((row["matched_a"] + row["matched_b"]) / n, 4) if n else None
+        out[name] = row
+    return out
+
+def class_agreement(a, b, n_docs):
+    """Per class: documents where both / only a / only b / neither found it, agreement and kappa."""
+    import numpy as np
+    pa = np.zeros((n_docs, len(CLASSES)), bool); pa[a["doc"], a["cls"]] = True
+    pb = np.zeros((n_docs, len(CLASSES)), bool); pb[b["doc"], b["cls"]] = True
+    out = {}
+    for c, name in enumerate(CLASSES):
+        x, y = pa[:, c], pb[:, c]
+        both, only_a, only_b = int((x & y).sum()), int((x & ~y).sum()), int((~x & y).sum())
+        neither = n_docs - both - only_a - only_b
+        po = (both + neither) / n_docs if n_docs else None
+        pe = ((x.mean() * y.mean()) + ((1 - x.mean()) * (1 - y.mean()))) if n_docs else None
+        kappa = None if po is None or pe >= 1 else round((po - pe) / (1 - pe), 4)
+        out[name] = {"both": both, "only_a": only_a, "only_b": only_b, "neither": neither,
+                     "agreement": round(po, 4) if po is not None else None, "kappa": kappa}
+    return out
+
+def cause_confusion(code_a, code_b):
+    """Confusion matrix [code in a][code in b] over CODES (last row/column: no coded Cause)."""
+    import numpy as np
+    k = len(CODES)
+    return np.bincount(code_a.astype(np.int64) * k + code_b, minlength=k * k).reshape(k, k)
+
+def cause_agreement(m):
+    import numpy as np
+    none = _CODE_ID["none"]
+    coded = m[:none, :none]
+    cat = [CODE_CATEGORIES[c] for c in CODES[:none]]
+    same_cat = sum(int(coded[i, j]) for i in range(none) for j in range(none) if cat[i] == cat[j])
+    n = int(coded.sum())
+    return {
+        "docs": int(m.sum()), "coded_both": n, "coded_only_a": int(m[:none, none].sum()),
+        "coded_only_b": int(m[none, :none].sum()), "coded_neither": int(m[none, none]),
+        "code_agreement": round(int(np.trace(coded)) / n, 4) if n else None,
+        "category_agreement": round(same_cat / n, 4) if n else None,
+    }
+
+def _telemetry(path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def variant_yield(v, doc_index, telemetry=None):
+    """Per-document yield of one variant on the aligned documents (cost with its telemetry summary)."""
+    import numpy as np
+    n = len(doc_index)
+    sel = np.isin(v["doc"], doc_index)
+    coded = int((v["code"][doc_index] != _CODE_ID["none"]).sum())
+    out = {
+        "extractions_per_doc": round(int(sel.sum()) / n, 3) if n else None,
+        "located_share": round(float((v["start"][sel] >= 0).mean()), 4) if sel.any() else None,
+        "classes_per_doc": round(len(np.unique(v["doc"][sel] * len(CLASSES) + v["cls"][sel])) / n, 3) if n else None,
+        "coded_cause_share": round(coded / n, 4) if n else None,
+        "prompt_tokens_per_doc": None, "prompt_tokens_per_coded_cause": None,
+    }
+    if telemetry and telemetry.get("calls"):
+        per_call = telemetry["prompt_tokens_est_total"] / telemetry["calls"]
+        out["prompt_tokens_per_doc"] = round(per_call, 1)
+        out["prompt_tokens_per_coded_cause"] = round(per_call * n / coded, 1) if coded else None
+    return out
+
+def verdict(names, yields, cause, spans):
+    """One-line recommendation from the yield, cost and agreement figures."""
+    a, b = names
+    ya, yb = yields[a], yields[b]
+    ca, cb = ya["prompt_tokens_per_doc"], yb["prompt_tokens_per_doc"]
+    agree = cause["code_agreement"]
+    gain = (yb["coded_cause_share"] or 0) - (ya["coded_cause_share"] or 0)
+    if ca is None or cb is None:
+        cost = "cost not compared (telemetry summary missing)"
+        cheap, dear = None, None
+    else:
+        cheap, dear = (a, b) if ca <= cb else (b, a)
+        cost = f"{dear} costs {max(ca, cb) / max(min(ca, cb), 1e-9):.2f}x the prompt tokens of {cheap}"
+    lines = [f"{b} vs {a}: coded Cause share {gain:+.1%}, Cause code agreement "
+             f"{'n/a' if agree is None else f'{agree:.1%}'}, span F1 {spans['all']['span_f1']}; {cost}"]
+    if cheap:
+        extra = (yields[dear]["coded_cause_share"] or 0) - (yields[cheap]["coded_cause_share"] or 0)
+        if extra <= 0 or (agree is not None and agree >= 0.9 and extra < 0.05):
+            lines.append(f"-> {cheap} is sufficient: {dear} adds no meaningful Cause coverage for its extra cost")
+        else:
+            lines.append(f"-> {dear} is worth its cost if the extra {extra:.1%} coded Causes matter")
+    return lines
+
+def compare(path_a, path_b, iou_min=0.5, telemetry_a=None, telemetry_b=None, names=("a", "b")):
+    t0 = time.perf_counter()
+    a, b = load_variant(path_a), load_variant(path_b)
+    t1 = time.perf_counter()
+    ia, ib = align_docs(a, b)
+    sa, sb = _remap(a, ia, len(a["lers"])), _remap(b, ib, len(b["lers"]))
+    spans = span_agreement(sa, sb, iou_min)
+    classes = class_agreement(sa, sb, len(ia))
+    m = cause_confusion(a["code"][ia], b["code"][ib])
+    cause = cause_agreement(m)
+    yields = {names[0]: variant_yield(a, ia, _telemetry(telemetry_a)), names[1]: variant_yield(b, ib, _telemetry(telemetry_b))}
+    return {
+        "variants": {names[0]: path_a, names[1]: path_b}, "iou_threshold": iou_min,
+        "documents": {"a": len(a["lers"]), "b": len(b["lers"]), "aligned": len(ia),
+                      "only_a": len(a["lers"]) - len(ia), "only_b": len(b["lers"]) - len(ib)},
+        "spans": spans, "classes": classes, "cause": cause,
+        "cause_confusion": {"codes": CODES, "matrix": m.tolist()},
+        "yield": yields, "verdict": verdict(names, yields, cause, spans),
+        "timing_s": {"load": round(t1 - t0, 3), "compare": round(time.perf_counter() - t1, 3)},
+    }
+
+def print_report(r):
+    na, nb = list(r["variants"])
+    d = r["documents"]
+    print(f"{na}: {r['variants'][na]}  |  {nb}: {r['variants'][nb]}")
+    print(f"documents: {d['aligned']} aligned ({d['only_a']} only in {na}, {d['only_b']} only in {nb}); "
+          f"load {r['timing_s']['load']}s, compare {r['timing_s']['compare']}s")
+    print(f"\nspans (IoU >= {r['iou_threshold']})")
+    print(f"{'class':<24} {'n_' + na:>9} {'n_' + nb:>9} {'match_' + na:>11} {'match_' + nb:>11} {'F1':>6} "
+          f"{'docs_both':>9} {'only_' + na:>9} {'only_' + nb:>9} {'kappa':>6}")
+    for name, s in r["spans"].items():
+        c = r["classes"].get(name, {})
+        print(f"{name:<24} {s['spans_a']:>9} {s['spans_b']:>9} {s['matched_a']:>11} {s['matched_b']:>11} "
+              f"{s['span_f1'] if s['span_f1'] is not None else '-':>6} {c.get('both', ''):>9} {c.get('only_a', ''):>9} "
+              f"{c.get('only_b', ''):>9} {c.get('kappa') if c.get('kappa') is not None else '':>6}")
+    cz = r["cause_confusion"]
+    used = [i for i, _ in enumerate(cz["codes"]) if any(cz["matrix"][i]) or any(row[i] for row in cz["matrix"])]
+    print(f"\nprimary Cause code ({na} rows x {nb} columns)")
+    print(f"{'':>7}" + "".join(f"{cz['codes'][j]:>7}" for j in used))
+    for i in used:
+        print(f"{cz['codes'][i]:>7}" + "".join(f"{cz['matrix'][i][j]:>7}" for j in used))
+    c = r["cause"]
+    print(f"code agreement {c['code_agreement']}, category agreement {c['category_agreement']} "
+          f"on {c['coded_both']} documents coded by both")
+    print("\nyield per document")
+    for name, y in r["yield"].items():
+        print(f"  {name:<10} " + ", ".join(f"{k} {v}" for k, v in y.items()))
+    print()
+    for line in r["verdict"]:
+        print(line)
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare two extraction variants (span IoU, class agreement, Cause codes).")
+    ap.add_argument("a", nargs="?", default=DEFAULT_VARIANTS["text"][0])
+    ap.add_argument("b", nargs="?", default=DEFAULT_VARIANTS["keyword"][0])
+    ap.add_argument("--names", nargs=2, default=None, help="labels of the two variants (기본: text keyword)")
+    ap.add_argument("--iou", type=float, default=0.5, help="IoU at which two spans count as the same")
+    ap.add_argument("--telemetry", nargs=2, default=None, metavar=("A_SUMMARY", "B_SUMMARY"),
+                    help="telemetry summary JSONs of both runs (기본: metrics/extraction_<variant>_summary.json)")
+    ap.add_argument("--out", default="compare_variants.json")
+    ap.add_argument("--confusion", default=None, help="also write the Cause code confusion matrix as CSV")
+    args = ap.parse_args()
+
+    default = args.a == DEFAULT_VARIANTS["text"][0] and args.b == DEFAULT_VARIANTS["keyword"][0]
+    names = args.names or (["text", "keyword"] if default else ["a", "b"])
+    tel = args.telemetry or ([DEFAULT_VARIANTS["text"][1], DEFAULT_VARIANTS["keyword"][1]] if default else [None, None])
+    report = compare(args.a, args.b, args.iou, tel[0], tel[1], names)
+    print_report(report)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nReport -> {args.out}")
+    if args.confusion:
+        with open(args.confusion, "w", encoding="utf-8", newline="") as f:
+            w = csv.writer(f)
+            w.writerow([f"{names[0]}\\{names[1]}"] + CODES)
+            for code, row in zip(CODES, report["cause_confusion"]["matrix"]):
+                w.writerow([code] + row)
+        print(f"Confusion matrix -> {args.confusion}")
+
+if __name__ == "__main__":
+    main()
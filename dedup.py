@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# dedup.py
+"""
+Near-duplicate / revision-aware grouping of LER abstracts before extraction.
+
+Abstracts are shingled into word 5-grams and summarized with MinHash; LSH
+banding proposes candidate pairs, which are kept when the estimated Jaccard
+similarity passes the threshold. Revisions of the same report
+(`...R00`, `...R01`) are grouped with a lower threshold. Since union-find
+chains pairs, every member is checked again against the representative and
+split off when it is not itself close enough to it. Each cluster is
+extracted once (on its representative) and the spans are remapped onto the
+other members with a character diff.
+"""
+import argparse, difflib, re, zlib
+from collections import defaultdict
+from functools import lru_cache
+
+NUM_PERM = 128
+BANDS, ROWS = 16, 8            # BANDS * ROWS == NUM_PERM; ~0.7 LSH threshold
+SHINGLE_K = 5
+THRESHOLD = 0.8                # near-duplicate (different LER numbers)
+REVISION_THRESHOLD = 0.7       # revisions/supplements of the same LER
+_REV = re.compile(r"R\d{2}$", re.I)
+_WORD = re.compile(r"[a-z0-9]+")
+
+@lru_cache(maxsize=None)
+def _permutations():
+    """(a, b, prime, max hash) of the MinHash permutations; NumPy is loaded on first use."""
+    import numpy as np
+    rng = np.random.RandomState(1)
+    a = rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+    b = rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+    return a, b, np.uint64((1 << 61) - 1), np.uint64((1 << 32) - 1)
+
+def ler_base(ler):
+    """'0252023001R01' -> '0252023001' (revision suffix removed)."""
+    s = str(ler or "").strip()
+    return _REV.sub("", s)
+
+def ler_revision(ler):
+    m = re.search(r"R(\d{2})$", str(ler or ""), re.I)
+    return int(m.group(1)) if m else 0
+
+def shingles(text, k=SHINGLE_K):
+    words = _WORD.findall(str(text or "").lower())
+    if len(words) < k:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+def minhash(sh):
+    import numpy as np
+    a, b, prime, max_hash = _permutations()
+    if not sh:
+        return np.full(NUM_PERM, max_hash, dtype=np.uint64)
+    hv = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in sh), dtype=np.uint64, count=len(sh))
+    # (a*x + b) mod p, masked to 32 bits; one row per permutation
+    ph = ((np.outer(a, hv) + b[:, None]) % prime) & max_hash
+    return ph.min(axis=1)
+
+def estimate_jaccard(sig_a, sig_b):
+    import numpy as np
+    return float(np.mean(sig_a == sig_b))
+
+class _UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+def cluster_documents(lers, texts, threshold=THRESHOLD, revision_threshold=REVISION_THRESHOLD):
+    """
+    Groups documents whose abstracts are near-identical.
+
+    Returns a list of clusters; each cluster is a list of positions into
+    `lers`/`texts`, representative first (latest revision, then longest text).
+    Members that reached the cluster only through a chain and are below the
+    threshold against the representative become clusters of their own, so
+    an extraction is never copied onto an abstract that differs from it.
+    """
+    import numpy as np
+    n = len(texts)
+    sigs = np.vstack([minhash(shingles(t)) for t in texts]) if n else np.empty((0, NUM_PERM), np.uint64)
+    uf = _UnionFind(n)
+
+    def try_union(i, j, th):
+        if uf.find(i) != uf.find(j) and estimate_jaccard(sigs[i], sigs[j]) >= th:
+            uf.union(i, j)
+
+    # 1) LSH candidates
+    for b in range(BANDS):
+        buckets = defaultdict(list)
+        band = sigs[:, b * ROWS:(b + 1) * ROWS]
+        for i in range(n):
+            buckets[band[i].tobytes()].append(i)
+        for members in buckets.values():
+            for j in members[1:]:
+                try_union(members[0], j, threshold)
+
+    # 2) revisions of the same report
+    by_base = defaultdict(list)
+    for i, ler in enumerate(lers):
+        by_base[ler_base(ler)].append(i)
+    for members in by_base.values():
+        for j in members[1:]:
+            try_union(members[0], j, revision_threshold)
+
+    groups = defaultdict(list)
+    for i in range(n):
+        groups[uf.find(i)].append(i)
+    clusters = []
+    for members in groups.values():
+        members.sort(key=lambda i: (-ler_revision(lers[i]), -len(str(texts[i] or "")), i))
+        rep, kept = members[0], members[:1]
+        for j in members[1:]:
+            th = revision_threshold if ler_base(lers[j]) == ler_base(lers[rep]) else threshold
+            if estimate_jaccard(sigs[rep], sigs[j]) >= th:
+                kept.append(j)
+            else:
+                clusters.append([j])
+        clusters.append(kept)
+    clusters.sort(key=lambda c: min(c))
+    return clusters
+
+def _map_pos(blocks, pos):
+    # blocks: equal runs (a_start, b_start, size) from SequenceMatcher
+    for a, b, size in blocks:
+        if a <= pos <= a + size:
+            return b + (pos - a), True
+    return None, False
+
+def remap_extractions(extractions, src_text, dst_text):
+    """
+    Moves `char_interval`s computed on `src_text` onto `dst_text`.
+
+    Spans inside unchanged regions are shifted by the diff; otherwise the
+    extraction text is searched near the mapped position. Spans that no
+    longer exist in `dst_text` keep their extraction but lose char_interval.
+    """
+    if src_text == dst_text:
+        return [dict(e) for e in extractions or []]
+    sm = difflib.SequenceMatcher(None, src_text or "", dst_text or "", autojunk=False)
+    blocks = [blk for blk in sm.get_matching_blocks() if blk.size]
+    out = []
+    for e in extractions or []:
+        e = dict(e)
+        ci = e.get("char_interval")
+        txt = e.get("extraction_text") or ""
+        if ci:
+            # langextract leaves both positions None when it cannot align: search for the text
+            start, end = ci.get("start_pos"), ci.get("end_pos")
+            s, ok_s = _map_pos(blocks, int(start)) if start is not None else (None, False)
+            t, ok_e = _map_pos(blocks, int(end)) if end is not None else (None, False)
+            if ok_s and ok_e and dst_text[s:t] == txt:
+                e["char_interval"] = {"start_pos": s, "end_pos": t}
+            else:
+                hint = s if ok_s else 0
+                hit = dst_text.find(txt, max(0, hint - len(txt))) if txt else -1
+                if hit < 0 and txt:
+                    hit = dst_text.find(txt)
+                e["char_interval"] = {"start_pos": hit, "end_pos": hit + len(txt)} if hit >= 0 else None
+        out.append(e)
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="Report near-duplicate LER clusters in an abstract CSV.")
+    ap.add_argument("csv", nargs="?", default="data/ler_abstract.csv")
+    ap.add_argument("--threshold", type=float, default=THRESHOLD)
+    ap.add_argument("--revision-threshold", type=float, default=REVISION_THRESHOLD)
+    ap.add_argument("--out", default=None, help="write ler,cluster_ler CSV")
+    args = ap.parse_args()
+
+    import pandas as pd
+    df = pd.read_csv(args.csv)
+    lers = df["file_name"].astype(str).tolist()
+    texts = df["abstract"].fillna("").astype(str).tolist()
+    clusters = cluster_documents(lers, texts, args.threshold, args.revision_threshold)
+
+    dup = sum(len(c) - 1 for c in clusters)
+    print(f"{len(lers)} documents -> {len(clusters)} clusters "
+          f"({dup} extractions saved, {dup / max(1, len(lers)):.1%})")
+    for c in clusters:
+        if len(c) > 1:
+            print("  " + lers[c[0]] + " <- " + ", ".join(lers[i] for i in c[1:]))
+    if args.out:
+        rows = [{"ler": lers[i], "cluster_ler": lers[c[0]]} for c in clusters for i in c]
+        pd.DataFrame(rows).to_csv(args.out, index=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# doc_loader.py
+"""
+Shared loader for the extracted_*.jsonl files.
+
+The file is memory-mapped and a byte-offset index (ler -> offset, length) is
+kept next to it as `<file>.idx.json`; the index is rebuilt when the file's
+size or mtime changes. Records can be fetched by LER without reading the rest
+of the file. The index also records where each top-level value sits inside its
+record, so `fields=` decodes only those values instead of the whole record
+(a `["ler", "Title"]` pass never touches the abstracts or extraction lists).
+orjson is used for decoding when it is installed.
+"""
+import json, mmap, os, re
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+    _loads = json.loads
+
+INDEX_SUFFIX = ".idx.json"
+INDEX_VERSION = 2
+
+_scan_value = json.JSONDecoder().scan_once
+_scan_key = json.decoder.scanstring
+_WS = re.compile(r"[ \t\n\r]*")
+
+def _field_spans(line):
+    """{key: [start, end]} byte spans of the top-level values of one JSON object line.
+
+    The bytes are read as latin-1 so that character offsets equal byte offsets;
+    only the (ASCII) JSON structure is interpreted. Raises ValueError/StopIteration
+    for anything that is not a single object.
+    """
+    s = line.decode("latin-1")
+    pos = _WS.match(s, 0).end()
+    if s[pos:pos + 1] != "{":
+        raise ValueError("not an object")
+    spans = {}
+    pos = _WS.match(s, pos + 1).end()
+    if s[pos:pos + 1] == "}":
+        pos += 1
+    else:
+        while True:
+            if s[pos:pos + 1] != '"':
+                raise ValueError("expected key")
+            kstart = pos
+            _, pos = _scan_key(s, pos + 1)
+            key = _loads(line[kstart:pos])
+            pos = _WS.match(s, pos).end()
+            if s[pos:pos + 1] != ":":
+                raise ValueError("expected ':'")
+            start = _WS.match(s, pos + 1).end()
+            _, pos = _scan_value(s, start)
+            spans[key] = [start, pos]
+            pos = _WS.match(s, pos).end()
+            c = s[pos:pos + 1]
+            pos = _WS.match(s, pos + 1).end()
+            if c == "}":
+                break
+            if c != ",":
+                raise ValueError("expected ',' or '}'")
+    if _WS.match(s, pos).end() != len(s):
+        raise ValueError("trailing data")
+    return spans
+
+def _doc_ler(doc):
+    return doc.get("ler") or doc.get("LER")
+
+class DocStore:
+    def __init__(self, path, index_path=None):
+        self.path = str(path)
+        self.index_path = index_path or self.path + INDEX_SUFFIX
+        self._fh = open(self.path, "rb")
+        size = os.fstat(self._fh.fileno()).st_size
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.entries, self.spans = self._load_or_build_index()  # [(ler, offset, length)], [{key: [s, e]}] in file order
+        self.offsets = {}
+        for k, (ler, _, _) in enumerate(self.entries):
+            if ler is not None:
+                self.offsets[ler] = k
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, ler):
+        return ler in self.offsets
+
+    def _signature(self):
+        st = os.stat(self.path)
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    def _load_or_build_index(self):
+        sig = self._signature()
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    idx = json.load(f)
+                if (idx.get("version") == INDEX_VERSION and idx.get("size") == sig["size"]
+                        and idx.get("mtime_ns") == sig["mtime_ns"]):
+                    return [tuple(e) for e in idx["entries"]], idx["spans"]
+            except Exception:
+                pass
+        entries, spans = self._scan()
+        try:
+            with open(self.index_path, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, **sig, "entries": entries, "spans": spans}, f)
+        except OSError:
+            pass  # read-only location: keep the in-memory index
+        return entries, spans
+
+    def _scan(self):
+        entries, spans, mm, pos, end = [], [], self._mm, 0, len(self._mm)
+        while pos < end:
+            nl = mm.find(b"\n", pos)
+            stop = end if nl < 0 else nl
+            line = mm[pos:stop]
+            if line.strip():
+                try:
+                    doc = _loads(line)
+                    fs = _field_spans(line) if isinstance(doc, dict) else None
+                except Exception:
+                    fs = None  # broken line: skipped, same as the old loaders
+                if fs is not None:
+                    entries.append((_doc_ler(doc), pos, stop - pos))
+                    spans.append(fs)
+            pos = stop + 1
+        return entries, spans
+
+    def _decode(self, k, fields=None):
+        _, off, length = self.entries[k]
+        if fields is None:
+            return _loads(self._mm[off:off + length])
+        spans, mm = self.spans[k], self._mm
+        return {f: _loads(mm[off + spans[f][0]:off + spans[f][1]]) for f in fields if f in spans}
+
+    def get(self, ler, fields=None, default=None):
+        """Random access by LER."""
+        k = self.offsets.get(ler)
+        if k is None:
+            return default
+        return self._decode(k, fields)
+
+    def raw_at(self, k):
+        """Undecoded bytes of the k-th record (file order)."""
+        _, off, length = self.entries[k]
+        return bytes(self._mm[off:off + length])
+
+    def doc_at(self, k, fields=None):
+        return self._decode(k, fields)
+
+    def lers(self):
+        return [ler for ler, _, _ in self.entries]
+
+    def iter_docs(self, fields=None):
+        for k in range(len(self.entries)):
+            yield self._decode(k, fields)
+
+    __iter__ = iter_docs
+
+def load_jsonl(path, fields=None):
+    """All records of a JSONL file (broken lines skipped), optionally projected to `fields`."""
+    with DocStore(path) as store:
+        return list(store.iter_docs(fields))
+
+def iter_jsonl(path, fields=None):
+    with DocStore(path) as store:
+        yield from store.iter_docs(fields)
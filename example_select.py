@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# example_select.py
+"""
+Few-shot example selection under a prompt-token budget.
+
+`ExampleSelector` indexes the example texts with TF-IDF and, per abstract,
+keeps the k most similar examples (one per Cause code first, so the model
+still sees contrasting codes), then drops the least similar ones until the
+estimated prompt fits the budget.
+
+Offline helpers (no model calls):
+  python example_select.py plan data/ler_abstract.csv --k 3 --budget 6000
+  python example_select.py eval extracted_text.full.jsonl extracted_text.jsonl
+"""
+import argparse, json, math
+from collections import Counter
+
+from schema import primary_cause_of
+from text_index import TfidfIndex
+
+CHARS_PER_TOKEN = 4.0
+CLASS_KEYS = [
+    "Operating_Mode", "Power_Level", "Condition", "Procedure_or_Regulation",
+    "Human_Action", "Outcome", "Cause", "Corrective_Action",
+]
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for English prose)."""
+    return int(math.ceil(len(text or "") / CHARS_PER_TOKEN))
+
+def _example_view(ex):
+    """(text, [extraction dicts]) for an lx.data.ExampleData or an examples.json case."""
+    if isinstance(ex, dict):
+        exts = []
+        for cls in CLASS_KEYS:
+            items = ex.get(cls)
+            if items is None:
+                continue
+            for item in items if isinstance(items, list) else [items]:
+                exts.append({"extraction_class": cls,
+                             "extraction_text": item.get("extraction_text", ""),
+                             "attributes": item.get("attributes", {}) or {}})
+        return ex.get("text", "") or "", exts
+    exts = [{"extraction_class": e.extraction_class,
+             "extraction_text": e.extraction_text,
+             "attributes": e.attributes or {}} for e in (ex.extractions or [])]
+    return ex.text or "", exts
+
+def cause_codes(extractions):
+    return sorted({str((e.get("attributes") or {}).get("code"))
+                   for e in extractions
+                   if e.get("extraction_class") == "Cause" and (e.get("attributes") or {}).get("code")})
+
+class ExampleSelector:
+    def __init__(self, examples, k=3, token_budget=None, prompt_description=""):
+        self.examples = list(examples)
+        self.k = k
+        self.token_budget = token_budget
+        self.prompt_chars = len(prompt_description or "")
+        self.prompt_tokens = estimate_tokens(prompt_description)
+        views = [_example_view(ex) for ex in self.examples]
+        self.codes = [cause_codes(exts) for _, exts in views]
+        self.chars = [len(text) + len(json.dumps(exts, ensure_ascii=False)) for text, exts in views]
+        self.tokens = [estimate_tokens(text) + estimate_tokens(json.dumps(exts, ensure_ascii=False))
+                       for text, exts in views]
+        self.index = TfidfIndex([text for text, _ in views])
+
+    def full_tokens(self, text):
+        return self.prompt_tokens + sum(self.tokens) + estimate_tokens(text)
+
+    def select(self, text):
+        """Returns (examples, info) for one abstract."""
+        n = len(self.examples)
+        k = n if not self.k or self.k <= 0 else min(self.k, n)
+        sims = self.index.scores(text)
+        order = sorted(range(n), key=lambda i: (-sims.get(i, 0.0), i))
+
+        # 1) best example per Cause code, 2) fill by similarity
+        picked, seen = [], set()
+        for i in order:
+            if len(picked) >= k:
+                break
+            if any(c not in seen for c in self.codes[i]):
+                picked.append(i)
+                seen.update(self.codes[i])
+        for i in order:
+            if len(picked) >= k:
+                break
+            if i not in picked:
+                picked.append(i)
+        picked.sort(key=lambda i: (-sims.get(i, 0.0), i))
+
+        base = self.prompt_tokens + estimate_tokens(text)
+        if self.token_budget:
+            while len(picked) > 1 and base + sum(self.tokens[i] for i in picked) > self.token_budget:
+                picked.pop()
+        est = base + sum(self.tokens[i] for i in picked)
+        info = {
+            "examples": len(picked),
+            "examples_total": n,
+            "example_ids": picked,
+            "est_prompt_tokens": est,
+            "prompt_chars": self.prompt_chars + len(text or "") + sum(self.chars[i] for i in picked),
+            "est_full_tokens": self.full_tokens(text),
+            "codes": sorted({c for i in picked for c in self.codes[i]}),
+            "over_budget": bool(self.token_budget and est > self.token_budget),
+        }
+        return [self.examples[i] for i in picked], info
+
+# ---------------------------
+# offline evaluation
+# ---------------------------
+def _load_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def _primary_code(doc):
+    # same primary Cause as analyze.py / compare_variants.py (canonical class and code)
+    return (primary_cause_of(doc) or {}).get("code")
+
+def compare_outputs(full_rows, compact_rows):
+    """Agreement of a compact-example run with the full-example run, aligned by `ler`."""
+    full = {r.get("ler"): r for r in full_rows}
+    stats = Counter()
+    class_j = []
+    confusion = Counter()
+    for r in compact_rows:
+        ref = full.get(r.get("ler"))
+        if ref is None:
+            continue
+        stats["docs"] += 1
+        a, b = _primary_code(ref), _primary_code(r)
+        confusion[(a, b)] += 1
+        stats["cause_present_full"] += a is not None
+        stats["cause_present_compact"] += b is not None
+        stats["cause_code_match"] += a == b and a is not None
+        ca = {e.get("extraction_class") for e in ref.get("Extractions") or []}
+        cb = {e.get("extraction_class") for e in r.get("Extractions") or []}
+        class_j.append(len(ca & cb) / len(ca | cb) if ca | cb else 1.0)
+        stats["extractions_full"] += len(ref.get("Extractions") or [])
+        stats["extractions_compact"] += len(r.get("Extractions") or [])
+    n = max(1, stats["docs"])
+    return {
+        "docs": stats["docs"],
+        "cause_code_agreement": stats["cause_code_match"] / n,
+        "cause_coverage_full": stats["cause_present_full"] / n,
+        "cause_coverage_compact": stats["cause_present_compact"] / n,
+        "class_set_jaccard": sum(class_j) / len(class_j) if class_j else None,
+        "codes_full": sorted({k[0] for k in confusion if k[0]}),
+        "codes_compact": sorted({k[1] for k in confusion if k[1]}),
+        "extractions_full": stats["extractions_full"],
+        "extractions_compact": stats["extractions_compact"],
+        "disagreements": [{"full": a, "compact": b, "count": c}
+                          for (a, b), c in confusion.most_common() if a != b],
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description="Few-shot example selection tools (offline).")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("plan", help="estimate prompt tokens per abstract with/without selection")
+    p.add_argument("csv", nargs="?", default="data/ler_abstract.csv")
+    p.add_argument("--examples", default="data/examples.json")
+    p.add_argument("--k", type=int, default=3)
+    p.add_argument("--budget", type=int, default=None)
+    e = sub.add_parser("eval", help="compare a compact-example run against the full-example run")
+    e.add_argument("full_jsonl")
+    e.add_argument("compact_jsonl")
+    e.add_argument("--out", default=None, help="write the report as JSON")
+    args = ap.parse_args()
+
+    if args.cmd == "plan":
+        import pandas as pd
+        with open(args.examples, "r", encoding="utf-8") as f:
+            cases = json.load(f)
+        sel = ExampleSelector(cases, k=args.k, token_budget=args.budget)
+        df = pd.read_csv(args.csv)
+        full = comp = over = 0
+        for text in df["abstract"].fillna("").astype(str):
+            _, info = sel.select(text)
+            full += info["est_full_tokens"]; comp += info["est_prompt_tokens"]; over += info["over_budget"]
+        print(f"{len(df)} abstracts, {len(cases)} examples, k={args.k}, budget={args.budget}")
+        print(f"est. input tokens (examples + abstract, prompt excluded): full={full:,} selected={comp:,} "
+              f"({1 - comp / max(1, full):.1%} less), over budget: {over}")
+    else:
+        report = compare_outputs(_load_jsonl(args.full_jsonl), _load_jsonl(args.compact_jsonl))
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
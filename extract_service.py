@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# extract_service.py
+"""
+Long-running local extraction service (asyncio, standard library HTTP).
+
+The prompt and few-shot examples are loaded once at start-up. Requests for
+the same abstract are answered from an in-process LRU cache, and concurrent
+requests for an abstract that is already being extracted wait for that one
+model call instead of issuing their own. Model calls run on a fixed number
+of workers behind a bounded queue; when the queue is full the service
+answers 503 with Retry-After instead of piling up work.
+
+  python extract_service.py serve --port 8100 [--variant keyword] [--backend http://127.0.0.1:8101/extract]
+  curl -s localhost:8100/extract -d '{"ler": "3902018004R00", "text": "On March 5, ..."}'
+  curl -s localhost:8100/stats
+
+Backends: `langextract` (default; needs LANGEXTRACT_API_KEY) or the URL of a
+model endpoint speaking the JSON protocol of `fake-model`, which answers
+from an existing extraction JSONL and never touches the network:
+
+  python extract_service.py fake-model --port 8101 --source extracted_text.jsonl --delay 0.5
+"""
+import argparse, asyncio, hashlib, json, os, sys, time
+import urllib.error, urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_BODY = 1 << 20
+
+class Busy(Exception):
+    """The work queue is full."""
+
+# ---------------------------
+# minimal HTTP/1.1 (one request per connection)
+# ---------------------------
+async def read_request(reader):
+    """(method, path, body bytes) or None for an empty/invalid request."""
+    line = await reader.readline()
+    parts = line.decode("latin-1").split()
+    if len(parts) < 2:
+        return None
+    headers = {}
+    while True:
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+            break
+        k, _, v = h.decode("latin-1").partition(":")
+        headers[k.strip().lower()] = v.strip()
+    n = int(headers.get("content-length") or 0)
+    if n > MAX_BODY:
+        raise ValueError("request body too large")
+    body = await reader.readexactly(n) if n else b""
+    return parts[0].upper(), parts[1].split("?", 1)[0], body
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           500: "Internal Server Error", 502: "Bad Gateway", 503: "Service Unavailable"}
+
+async def respond(writer, status, obj, headers=None):
+    body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(body)}", "Connection: close"]
+    head += [f"{k}: {v}" for k, v in (headers or {}).items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    try:
+        await writer.drain()
+    finally:
+        writer.close()
+
+def serve_forever(handler, host, port, on_start=None):
+    async def _client(reader, writer):
+        try:
+            req = await read_request(reader)
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            await respond(writer, 400, {"error": str(e)})
+            return
+        if req is None:
+            writer.close()
+            return
+        await handler(writer, *req)
+
+    async def _main():
+        if on_start is not None:
+            await on_start()
+        server = await asyncio.start_server(_client, host, port)
+        print(f"Listening on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        pass
+
+# ---------------------------
+# backends: text -> [extraction dicts] (called from worker threads)
+# ---------------------------
+class LangextractBackend:
+    def __init__(self, prompt_description, selector, model_id):
+        self.prompt_description = prompt_description
+        self.selector = selector
+        self.model_id = model_id
+
+    def __call__(self, text):
+        from extraction_core import extract
+        call_examples, _ = self.selector.select(text)
+        return extract(text, self.prompt_description, call_examples, self.model_id)
+
+class HttpBackend:
+    """POSTs {text, prompt_description, examples} and expects {"extractions": [...]}."""
+
+    def __init__(self, url, prompt_description, selector, timeout=120):
+        from example_select import _example_view
+        self.url = url
+        self.prompt_description = prompt_description
+        self.selector = selector
+        self.timeout = timeout
+        self._view = _example_view
+
+    def __call__(self, text):
+        call_examples, _ = self.selector.select(text)
+        payload = {
+            "text": text,
+            "prompt_description": self.prompt_description,
+            "examples": [dict(zip(("text", "extractions"), self._view(ex))) for ex in call_examples],
+        }
+        req = urllib.request.Request(self.url, data=json.dumps(payload).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            return json.loads(resp.read().decode("utf-8"))["extractions"]
+
+class ServiceBackend:
+    """Client of a running `extract_service.py serve`; waits and retries while it answers 503."""
+
+    def __init__(self, url, timeout=300, retries=60):
+        self.url = url.rstrip("/") + "/extract"
+        self.timeout = timeout
+        self.retries = retries
+
+    def __call__(self, text, ler=None):
+        body = json.dumps({"ler": ler, "text": text}).encode("utf-8")
+        for attempt in range(self.retries + 1):
+            req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                    return json.loads(resp.read().decode("utf-8"))["Extractions"]
+            except urllib.error.HTTPError as e:
+                if e.code != 503 or attempt == self.retries:
+                    raise
+                time.sleep(float(e.headers.get("Retry-After") or 1))
+
+# ---------------------------
+# service
+# ---------------------------
+class ExtractionService:
+    def __init__(self, backend, workers=4, queue_size=64, cache_size=4096):
+        self.backend = backend
+        self.workers = workers
+        self.queue_size = queue_size
+        self.cache_size = cache_size
+        self.cache = OrderedDict()        # key -> extractions
+        self.inflight = {}                # key -> asyncio.Future
+        self.stats = {"requests": 0, "cache_hits": 0, "coalesced": 0, "rejected": 0,
+                      "model_calls": 0, "model_errors": 0, "model_seconds": 0.0, "queue_wait_seconds": 0.0}
+        self.queue = None
+        self._pool = None
+        self._tasks = []
+
+    @staticmethod
+    def key(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="extract")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._pool.shutdown(wait=False)
+
+    async def submit(self, text):
+        """(extractions, source) with source in cache / coalesced / model; raises Busy."""
+        self.stats["requests"] += 1
+        key = self.key(text)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+            return self.cache[key], "cache"
+        fut = self.inflight.get(key)
+        if fut is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(fut), "coalesced"
+        if self.queue.full():
+            self.stats["rejected"] += 1
+            raise Busy()
+        fut = asyncio.get_running_loop().create_future()
+        self.inflight[key] = fut
+        self.queue.put_nowait((key, text, fut, time.perf_counter()))
+        return await asyncio.shield(fut), "model"
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            key, text, fut, queued = await self.queue.get()
+            t0 = time.perf_counter()
+            self.stats["queue_wait_seconds"] += t0 - queued
+            try:
+                result = await loop.run_in_executor(self._pool, self.backend, text)
+            except Exception as e:
+                self.stats["model_errors"] += 1
+                fut.set_exception(e)
+            else:
+                self.cache[key] = result
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+                fut.set_result(result)
+            finally:
+                self.stats["model_calls"] += 1
+                self.stats["model_seconds"] += time.perf_counter() - t0
+                self.inflight.pop(key, None)
+                self.queue.task_done()
+
+    def snapshot(self):
+        calls = self.stats["model_calls"]
+        return {**self.stats, "model_seconds": round(self.stats["model_seconds"], 3),
+                "queue_wait_seconds": round(self.stats["queue_wait_seconds"], 3),
+                "queue_wait_mean_s": round(self.stats["queue_wait_seconds"] / calls, 4) if calls else None,
+                "queue_depth": self.queue.qsize() if self.queue else 0, "queue_size": self.queue_size,
+                "inflight": len(self.inflight), "cached": len(self.cache), "workers": self.workers}
+
+def run_service(args):
+    import pandas as pd
+    from example_select import ExampleSelector
+    from extraction_core import MODEL_ID, VARIANTS, load_examples
+    from rule_extract import apply_rules, with_rules
+
+    variant = VARIANTS[args.variant]
+    df = pd.read_csv(args.csv) if args.csv and os.path.exists(args.csv) else None
+    examples, missing = load_examples(args.examples or variant["examples"], df)
+    # Operating_Mode / Power_Level are extracted locally (RULE_EXTRACT=0: by the model)
+    prompt, examples = apply_rules(variant["prompt"], examples)
+    selector = ExampleSelector(examples, k=args.top_k, token_budget=args.token_budget,
+                               prompt_description=prompt)
+    if args.backend == "langextract":
+        backend = LangextractBackend(prompt, selector, args.model_id or MODEL_ID)
+    else:
+        backend = HttpBackend(args.backend, prompt, selector)
+    backend = with_rules(backend)
+    print(f"[Examples] built: {len(examples)}; missing LER matches: {missing}")
+    service = ExtractionService(backend, args.workers, args.queue_size, args.cache_size)
+
+    async def handler(writer, method, path, body):
+        if path == "/health":
+            return await respond(writer, 200, {"status": "ok"})
+        if path == "/stats":
+            return await respond(writer, 200, service.snapshot())
+        if path != "/extract":
+            return await respond(writer, 404, {"error": "not found"})
+        if method != "POST":
+            return await respond(writer, 405, {"error": "POST a JSON body"})
+        try:
+            req = json.loads(body.decode("utf-8") or "{}")
+            text = req["text"]
+            if not isinstance(text, str) or not text.strip():
+                raise ValueError("`text` must be a non-empty string")
+        except (ValueError, KeyError, TypeError) as e:
+            return await respond(writer, 400, {"error": f"bad request: {e}"})
+        t0 = time.perf_counter()
+        try:
+            exts, source = await service.submit(text)
+        except Busy:
+            return await respond(writer, 503, {"error": "queue full"}, {"Retry-After": "1"})
+        except Exception as e:
+            return await respond(writer, 502, {"error": f"{type(e).__name__}: {e}"})
+        await respond(writer, 200, {"ler": req.get("ler"), "text": text, "Extractions": exts,
+                                    "source": source, "seconds": round(time.perf_counter() - t0, 4)})
+
+    serve_forever(handler, args.host, args.port, on_start=service.start)
+
+# ---------------------------
+# fake model endpoint (offline testing)
+# ---------------------------
+def run_fake_model(args):
+    from doc_loader import iter_jsonl
+    answers = {d.get("text") or "": d.get("Extractions") or [] for d in iter_jsonl(args.source)}
+    stats = {"calls": 0, "unknown": 0}
+    print(f"[Fake model] {len(answers)} answers from {args.source}, delay {args.delay}s")
+
+    async def handler(writer, method, path, body):
+        if path == "/stats":
+            return await respond(writer, 200, stats)
+        if method != "POST":
+            return await respond(writer, 405, {"error": "POST a JSON body"})
+        try:
+            text = json.loads(body.decode("utf-8"))["text"]
+        except (ValueError, KeyError, TypeError) as e:
+            return await respond(writer, 400, {"error": f"bad request: {e}"})
+        stats["calls"] += 1
+        await asyncio.sleep(args.delay)
+        if text not in answers:
+            stats["unknown"] += 1
+            return await respond(writer, 500, {"error": "unknown text"})
+        await respond(writer, 200, {"extractions": answers[text]})
+
+    serve_forever(handler, args.host, args.port)
+
+def main():
+    ap = argparse.ArgumentParser(description="Local extraction service.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("serve", help="run the extraction service")
+    s.add_argument("--host", default="127.0.0.1")
+    s.add_argument("--port", type=int, default=8100)
+    s.add_argument("--variant", choices=["text", "keyword"], default="text")
+    s.add_argument("--csv", default="data/ler_abstract.csv", help="abstracts for the example texts")
+    s.add_argument("--examples", default=None, help="examples JSON (default: the variant's)")
+    s.add_argument("--backend", default="langextract", help="`langextract` or a model endpoint URL")
+    s.add_argument("--model-id", default=None)
+    s.add_argument("--top-k", type=int, default=int(os.getenv("EXAMPLE_TOP_K", "0")))
+    s.add_argument("--token-budget", type=int, default=int(os.getenv("PROMPT_TOKEN_BUDGET", "0")) or None)
+    s.add_argument("--workers", type=int, default=4, help="concurrent model calls")
+    s.add_argument("--queue-size", type=int, default=64, help="pending calls before answering 503")
+    s.add_argument("--cache-size", type=int, default=4096)
+    f = sub.add_parser("fake-model", help="offline model endpoint answering from an extraction JSONL")
+    f.add_argument("--host", default="127.0.0.1")
+    f.add_argument("--port", type=int, default=8101)
+    f.add_argument("--source", default="extracted_text.jsonl")
+    f.add_argument("--delay", type=float, default=0.0, help="simulated model latency (s)")
+    args = ap.parse_args()
+
+    if args.cmd == "serve":
+        from dotenv import load_dotenv
+        load_dotenv()
+        run_service(args)
+    else:
+        run_fake_model(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+# extraction_core.py
+"""
+Shared pieces of the extraction scripts (01_run.py, 01_run_keyword.py) and
+the extraction service: prompt descriptions, few-shot example loading,
+the langextract call and conversion of its results to plain dicts.
+"""
+import json
+import textwrap
+
+# langextract (~1 s to import) is imported by the functions that call it, so
+# VARIANTS / CLASS_KEYS are cheap to import for the CLI and the service
+from example_select import CLASS_KEYS
+from schema import normalize_record
+from span_align import align_document
+
+MODEL_ID = "gemini-2.5-flash"
+
+# Extraction prompt for the research purpose
+PROMPT_DESCRIPTION = textwrap.dedent("""\
+    Extract the following structured information from the provided text.
+    Return precise, non-paraphrased spans copied from the text (short and specific).
+    Use multiple extractions per class if clearly supported by the text.
+    If a class is not mentioned, you may omit it EXCEPT for `Cause` (see rules below).
+
+    CLASSES TO EXTRACT
+    - `Operating_Mode`: The described reactor operating mode (e.g., "Mode 1", "MODE 3").
+        • attributes example: {"mode_number": 1, "vendor_family": "PWR|BWR"}  # optional normalization
+    - `Power_Level`: The described reactor/turbine power level.
+        • attributes example: {"percent": 14}  # normalize "full power"→100, "0 percent"→0
+    - `Condition`: The initiating plant condition/state that triggered the event (alarms, sensor states, abnormal parameters).
+        • attributes example: {"trigger": "..."}
+    - `Procedure_or_Regulation`: The procedure, regulation, or technical specification referenced or applied.
+        • attributes example: {"status": "inadequate / applicable / misunderstood / violated / followed"}
+    - `Human_Action`: The actual operator/human action taken.
+        • attributes example: {"adherence": "followed / not_followed / misinterpreted"}
+    - `Outcome`: The consequence/effect resulting from the condition or action.
+        • attributes example: {"consequence": "reactor trip / AFW actuation / unnecessary / unintended"}
+    - `Cause`: The root cause of the deviation. You MUST always return at least ONE `Cause`.
+    • attributes MUST include both {"category": "...", "code": "..."} chosen from the scheme below.
+    • If the text indicates no procedure-related issue, classify it into one of the extended not_applicable subcategories (NA-ME, NA-EN, NA-HW, NA-OP) instead of generic NA.
+    - `CorrectiveAction`: Corrective or follow-up actions (procedure revision, training, maintenance, design change, software change).
+        • attributes example: {"action_type": "revision / training / maintenance / software change"}
+
+    CAUSE CATEGORY & CODE SCHEME (pick exactly one code for the main/root cause)
+    - MA1 (misapplied_procedure): Procedure should have been applied but was NOT applied.
+    - MA2 (misapplied_procedure): Procedure should NOT have been applied, but WAS applied (e.g., entry criteria not met).
+    - MI  (misinterpreted_procedure): Operator misunderstood/misread the step or intent.
+    - CF1 (conflicting_procedure): Procedure assumptions conflict with actual plant conditions (infeasible as-found state).
+    - CF2 (conflicting_procedure): Procedure conflicts with other regulations/specs (e.g., Technical Specifications).
+    - CF3 (conflicting_procedure): Intrinsic defect/incorrect or wrong step in the procedure.
+    - CF4 (conflicting_procedure): Insufficient or ambiguous procedure description.
+    - NA  (not_applicable): External cause unrelated to procedures/regulations (e.g., weather, random equipment failure).
+    - NA-ME (mechanical/equipment failure): Random equipment failure or mechanical degradation.
+    - NA-EN (environmental cause): Weather or environmental events (e.g., lightning strike, flood).
+    - NA-HW (construction/installation defect): Manufacturing defect, poor workmanship, or installation error (e.g., weld defect, shipping flange left).
+    - NA-OP (external operational/vendor error): Vendor or contractor mistake, or external personnel operational error.
+
+    OUTPUT REQUIREMENTS
+    - Use the example format provided (one object per extraction): {extraction_class, extraction_text, attributes}.
+    - `attributes` for `Cause` MUST include BOTH: {"category": "...", "code": "..."} according to the scheme above.
+    - Prefer contiguous spans from the text; do NOT invent or generalize beyond the text.
+    - If multiple plausible causes are mentioned, choose the primary/root cause identified in the text.
+""")
+
+# keyword variant: same schema, keyword-level spans
+KEYWORD_PROMPT_DESCRIPTION = PROMPT_DESCRIPTION.replace(
+    "(short and specific).\n",
+    "(short and specific).\nKeep extraction_texts short (single noun phrase or keyword-level span).\n", 1)
+
+VARIANTS = {
+    "text": {"prompt": PROMPT_DESCRIPTION, "examples": "data/examples.json",
+             "output": "extracted_text.jsonl", "run_name": "extraction_text"},
+    "keyword": {"prompt": KEYWORD_PROMPT_DESCRIPTION, "examples": "data/examples_keyword.json",
+                "output": "extracted_keyword.jsonl", "run_name": "extraction_keyword"},
+}
+
+def to_list_maybe(x):
+    if x is None:
+        return []
+    return x if isinstance(x, list) else [x]
+
+def build_extractions_from_json(example_case):
+    """Convert one JSON case into a list of lx.data.Extraction objects.
+       Supports single object or list per class key.
+    """
+    import langextract as lx
+    extractions = []
+    for cls in CLASS_KEYS:
+        if cls in example_case and example_case[cls] is not None:
+            for item in to_list_maybe(example_case[cls]):
+                extraction_text = item.get("extraction_text", "")
+                attributes = item.get("attributes", {}) or {}
+                extractions.append(
+                    lx.data.Extraction(
+                        extraction_class=cls,
+                        extraction_text=extraction_text,
+                        attributes=attributes
+                    )
+                )
+    return extractions
+
+def build_examples(examples_data, df=None):
+    """
+    lx.data.ExampleData per examples.json case; returns (examples, missing LERs).
+    The example text is the CSV abstract of the case's LER (`file_name`) when
+    `df` has it, otherwise the case's own `text`.
+    """
+    import langextract as lx
+    examples, missing_ler = [], []
+    for case in examples_data:
+        ler_id = case.get("ler", "")
+        match = df.loc[df["file_name"] == ler_id] if df is not None else None
+        if match is None or match.empty:
+            raw_text = case.get("text", "")
+            if not raw_text:
+                missing_ler.append(ler_id)
+                continue
+        else:
+            raw_text = str(match.iloc[0]["abstract"] or "")
+        examples.append(lx.data.ExampleData(text=raw_text, extractions=build_extractions_from_json(case)))
+    return examples, missing_ler
+
+def load_examples(path, df=None):
+    with open(path, "r", encoding="utf-8") as f:
+        return build_examples(json.load(f), df)
+
+# Helper function to convert the `Extraction` object to a dictionary
+def extraction_to_dict(extraction):
+    # Create a dictionary from the CharInterval object's attributes
+    char_interval_data = None
+    if extraction.char_interval:
+        char_interval_data = {
+            'start_pos': extraction.char_interval.start_pos,
+            'end_pos': extraction.char_interval.end_pos
+        }
+
+    return {
+        'extraction_class': extraction.extraction_class,
+        'extraction_text': extraction.extraction_text,
+        'attributes': extraction.attributes,
+        'char_interval': char_interval_data # Store the converted dictionary
+    }
+
+# Combine the extracted information with existing DataFrame data
+# (char_interval repaired, see span_align.py; normalized, see schema.py)
+def combine_row(row, extractions):
+    extractions, _ = align_document({"text": row['abstract'], "Extractions": extractions})
+    return normalize_record({
+        "Facility_Name": row['facility_name'],
+        "Unit": row['unit'],
+        "Title": row['title'],
+        "Event_Date": row['event_date'],
+        "CFR": row['cfr'],
+        # Add the value of the "file_name" column to the "ler" key.
+        "ler": row['file_name'],
+        "text": row['abstract'],
+        "Extractions": extractions
+    })
+
+def extract(text, prompt_description, examples, model_id=MODEL_ID):
+    """One langextract call; returns the extractions as dicts."""
+    import langextract as lx
+    result = lx.extract(
+        text_or_documents=text,
+        prompt_description=prompt_description,
+        examples=examples,
+        model_id=model_id,
+    )
+    return [extraction_to_dict(e) for e in result.extractions]
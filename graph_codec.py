@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# graph_codec.py
+"""
+Compact encoding of the per-document graphs embedded in the viewer.
+
+    {"s": [...],            string table (groups, labels, titles, attribute JSON, edge labels)
+     "p": "d3_n",           node id = p + position   (or "i": [string ids] when ids are irregular)
+     "g": [..],             group string index per node
+     "t": [..],             title string index per node
+     "x": [s0, e0, ...],    title = document text[s:e] (s = -1: use "t"); only with the page text
+     "n": 60,               label = title truncated to n chars ("…"); otherwise "l": [label index]
+     "a": [[k, v, ..], ..], attributes as key / JSON-value string indexes; absent when nodes have none
+     "r": [[g1, g2, lab]],  rule: every node of group g1 -> every node of group g2
+     "e": [f, t, lab, ...]} remaining edges as flat (from, to, label) triples
+Label index -1 means "no label key". Titles are usually spans of the
+abstract that the page already shows, and edge sets that are a full
+class-to-class product (the rule-based graphs) shrink to one rule each; both
+are expanded by `decodeGraph` in the browser (JS_DECODER).
+
+  python graph_codec.py graph_text.json                 # size report
+  python graph_codec.py graph_text.json -o graph_text.cg.json --gzip
+"""
+import argparse, gzip, json, re
+
+JS_DECODER = """
+          function decodeGraph(c, text) {
+            const s = c.s, n = c.g.length, nodes = [], edges = [], byGroup = {};
+            const trunc = (v) => v.length <= c.n ? v : v.slice(0, c.n - 1) + '\u2026';
+            for (let i = 0; i < n; i++) {
+              const title = (c.x && c.x[2 * i] >= 0) ? (text || '').slice(c.x[2 * i], c.x[2 * i + 1]) : s[c.t[i]];
+              const node = { id: c.i ? s[c.i[i]] : c.p + i, label: c.l ? s[c.l[i]] : trunc(title),
+                             group: s[c.g[i]], title: title };
+              if (c.a) { node.attributes = {}; for (let k = 0; k < c.a[i].length; k += 2) node.attributes[s[c.a[i][k]]] = JSON.parse(s[c.a[i][k + 1]]); }
+              nodes.push(node);
+              (byGroup[c.g[i]] = byGroup[c.g[i]] || []).push(node.id);
+            }
+            const edge = (f, t, lab) => { const e = { from: f, to: t }; if (lab >= 0) e.label = s[lab]; edges.push(e); };
+            (c.r || []).forEach(([a, b, lab]) => (byGroup[a] || []).forEach(f => (byGroup[b] || []).forEach(t => edge(f, t, lab))));
+            const x = c.e || [];
+            for (let k = 0; k < x.length; k += 3) edge(nodes[x[k]].id, nodes[x[k + 1]].id, x[k + 2]);
+            return { nodes: nodes, edges: edges };
+          }
+"""
+
+def _bmp(s):
+    """Python and JS index strings the same way (no surrogate pairs)."""
+    return all(ord(ch) <= 0xFFFF for ch in s)
+
+def _truncate(s, n):
+    return s if len(s) <= n else s[: n - 1] + "…"
+
+class _Table:
+    def __init__(self):
+        self.ids, self.values = {}, []
+
+    def __call__(self, s):
+        i = self.ids.get(s)
+        if i is None:
+            i = self.ids[s] = len(self.values)
+            self.values.append(s)
+        return i
+
+def encode_graph(graph, text=None):
+    """Compact form of {nodes, edges}; `text` (the abstract shown on the page) lets titles become spans."""
+    nodes = (graph or {}).get("nodes") or []
+    edges = (graph or {}).get("edges") or []
+    st = _Table()
+    ids = [str(n.get("id")) for n in nodes]
+    out = {"s": st.values}
+
+    m = re.match(r"^(.*?)(\d+)$", ids[0]) if ids else None
+    prefix = m.group(1) if m else None
+    if prefix is not None and all(x == f"{prefix}{i}" for i, x in enumerate(ids)):
+        out["p"] = prefix
+    else:
+        out["i"] = [st(x) for x in ids]
+
+    pos = {x: i for i, x in enumerate(ids)}
+    groups = [st(str(n.get("group"))) for n in nodes]
+    out["g"] = groups
+    titles = [str(n.get("title", n.get("label"))) for n in nodes]
+    labels = [str(n.get("label")) for n in nodes]
+
+    spans = []
+    use_text = bool(text) and _bmp(text)
+    for t in titles:
+        at = text.find(t) if use_text and t and _bmp(t) else -1
+        spans += [at, at + len(t)] if at >= 0 else [-1, -1]
+    out["t"] = [st(t) if spans[2 * i] < 0 else -1 for i, t in enumerate(titles)]
+    if any(x >= 0 for x in spans[::2]):
+        out["x"] = spans
+
+    # labels: truncated titles when one width explains all of them
+    widths = {len(l) for t, l in zip(titles, labels) if l != t}
+    width = widths.pop() if len(widths) == 1 else (max(map(len, labels)) if labels and not widths else None)
+    if width and all(_bmp(t) and _truncate(t, width) == l for t, l in zip(titles, labels)):
+        out["n"] = width
+    else:
+        out["l"] = [st(l) for l in labels]
+    if any("attributes" in n for n in nodes):
+        out["a"] = [[i for k, v in (n.get("attributes") or {}).items()
+                     for i in (st(str(k)), st(json.dumps(v, ensure_ascii=False)))] for n in nodes]
+
+    # group edges by (source group, target group, label); full products become rules
+    members = {}
+    for i, g in enumerate(groups):
+        members.setdefault(g, []).append(i)
+    buckets = {}
+    for e in edges:
+        f, t = pos.get(str(e.get("from"))), pos.get(str(e.get("to")))
+        if f is None or t is None:
+            continue
+        lab = st(str(e["label"])) if "label" in e and e["label"] is not None else -1
+        buckets.setdefault((groups[f], groups[t], lab), []).append((f, t))
+    rules, rest = [], []
+    for (ga, gb, lab), pairs in buckets.items():
+        uniq = set(pairs)
+        if len(uniq) == len(pairs) and uniq == {(f, t) for f in members[ga] for t in members[gb]}:
+            rules.append([ga, gb, lab])
+        else:
+            for f, t in pairs:
+                rest += [f, t, lab]
+    if rules:
+        out["r"] = rules
+    if rest:
+        out["e"] = rest
+    return out
+
+def decode_graph(c, text=None):
+    """Python twin of the JS decoder (tests / tooling)."""
+    s = c["s"]
+    x = c.get("x")
+    nodes, by_group = [], {}
+    for i in range(len(c["g"])):
+        title = (text or "")[x[2 * i]:x[2 * i + 1]] if x and x[2 * i] >= 0 else s[c["t"][i]]
+        node = {"id": s[c["i"][i]] if "i" in c else f"{c['p']}{i}",
+                "label": s[c["l"][i]] if "l" in c else _truncate(title, c["n"]),
+                "group": s[c["g"][i]], "title": title}
+        if "a" in c:
+            a = c["a"][i]
+            node["attributes"] = {s[a[k]]: json.loads(s[a[k + 1]]) for k in range(0, len(a), 2)}
+        nodes.append(node)
+        by_group.setdefault(c["g"][i], []).append(node["id"])
+    edges = []
+
+    def edge(f, t, lab):
+        e = {"from": f, "to": t}
+        if lab >= 0:
+            e["label"] = s[lab]
+        edges.append(e)
+
+    for a, b, lab in c.get("r", []):
+        for f in by_group.get(a, []):
+            for t in by_group.get(b, []):
+                edge(f, t, lab)
+    x = c.get("e", [])
+    for k in range(0, len(x), 3):
+        edge(nodes[x[k]]["id"], nodes[x[k + 1]]["id"], x[k + 2])
+    return {"nodes": nodes, "edges": edges}
+
+def dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+def main():
+    ap = argparse.ArgumentParser(description="Encode graph JSON ([{ler, graph}]) compactly and report the savings.")
+    ap.add_argument("input", nargs="?", default="graph_text.json")
+    ap.add_argument("-o", "--output", default=None, help="write [{ler, graph: <compact>}]")
+    ap.add_argument("--gzip", action="store_true", help="also write <output>.gz")
+    args = ap.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        items = json.load(f)
+    full = compact = 0
+    out = []
+    for it in items:
+        g = it.get("graph") or {}
+        c = encode_graph(g)
+        full += len(json.dumps(g, ensure_ascii=False).encode("utf-8"))
+        compact += len(dumps(c).encode("utf-8"))
+        out.append({"ler": it.get("ler"), "graph": c})
+    print(f"{len(items)} graphs: {full:,} -> {compact:,} bytes ({full / max(1, compact):.1f}x)")
+    if args.output:
+        data = dumps(out)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data)
+        if args.gzip:
+            with gzip.open(args.output + ".gz", "wb", compresslevel=9) as f:
+                f.write(data.encode("utf-8"))
+        print(f"Wrote {args.output}" + (" (+ .gz)" if args.gzip else ""))
+
+if __name__ == "__main__":
+    main()
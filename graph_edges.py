@@ -0,0 +1,112 @@
+# graph_edges.py
+"""
+Edge inference for the per-document graphs (build_graph.py, 02_vis.py).
+
+The edge rules of the graph schema ({"from", "to", "relation"}) say which
+classes are linked. Two modes:
+
+  rules      every `from` node is linked to every `to` node (the edge count is
+             the product of the class sizes)
+  proximity  a pair is linked only when both spans (`char_interval`) start in
+             the same sentence or are at most `window` characters apart;
+             closest pairs first (same sentence before character gap), and no
+             node gets more than `max_fanout` edges per rule. When both classes
+             are present but no pair qualifies, the single closest pair is
+             linked so the relation stays visible. Nodes without a
+             char_interval only take part in that fallback.
+
+Settings: GRAPH_EDGES=rules|proximity, GRAPH_MAX_FANOUT (기본 2),
+GRAPH_EDGE_WINDOW (기본 200 chars); the schema's "edge_inference" object
+({"mode", "max_fanout", "window"}) sets defaults for a graph schema.
+"""
+import os
+from bisect import bisect_right
+
+from text_index import sentence_spans
+
+MODES = ("rules", "proximity")
+
+def settings(schema=None):
+    conf = (schema or {}).get("edge_inference") or {}
+    mode = os.environ.get("GRAPH_EDGES") or conf.get("mode") or "rules"
+    if mode not in MODES:
+        raise ValueError(f"GRAPH_EDGES must be one of {MODES}, got {mode!r}")
+    return {
+        "mode": mode,
+        "max_fanout": int(os.environ.get("GRAPH_MAX_FANOUT") or conf.get("max_fanout") or 2),
+        "window": int(os.environ.get("GRAPH_EDGE_WINDOW") or conf.get("window") or 200),
+    }
+
+def active_rules(rules, by_cls):
+    """(from, to, relation) of the rules that apply to a document's classes."""
+    for r in rules:
+        src_cls, dst_cls = r.get("from"), r.get("to")
+        # special rule: CorrectiveAction -> Procedure_or_Regulation else Outcome
+        if src_cls == "CorrectiveAction" and dst_cls == "Outcome" and by_cls.get("Procedure_or_Regulation"):
+            continue
+        yield src_cls, dst_cls, r.get("relation")
+
+def _edge(s, d, rel, labels):
+    e = {"from": s, "to": d}
+    if labels:
+        e["label"] = rel or ""
+    return e
+
+def cartesian_edges(by_cls, rules, labels=True):
+    edges = []
+    for src_cls, dst_cls, rel in active_rules(rules, by_cls):
+        for s in by_cls.get(src_cls, []):
+            for d in by_cls.get(dst_cls, []):
+                edges.append(_edge(s, d, rel, labels))
+    return edges
+
+def proximity_edges(by_cls, spans, rules, text=None, max_fanout=2, window=200, labels=True):
+    """
+    by_cls: {class: [node id]}, spans: {node id: (start, end) or None}.
+    Sentences come from `text` (without it, only the character window applies).
+    """
+    starts = [s for s, _ in sentence_spans(text)] if text else []
+    def sentence(node):
+        sp = spans.get(node)
+        return bisect_right(starts, sp[0]) - 1 if sp and starts else -1
+
+    sent = {n: sentence(n) for ids in by_cls.values() for n in ids}
+    edges = []
+    for src_cls, dst_cls, rel in active_rules(rules, by_cls):
+        src_ids, dst_ids = by_cls.get(src_cls, []), by_cls.get(dst_cls, [])
+        if not src_ids or not dst_ids:
+            continue
+        cand = []
+        for i, s in enumerate(src_ids):
+            a = spans.get(s)
+            for j, d in enumerate(dst_ids):
+                b = spans.get(d)
+                if s == d or not a or not b:
+                    continue
+                gap = max(0, b[0] - a[1], a[0] - b[1])
+                apart = not (sent[s] >= 0 and sent[s] == sent[d])
+                cand.append((apart, gap, i, j))
+        cand.sort()
+        out_deg, in_deg, n = {}, {}, len(edges)
+        for apart, gap, i, j in cand:
+            if apart and gap > window:
+                break
+            s, d = src_ids[i], dst_ids[j]
+            if out_deg.get(s, 0) < max_fanout and in_deg.get(d, 0) < max_fanout:
+                edges.append(_edge(s, d, rel, labels))
+                out_deg[s] = out_deg.get(s, 0) + 1
+                in_deg[d] = in_deg.get(d, 0) + 1
+        if len(edges) == n:
+            # nothing close: keep the relation with its closest (or first) pair
+            i, j = cand[0][2:] if cand else next(((i, j) for i, s in enumerate(src_ids)
+                                                 for j, d in enumerate(dst_ids) if s != d), (None, None))
+            if i is not None:
+                edges.append(_edge(src_ids[i], dst_ids[j], rel, labels))
+    return edges
+
+def infer_edges(by_cls, spans, rules, text=None, conf=None, labels=True):
+    """Edges of one document under `conf` (see settings())."""
+    conf = conf or settings()
+    if conf["mode"] == "proximity":
+        return proximity_edges(by_cls, spans, rules, text, conf["max_fanout"], conf["window"], labels)
+    return cartesian_edges(by_cls, rules, labels)
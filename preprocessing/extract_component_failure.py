@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 # extract_component_failure.py
-import re, json, argparse
+import re, json, argparse, sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))   # profiling.py (repo root)
+import profiling
+
 # ---------------------------
 # 1) 추출 규칙 (원본 유지)
 # ---------------------------
@@ -253,19 +256,27 @@ def main():
                     help="원본 추출 JSON (기본: component_failure.json)")
     ap.add_argument("--clean-output", default=None,
                     help="클린 결과 JSON (기본: <output>.cleaned.json)")
+    profiling.add_argument(ap)
     args = ap.parse_args()
+    profiling.start("extract_component_failure", args.profile)
 
     # 추출
-    results, miss = process_dir(Path(args.input_dir))
-    Path(args.output).write_text(
-        json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8'
-    )
+    with profiling.stage("extract") as st:
+        results, miss = process_dir(Path(args.input_dir))
+        st["items"], st["missed"] = len(results), len(miss)
+    with profiling.stage("write") as st:
+        Path(args.output).write_text(
+            json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8'
+        )
+        st["items"] = len(results)
     print(f"Wrote {len(results)} (raw) -> {args.output}")
     if miss:
         print("[WARN] no match:", ", ".join(miss[:10]) + (" ..." if len(miss)>10 else ""))
 
     # 클린
-    cleaned = clean_and_dedup(results)
+    with profiling.stage("clean") as st:
+        cleaned = clean_and_dedup(results)
+        st["items"] = len(cleaned)
     clean_path = args.clean_output
     if not clean_path:
         # output.json -> output.cleaned.json
@@ -274,9 +285,11 @@ def main():
         else:
             clean_path = args.output + ".cleaned.json"
 
-    Path(clean_path).write_text(
-        json.dumps(cleaned, ensure_ascii=False, indent=2), encoding='utf-8'
-    )
+    with profiling.stage("write") as st:
+        Path(clean_path).write_text(
+            json.dumps(cleaned, ensure_ascii=False, indent=2), encoding='utf-8'
+        )
+        st["items"] = len(cleaned)
     # 간단 통계
     null_counts = {
         k: sum(1 for r in cleaned if r.get(k) is None)
@@ -290,6 +303,7 @@ def main():
     print(f"Wrote {len(cleaned)} (cleaned) -> {clean_path}")
     print("Null counts:", null_counts)
     print("Flag counts:", {k:v for k,v in sorted(flag_counts.items(), key=lambda x:-x[1])})
+    profiling.finish()
 
 if __name__ == "__main__":
     main()
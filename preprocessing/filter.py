@@ -1,23 +1,23 @@
 import pandas as pd
 import re
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))   # profiling.py (repo root)
+import profiling
 
-def filter_data(input_file, output_file):
+def filter_df(df):
     """
-    Reads a CSV file, selects specific columns, removes rows where 'facility_name'
-    is empty or contains only specific unwanted characters, removes rows where
-    'abstract' exceeds 5000 characters, and removes rows where other columns
-    exceed 100 characters. Saves the result.
+    Selects specific columns, removes rows where 'facility_name' is empty or
+    contains only specific unwanted characters, removes rows where 'abstract'
+    exceeds 5000 characters, and removes rows where other columns exceed 100
+    characters.
 
     Args:
-        input_file (str): The path to the input CSV file.
-        output_file (str): The path where the filtered CSV file will be saved.
-    """
-    try:
-        df = pd.read_csv(input_file)
-    except FileNotFoundError:
-        print(f"Error: The file '{input_file}' was not found.")
-        return
+        df (pd.DataFrame): The preprocessed data (columns as in '02_preprocessed.csv').
 
+    Returns:
+        pd.DataFrame: The filtered data.
+    """
     # Select only the columns to keep
     columns_to_keep = [
         'facility_name', 'unit', 'title', 'event_date', 'abstract',
@@ -42,11 +42,37 @@ def filter_data(input_file, output_file):
     for col in other_cols:
         df_filtered = df_filtered[df_filtered[col].fillna('').astype(str).str.len() <= 100]
 
+    return df_filtered
+
+def filter_data(input_file, output_file):
+    """
+    Reads a CSV file, applies `filter_df` and saves the result.
+
+    Args:
+        input_file (str): The path to the input CSV file.
+        output_file (str): The path where the filtered CSV file will be saved.
+    """
+    try:
+        with profiling.stage("load") as st:
+            df = pd.read_csv(input_file)
+            st["items"] = len(df)
+    except FileNotFoundError:
+        print(f"Error: The file '{input_file}' was not found.")
+        return
+
+    with profiling.stage("transform") as st:
+        df_filtered = filter_df(df)
+        st["items"] = len(df_filtered)
+
     # Save the filtered DataFrame to a new CSV file.
-    df_filtered.to_csv(output_file, index=False)
+    with profiling.stage("write") as st:
+        df_filtered.to_csv(output_file, index=False)
+        st["items"] = len(df_filtered)
     print(f"Data successfully filtered. The specified columns and cleaned rows are saved to '{output_file}'.")
 
 if __name__ == '__main__':
     input_csv = '02_preprocessed.csv'
     output_csv = '03_filtered_data.csv'
+    profiling.start("filter")   # PROFILE=1
     filter_data(input_csv, output_csv)
+    profiling.finish()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# pipeline.py
+"""
+Runs merge -> preprocess -> filter in one process.
+
+The stages hand DataFrames to each other in memory; a CSV is written only for
+the stages listed in --materialize. Every stage gets a cache key derived from
+the input file and the source code of the stages up to it, so re-running with
+unchanged inputs skips the work (or resumes from the latest materialized
+output that is still valid).
+"""
+import argparse, hashlib, inspect, json, time
+from pathlib import Path
+
+STATE_NAME = ".pipeline_state.json"
+STAGE_NAMES = ["merge", "preprocess", "filter"]
+
+def load_merged(df):
+    # 01_merged.csv is produced outside this repo; the merge stage only passes it on.
+    return df
+
+def stages():
+    """(stage name, function, default output file) in order."""
+    # the stage modules import pandas; loaded here so that `--help` stays fast
+    from preprocessing import preprocess_df
+    from filter import filter_df
+    return [
+        ("merge", load_merged, "01_merged.csv"),
+        ("preprocess", preprocess_df, "02_preprocessed.csv"),
+        ("filter", filter_df, "03_filtered_data.csv"),
+    ]
+
+def file_digest(path, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def code_digest(fn):
+    src = Path(inspect.getsourcefile(fn)).read_bytes()
+    return hashlib.sha256(src).hexdigest()
+
+def stage_keys(input_path):
+    """Chained cache key per stage: hash(previous key, stage name, stage source)."""
+    key = file_digest(input_path)
+    keys = []
+    for name, fn, _ in stages():
+        key = hashlib.sha256(f"{key}:{name}:{code_digest(fn)}".encode()).hexdigest()
+        keys.append(key)
+    return keys
+
+def load_state(path):
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+def run_pipeline(input_path, outdir, materialize=("filter",), force=False, outputs=None):
+    """
+    Runs the stages and returns (DataFrame of the last stage or None, report rows).
+
+    `outputs` overrides the output path per stage name. A stage counts as
+    up to date when its key matches the state file and its output exists.
+    """
+    import pandas as pd
+    steps = stages()
+    input_path, outdir = Path(input_path), Path(outdir)
+    outputs = {name: Path(outputs[name]) if outputs and name in outputs else outdir / fname
+               for name, _, fname in steps}
+    materialize = set(materialize)
+    state_path = outdir / STATE_NAME
+    state = {} if force else load_state(state_path)
+    keys = stage_keys(input_path)
+
+    def fresh(i):
+        name = steps[i][0]
+        rec = state.get(name) or {}
+        return rec.get("key") == keys[i] and outputs[name].exists()
+
+    report = []
+    last = len(steps) - 1
+
+    # Everything requested is already materialized with a matching key -> nothing to do.
+    wanted = [i for i, (name, _, _) in enumerate(steps) if name in materialize]
+    if wanted and all(fresh(i) for i in wanted):
+        for name, _, _ in steps:
+            rec = state.get(name) or {}
+            report.append({"stage": name, "status": "skipped", "rows_in": rec.get("rows_in"),
+                           "rows_out": rec.get("rows_out"), "seconds": 0.0})
+        return None, report
+
+    # Resume from the latest valid materialized output before the first stale request.
+    first_stale = min(i for i in wanted if not fresh(i)) if wanted else last + 1
+    start, df = 0, None
+    for i in range(first_stale - 1, -1, -1):
+        if fresh(i):
+            name = steps[i][0]
+            t0 = time.perf_counter()
+            df = pd.read_csv(outputs[name])
+            for j in range(i):
+                report.append({"stage": steps[j][0], "status": "skipped", "rows_in": None,
+                               "rows_out": None, "seconds": 0.0})
+            report.append({"stage": name, "status": "cached", "rows_in": None,
+                           "rows_out": len(df), "seconds": round(time.perf_counter() - t0, 4)})
+            start = i + 1
+            break
+
+    if df is None:
+        df = pd.read_csv(input_path)
+
+    for i in range(start, len(steps)):
+        name, fn, _ = steps[i]
+        rows_in = len(df)
+        t0 = time.perf_counter()
+        df = fn(df)
+        seconds = time.perf_counter() - t0
+        status = "ran"
+        if name in materialize and not (name == "merge" and outputs[name].resolve() == input_path.resolve()):
+            df.to_csv(outputs[name], index=False)
+            status = "ran+written"
+        state[name] = {"key": keys[i], "rows_in": rows_in, "rows_out": len(df),
+                       "seconds": round(seconds, 4), "output": str(outputs[name]),
+                       "materialized": name in materialize}
+        if name not in materialize:
+            # not on disk, so it cannot be reused by a later run
+            state[name]["key"] = None
+        report.append({"stage": name, "status": status, "rows_in": rows_in,
+                       "rows_out": len(df), "seconds": round(seconds, 4)})
+
+    state_path.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    return df, report
+
+def main():
+    ap = argparse.ArgumentParser(description="Run merge -> preprocess -> filter in memory.")
+    ap.add_argument("input", nargs="?", default="01_merged.csv", help="merged CSV (기본: 01_merged.csv)")
+    ap.add_argument("--outdir", default=".", help="output / state directory")
+    ap.add_argument("--materialize", nargs="*", default=["filter"],
+                    choices=STAGE_NAMES + ["all"],
+                    help="stages whose output CSV is written (기본: filter)")
+    ap.add_argument("--filtered-output", default=None,
+                    help="write the filter stage to this path (e.g. ../data/ler_abstract.csv)")
+    ap.add_argument("--report", default=None, help="write the per-stage report as JSON")
+    ap.add_argument("--force", action="store_true", help="ignore the state file and rerun all stages")
+    args = ap.parse_args()
+
+    materialize = STAGE_NAMES if "all" in args.materialize else args.materialize
+    outputs = {"filter": args.filtered_output} if args.filtered_output else None
+    _, report = run_pipeline(args.input, args.outdir, materialize, args.force, outputs)
+
+    print(f"{'stage':<12}{'status':<14}{'rows_in':>9}{'rows_out':>10}{'seconds':>10}")
+    for r in report:
+        rows_in = "-" if r["rows_in"] is None else r["rows_in"]
+        rows_out = "-" if r["rows_out"] is None else r["rows_out"]
+        print(f"{r['stage']:<12}{r['status']:<14}{rows_in:>9}{rows_out:>10}{r['seconds']:>10.4f}")
+    if args.report:
+        Path(args.report).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,20 @@
 import pandas as pd
 import re
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))   # profiling.py (repo root)
+import profiling
 
-def full_preprocessing(input_file, output_file):
+def preprocess_df(df):
     """
-    Performs all requested preprocessing steps on the original data.
+    Applies the preprocessing steps to an in-memory DataFrame.
 
     Args:
-        input_file (str): The path to the original CSV file.
-        output_file (str): The path where the final preprocessed CSV file will be saved.
-    """
-    try:
-        df = pd.read_csv(input_file)
-    except FileNotFoundError:
-        print(f"Error: The file '{input_file}' was not found.")
-        return
+        df (pd.DataFrame): The merged LER data (columns as in '01_merged.csv').
 
+    Returns:
+        pd.DataFrame: The preprocessed data (columns as in '02_preprocessed.csv').
+    """
     # 1. Clean the 'Facility Name' column by removing quotes and extra spaces
     if 'Facility Name' in df.columns:
         # A more robust regex to remove various types of quotes and extra spaces.
@@ -44,11 +44,37 @@ def full_preprocessing(input_file, output_file):
         cols.insert(idx + 1, 'unit')
         df = df[cols]
 
+    return df
+
+def full_preprocessing(input_file, output_file):
+    """
+    Performs all requested preprocessing steps on the original data.
+
+    Args:
+        input_file (str): The path to the original CSV file.
+        output_file (str): The path where the final preprocessed CSV file will be saved.
+    """
+    try:
+        with profiling.stage("load") as st:
+            df = pd.read_csv(input_file)
+            st["items"] = len(df)
+    except FileNotFoundError:
+        print(f"Error: The file '{input_file}' was not found.")
+        return
+
+    with profiling.stage("transform") as st:
+        df = preprocess_df(df)
+        st["items"] = len(df)
+
     # 6. Save the cleaned DataFrame to the fixed output file name
-    df.to_csv(output_file, index=False)
+    with profiling.stage("write") as st:
+        df.to_csv(output_file, index=False)
+        st["items"] = len(df)
     print(f"All preprocessing steps successfully completed and data saved to '{output_file}'.")
 
 if __name__ == '__main__':
     input_csv = '01_merged.csv'
     output_csv = '02_preprocessed.csv'
-    full_preprocessing(input_csv, output_csv)
\ No newline at end of file
+    profiling.start("preprocessing")   # PROFILE=1
+    full_preprocessing(input_csv, output_csv)
+    profiling.finish()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# profiling.py
+"""
+Opt-in per-stage profiling for the pipeline scripts.
+
+A script turns it on with `profiling.start(<script>, mode)` (the `--profile`
+flag, or PROFILE=1 for the env-configured scripts); until then every hook
+below is a no-op. Stages are marked either as checkpoints in straight-line
+code
+
+    profiling.begin("load") ... profiling.begin("transform") ... profiling.end(items=n)
+
+(`begin` closes the running checkpoint) or as blocks inside functions
+
+    with profiling.stage("render") as st:
+        ...
+        st["items"] = len(docs)
+
+A stage entered several times is aggregated (calls, summed time and counts).
+Per stage: wall and CPU time, RSS after the stage, peak RSS (per stage where
+Linux lets us reset the high-water mark, else the process peak so far) and
+any numeric counts the stage sets. `finish()` writes `<PROFILE_DIR>/<script>_profile.json`
+(default dir: metrics) and appends the same record to `profile_history.jsonl`
+so runs can be trended across releases.
+
+  PROFILE=1 python 01_run.py                      # stage timings
+  python analyze.py --profile cprofile            # + cProfile dump (<script>.prof) and hotspots
+  python 02_vis.py --profile pyinstrument         # + pyinstrument HTML (if installed)
+  python profiling.py compare metrics/analyze_profile.json other/analyze_profile.json
+  python profiling.py trend --script analyze
+"""
+import argparse, atexit, json, os, platform, subprocess, sys, time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+MODES = ("stages", "cprofile", "pyinstrument")
+FORMAT = "visler-profile/1"
+HISTORY_NAME = "profile_history.jsonl"
+ROOT = Path(__file__).resolve().parent
+
+_active = None
+
+def _proc_rss():
+    """(current RSS MB, peak RSS MB); None where unknown."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            vals = {k: int(v.split()[0]) for k, v in (line.split(":", 1) for line in f) if k in ("VmRSS", "VmHWM")}
+        return round(vals["VmRSS"] / 1024, 1), round(vals["VmHWM"] / 1024, 1)
+    except (OSError, KeyError, ValueError):
+        pass
+    if resource is None:
+        return None, None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return None, round(peak / (2**20 if sys.platform == "darwin" else 1024), 1)
+
+def _reset_peak():
+    """Resets the kernel's peak RSS of this process (Linux); False when not possible."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+class Profiler:
+    def __init__(self, script, mode="stages", outdir="metrics"):
+        self.script = script
+        self.mode = mode
+        self.outdir = Path(outdir)
+        self.stages = {}
+        self.peak_mb = 0.0
+        self.stage_peaks = True
+        self._depth = 0
+        self._checkpoint = None
+        self._finished = False
+        self._tool = None
+        if mode == "pyinstrument":
+            try:
+                import pyinstrument
+                self._tool = pyinstrument.Profiler()
+            except ImportError:
+                print("[Profile] pyinstrument is not installed; using cProfile")
+                self.mode = mode = "cprofile"
+        if mode == "cprofile":
+            import cProfile
+            self._tool = cProfile.Profile()
+        self.started = time.time()
+        self._t0, self._c0 = time.perf_counter(), time.process_time()
+        if self._tool is not None:
+            self._tool.enable() if mode == "cprofile" else self._tool.start()
+
+    @contextmanager
+    def stage(self, name):
+        top = self._depth == 0
+        if top:
+            self.stage_peaks = _reset_peak() and self.stage_peaks
+        self._depth += 1
+        rec = {}
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield rec
+        finally:
+            wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+            self._depth -= 1
+            rss, peak = _proc_rss()
+            s = self.stages.setdefault(name, {"name": name, "calls": 0, "wall_s": 0.0, "cpu_s": 0.0,
+                                              "rss_mb": None, "rss_peak_mb": None, "counts": {}})
+            s["calls"] += 1
+            s["wall_s"] += wall
+            s["cpu_s"] += cpu
+            s["rss_mb"] = rss
+            if peak is not None:
+                s["rss_peak_mb"] = max(s["rss_peak_mb"] or 0.0, peak)
+                self.peak_mb = max(self.peak_mb, peak)
+            for k, v in rec.items():
+                if isinstance(v, (int, float)) and not isinstance(v, bool):
+                    s["counts"][k] = s["counts"].get(k, 0) + v
+
+    def begin(self, name):
+        self.end()
+        cm = self.stage(name)
+        self._checkpoint = (cm, cm.__enter__())
+
+    def end(self, **counts):
+        if self._checkpoint is None:
+            return
+        cm, rec = self._checkpoint
+        self._checkpoint = None
+        rec.update(counts)
+        cm.__exit__(None, None, None)
+
+    def _hotspots(self, top=25):
+        import pstats
+        self.outdir.mkdir(parents=True, exist_ok=True)
+        dump = self.outdir / f"{self.script}.prof"
+        self._tool.dump_stats(str(dump))
+        stats = pstats.Stats(self._tool).stats
+        rows = sorted(stats.items(), key=lambda x: -x[1][3])[:top]
+        return str(dump), [{"function": f"{Path(f).name}:{line}({fn})", "calls": nc, "tottime_s": round(tt, 4),
+                            "cumtime_s": round(ct, 4)} for (f, line, fn), (_, nc, tt, ct, _) in rows]
+
+    def result(self):
+        rss, peak = _proc_rss()
+        return {
+            "format": FORMAT,
+            "script": self.script,
+            "mode": self.mode,
+            "argv": sys.argv[1:],
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "rss_peak_scope": "stage" if self.stage_peaks else "process",
+            "total": {"wall_s": round(time.perf_counter() - self._t0, 4),
+                      "cpu_s": round(time.process_time() - self._c0, 4),
+                      "rss_mb": rss, "rss_peak_mb": max(self.peak_mb, peak or 0.0) or None},
+            "stages": [{**s, "wall_s": round(s["wall_s"], 4), "cpu_s": round(s["cpu_s"], 4)}
+                       for s in self.stages.values()],
+        }
+
+    def finish(self):
+        """Writes the profile (once) and returns it."""
+        if self._finished:
+            return None
+        self._finished = True
+        self.end()
+        if self._tool is not None:
+            self._tool.disable() if self.mode == "cprofile" else self._tool.stop()
+        out = self.result()
+        self.outdir.mkdir(parents=True, exist_ok=True)
+        if self.mode == "cprofile":
+            out["cprofile_dump"], out["hotspots"] = self._hotspots()
+        elif self.mode == "pyinstrument":
+            path = self.outdir / f"{self.script}.pyinstrument.html"
+            path.write_text(self._tool.output_html(), encoding="utf-8")
+            out["pyinstrument_html"] = str(path)
+        path = self.outdir / f"{self.script}_profile.json"
+        path.write_text(json.dumps(out, indent=2), encoding="utf-8")
+        with open(self.outdir / HISTORY_NAME, "a", encoding="utf-8") as f:
+            f.write(json.dumps(out) + "\n")
+        print_profile(out)
+        print(f"[Profile] written to '{path}'")
+        return out
+
+def mode_from(value=None):
+    """Profiling mode from a --profile value or PROFILE (1 = stages, 0/unset = off)."""
+    value = value if value is not None else os.getenv("PROFILE", "0")
+    value = str(value).strip().lower()
+    if value in ("", "0", "off", "false", "no"):
+        return None
+    return value if value in MODES else "stages"
+
+def add_argument(ap):
+    ap.add_argument("--profile", nargs="?", const="stages", default=None, choices=MODES,
+                    help="per-stage timing / memory to $PROFILE_DIR (기본: metrics); "
+                         "cprofile / pyinstrument also record a profile")
+
+def start(script, mode=None):
+    """Activates profiling for this process when `mode` (or PROFILE) asks for it; returns the Profiler or None."""
+    global _active
+    mode = mode_from(mode)
+    if mode is None or _active is not None:
+        return _active
+    _active = Profiler(script, mode, os.getenv("PROFILE_DIR", "metrics"))
+    atexit.register(_active.finish)     # also covers early exit()s
+    return _active
+
+def active():
+    return _active
+
+def stage(name):
+    return _active.stage(name) if _active is not None else nullcontext({})
+
+def begin(name):
+    if _active is not None:
+        _active.begin(name)
+
+def end(**counts):
+    if _active is not None:
+        _active.end(**counts)
+
+def finish():
+    return _active.finish() if _active is not None else None
+
+def print_profile(p):
+    t = p["total"]
+    print(f"\n[Profile] {p['script']}: {t['wall_s']:.3f}s wall, {t['cpu_s']:.3f}s CPU, peak RSS {t['rss_peak_mb']} MB")
+    print(f"{'stage':<16}{'calls':>6}{'wall s':>10}{'cpu s':>10}{'rss MB':>9}{'peak MB':>9}  counts")
+    for s in p["stages"]:
+        counts = ", ".join(f"{k}={v}" for k, v in s["counts"].items())
+        print(f"{s['name']:<16}{s['calls']:>6}{s['wall_s']:>10.3f}{s['cpu_s']:>10.3f}"
+              f"{s['rss_mb'] if s['rss_mb'] is not None else '-':>9}"
+              f"{s['rss_peak_mb'] if s['rss_peak_mb'] is not None else '-':>9}  {counts}")
+    for h in p.get("hotspots", [])[:10]:
+        print(f"  {h['cumtime_s']:>9.3f}s cum {h['tottime_s']:>9.3f}s own {h['calls']:>8}  {h['function']}")
+
+def compare(a_path, b_path):
+    a = json.loads(Path(a_path).read_text(encoding="utf-8"))
+    b = json.loads(Path(b_path).read_text(encoding="utf-8"))
+    print(f"A: {a_path} ({a['script']}, rev={a['git_rev']}, {a['started']})")
+    print(f"B: {b_path} ({b['script']}, rev={b['git_rev']}, {b['started']})")
+    print(f"{'stage':<16}{'A s':>10}{'B s':>10}{'B/A':>8}{'A MB':>10}{'B MB':>10}")
+    sb = {s["name"]: s for s in b["stages"]}
+    rows = [(s["name"], s, sb[s["name"]]) for s in a["stages"] if s["name"] in sb]
+    rows.append(("total", a["total"], b["total"]))
+    for name, x, y in rows:
+        ratio = y["wall_s"] / x["wall_s"] if x["wall_s"] else float("nan")
+        print(f"{name:<16}{x['wall_s']:>10.3f}{y['wall_s']:>10.3f}{ratio:>8.2f}"
+              f"{x['rss_peak_mb'] or 0:>10.1f}{y['rss_peak_mb'] or 0:>10.1f}")
+
+def trend(history, script=None):
+    with open(history, "r", encoding="utf-8") as f:
+        runs = [json.loads(line) for line in f if line.strip()]
+    runs = [r for r in runs if script is None or r["script"] == script]
+    names = []
+    for r in runs:
+        names += [s["name"] for s in r["stages"] if s["name"] not in names]
+    print(f"{'started':<20}{'script':<16}{'rev':<10}{'total s':>9}" + "".join(f"{n[:10]:>11}" for n in names))
+    for r in runs:
+        by = {s["name"]: s["wall_s"] for s in r["stages"]}
+        print(f"{r['started']:<20}{r['script']:<16}{str(r['git_rev']):<10}{r['total']['wall_s']:>9.3f}"
+              + "".join(f"{by[n]:>11.3f}" if n in by else f"{'-':>11}" for n in names))
+
+def main():
+    ap = argparse.ArgumentParser(description="Show, compare or trend profiles written with --profile / PROFILE=1.")
+    ap.add_argument("command", choices=["show", "compare", "trend"])
+    ap.add_argument("paths", nargs="*", help="show: profile JSON; compare: two profile JSONs; trend: history JSONL")
+    ap.add_argument("--script", default=None, help="trend: only this script")
+    args = ap.parse_args()
+    if args.command == "show":
+        for p in args.paths:
+            print_profile(json.loads(Path(p).read_text(encoding="utf-8")))
+    elif args.command == "compare":
+        if len(args.paths) != 2:
+            ap.error("compare needs two profile JSONs")
+        compare(*args.paths)
+    else:
+        trend(args.paths[0] if args.paths else os.path.join(os.getenv("PROFILE_DIR", "metrics"), HISTORY_NAME),
+              args.script)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# rule_extract.py
+"""
+Rule-based extraction of the deterministic classes (Operating_Mode,
+Power_Level), so the model is only asked for the rest.
+
+`extract_rules(text)` returns extraction dicts in the same shape as
+extraction_core.extraction_to_dict (char_interval into `text`, string
+attribute values as the model returns them). `apply_rules` removes the two
+classes from the prompt description and the few-shot examples, and
+`merge_extractions` puts the rule results in front of the model's (any
+Operating_Mode / Power_Level the model still returns is dropped).
+RULE_EXTRACT=0 turns this off in the extraction scripts, the service and watch.py.
+
+  python rule_extract.py extracted_keyword.jsonl     # agreement with the model's spans
+"""
+import argparse, copy, json, os, re
+
+RULE_CLASSES = ("Operating_Mode", "Power_Level")
+
+_MODE_NUMBER = re.compile(r"\bmode\s*([1-6])\b", re.I)
+_MODE_NAMED = re.compile(
+    r"\b(?:in|at|entered)\s+(?:a\s+|the\s+)?(power operation|startup|hot standby|hot shutdown|cold shutdown|refuel(?:l)?ing)"
+    r"(?:\s+mode)?\b", re.I)
+_NUMBER_WORDS = {w: i for i, w in enumerate(
+    "zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen sixteen "
+    "seventeen eighteen nineteen twenty".split())}
+_NUMBER_WORDS.update({"thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+                      "one hundred": 100})
+_QUALIFIER = r"(?:approximately\s+|about\s+|nearly\s+)?"
+_NUMBER = r"(\d{1,3}(?:\.\d+)?|" + "|".join(sorted(_NUMBER_WORDS, key=len, reverse=True)) + ")"
+# "12 percent power", "approximately 100% rated thermal power", "sixteen percent power"
+_POWER_PERCENT = re.compile(
+    r"\b" + _QUALIFIER + _NUMBER + r"\s*(?:%|percent)\s+(?:of\s+)?(?:rated\s+)?(?:thermal\s+|reactor\s+)?power(?:\s+level)?\b",
+    re.I)
+# "reactor power at approximately 8%" (span: the value)
+_POWER_AT = re.compile(r"\bpower\s+(?:level\s+)?(?:at|of|was)\s+(" + _QUALIFIER + _NUMBER + r"\s*(?:%|percent))", re.I)
+_POWER_NAMED = re.compile(r"\b(full|zero)\s+power\b", re.I)
+_PWR = re.compile(r"\bPWR\b|pressuri[sz]ed water", re.I)
+_BWR = re.compile(r"\bBWR\b|boiling water", re.I)
+
+# named modes -> Technical Specification mode number per reactor type
+NAMED_MODES = {
+    "PWR": {"power operation": 1, "startup": 2, "hot standby": 3, "hot shutdown": 4, "cold shutdown": 5,
+            "refueling": 6},
+    "BWR": {"power operation": 1, "startup": 2, "hot shutdown": 3, "cold shutdown": 4, "refueling": 5},
+}
+
+def vendor_family(text):
+    pwr, bwr = bool(_PWR.search(text)), bool(_BWR.search(text))
+    return "PWR" if pwr and not bwr else "BWR" if bwr and not pwr else None
+
+def _percent(value):
+    value = value.lower()
+    if value in _NUMBER_WORDS:
+        return str(_NUMBER_WORDS[value])
+    return value[:-2] if value.endswith(".0") else value
+
+def _ext(cls, text, start, end, attributes):
+    return {"extraction_class": cls, "extraction_text": text[start:end], "attributes": attributes,
+            "char_interval": {"start_pos": start, "end_pos": end}}
+
+def extract_rules(text):
+    """Operating_Mode / Power_Level extractions of one abstract, in text order."""
+    text = str(text or "")
+    family = vendor_family(text)
+    fam = {"vendor_family": family} if family else {}
+    out = []
+    for m in _MODE_NUMBER.finditer(text):
+        out.append(_ext("Operating_Mode", text, m.start(), m.end(), {"mode_number": m.group(1), **fam}))
+    for m in _MODE_NAMED.finditer(text):
+        name = m.group(1).lower().replace("refuelling", "refueling")
+        numbers = {NAMED_MODES[f].get(name) for f in ([family] if family else NAMED_MODES)}
+        attrs = {"mode_number": str(numbers.pop())} if len(numbers) == 1 and None not in numbers else {}
+        out.append(_ext("Operating_Mode", text, m.start(1), m.end(), {**attrs, **fam}))
+    for m in _POWER_PERCENT.finditer(text):
+        out.append(_ext("Power_Level", text, m.start(), m.end(), {"percent": _percent(m.group(1))}))
+    for m in _POWER_AT.finditer(text):
+        out.append(_ext("Power_Level", text, m.start(1), m.end(1), {"percent": _percent(m.group(2))}))
+    for m in _POWER_NAMED.finditer(text):
+        out.append(_ext("Power_Level", text, m.start(), m.end(),
+                        {"percent": "100" if m.group(1).lower() == "full" else "0"}))
+    # overlapping matches keep the first (longest at the same start)
+    kept, cur = [], -1
+    for e in sorted(out, key=lambda e: (e["char_interval"]["start_pos"], -e["char_interval"]["end_pos"])):
+        if e["char_interval"]["start_pos"] >= cur:
+            kept.append(e)
+            cur = e["char_interval"]["end_pos"]
+    return kept
+
+def narrow_prompt(prompt, classes=RULE_CLASSES):
+    """Prompt description without the bullets (and their attribute lines) of `classes`."""
+    out, skip = [], False
+    for line in prompt.splitlines(keepends=True):
+        stripped = line.strip()
+        if stripped.startswith("- `"):
+            skip = any(stripped.startswith(f"- `{c}`") for c in classes)
+        elif not stripped.startswith("•"):
+            skip = False
+        if not skip:
+            out.append(line)
+    return "".join(out)
+
+def drop_classes(examples, classes=RULE_CLASSES):
+    """Copies of lx.data.ExampleData without extractions of `classes`."""
+    out = []
+    for ex in examples:
+        ex = copy.copy(ex)
+        ex.extractions = [e for e in (ex.extractions or []) if e.extraction_class not in classes]
+        out.append(ex)
+    return out
+
+def rules_enabled():
+    return os.getenv("RULE_EXTRACT", "1") != "0"
+
+def apply_rules(prompt, examples):
+    """(prompt, examples) for the model when the rule classes are handled locally."""
+    if not rules_enabled():
+        return prompt, examples
+    return narrow_prompt(prompt), drop_classes(examples)
+
+def merge_extractions(rule_exts, model_exts, classes=RULE_CLASSES):
+    return list(rule_exts) + [e for e in model_exts or [] if (e or {}).get("extraction_class") not in classes]
+
+def with_rules(backend):
+    """Wraps a text -> extractions backend so the rule classes are added locally."""
+    if not rules_enabled():
+        return backend
+    return lambda text, *a, **kw: merge_extractions(extract_rules(text), backend(text, *a, **kw))
+
+def main():
+    ap = argparse.ArgumentParser(description="Agreement of the rule-based Operating_Mode / Power_Level spans "
+                                             "with the model's spans in an extraction JSONL.")
+    ap.add_argument("jsonl", nargs="?", default="extracted_keyword.jsonl")
+    path = ap.parse_args().jsonl
+    stats = {c: {"model": 0, "rules": 0, "same_span": 0, "same_value": 0} for c in RULE_CLASSES}
+    key = {"Operating_Mode": "mode_number", "Power_Level": "percent"}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            doc = json.loads(line)
+            rules = extract_rules(doc.get("text"))
+            for c in RULE_CLASSES:
+                got = {(e["char_interval"]["start_pos"], e["char_interval"]["end_pos"]): e for e in rules
+                       if e["extraction_class"] == c}
+                want = [e for e in doc.get("Extractions") or [] if e.get("extraction_class") == c]
+                stats[c]["model"] += len(want)
+                stats[c]["rules"] += len(got)
+                for e in want:
+                    ci = e.get("char_interval") or {}
+                    hit = got.get((ci.get("start_pos"), ci.get("end_pos")))
+                    if hit:
+                        stats[c]["same_span"] += 1
+                        stats[c]["same_value"] += str((e.get("attributes") or {}).get(key[c])) == \
+                            str(hit["attributes"].get(key[c]))
+    for c, s in stats.items():
+        print(f"{c}: model {s['model']}, rules {s['rules']}, same span {s['same_span']}, same value {s['same_value']}")
+
+if __name__ == "__main__":
+    main()
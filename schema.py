@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# schema.py
+"""
+Write-time normalization of extraction records.
+
+`normalize_record(doc)` is applied when a record is written (extraction_core.combine_row)
+and checks it against the compiled schema below:
+
+  - class names are canonical (`Corrective_Action` / `corrective action` -> `CorrectiveAction`);
+    unknown classes are dropped,
+  - `attributes` is a dict and `char_interval` either None or integer positions inside the text,
+  - Cause codes are canonical (`na_me`, `CF-3` -> `NA-ME`, `CF3`) and the category follows the code,
+  - `Primary_Cause` ({text, category, code} of the first Cause with both category and
+    code, else the first with a code, else the first Cause; None without a Cause) is stored
+    on the record, with `Schema_Version`; problems found are listed in `Schema_Issues`.
+
+Consumers call `ensure_normalized` / `primary_cause_of`, which return stored values for
+records at the current version and normalize older files on the fly.
+
+  python schema.py extracted_text.jsonl                 # report
+  python schema.py extracted_text.jsonl --write         # normalize the file in place
+"""
+import argparse, json, os, re
+
+SCHEMA_VERSION = 1
+SCHEMA_FIELDS = ["Schema_Version", "Primary_Cause"]
+
+CLASSES = ["Operating_Mode", "Power_Level", "Condition", "Procedure_or_Regulation",
+           "Human_Action", "Outcome", "Cause", "CorrectiveAction"]
+CODE_CATEGORIES = {
+    "MA1": "misapplied_procedure", "MA2": "misapplied_procedure",
+    "MI": "misinterpreted_procedure",
+    "CF1": "conflicting_procedure", "CF2": "conflicting_procedure",
+    "CF3": "conflicting_procedure", "CF4": "conflicting_procedure",
+    "NA": "not_applicable", "NA-ME": "not_applicable", "NA-EN": "not_applicable",
+    "NA-HW": "not_applicable", "NA-OP": "not_applicable",
+}
+
+def _class_key(name):
+    return re.sub(r"[^a-z]", "", str(name).lower())
+
+# compiled lookups: any spelling that differs only in case / separators maps to the canonical name
+_CLASS_LOOKUP = {_class_key(c): c for c in CLASSES}
+_CODE_LOOKUP = {re.sub(r"[^A-Z0-9]", "", c): c for c in CODE_CATEGORIES}
+
+def canonical_class(name):
+    """Canonical class name, or None for an unknown class."""
+    if name in CLASSES:
+        return name
+    return _CLASS_LOOKUP.get(_class_key(name or ""))
+
+def canonical_code(code):
+    if code is None:
+        return None
+    return _CODE_LOOKUP.get(re.sub(r"[^A-Z0-9]", "", str(code).upper()))
+
+def cause_rank(attrs):
+    # analyze.py's order: category and code, then code only
+    return 2 if attrs.get("category") is not None and attrs.get("code") is not None else \
+        1 if attrs.get("code") is not None else 0
+
+def primary_cause(extractions):
+    """{text, category, code} of the primary Cause of (normalized) extractions, or None."""
+    best, rank = None, -1
+    for e in extractions or []:
+        if (e or {}).get("extraction_class") != "Cause":
+            continue
+        attrs = e.get("attributes") or {}
+        r = cause_rank(attrs)
+        if r > rank:
+            best, rank = {"text": e.get("extraction_text"), "category": attrs.get("category"),
+                          "code": attrs.get("code")}, r
+    return best
+
+def normalize_extraction(e, text, issues):
+    """Normalized copy of one extraction, or None when it cannot be kept."""
+    if not isinstance(e, dict):
+        issues.append("extraction is not an object")
+        return None
+    cls = canonical_class(e.get("extraction_class"))
+    if cls is None:
+        issues.append(f"unknown class {e.get('extraction_class')!r}")
+        return None
+    out = dict(e)
+    out["extraction_class"] = cls
+    out["extraction_text"] = "" if e.get("extraction_text") is None else str(e.get("extraction_text"))
+    attrs = e.get("attributes")
+    if not isinstance(attrs, dict):
+        if attrs is not None:
+            issues.append(f"{cls}: attributes is not an object")
+        attrs = {}
+    attrs = dict(attrs)
+    ci = e.get("char_interval")
+    if ci is not None:
+        try:
+            s, t = int(ci["start_pos"]), int(ci["end_pos"])
+            if not 0 <= s <= t <= len(text):
+                raise ValueError
+            ci = {"start_pos": s, "end_pos": t}
+        except (KeyError, TypeError, ValueError):
+            issues.append(f"{cls}: invalid char_interval {ci!r}")
+            ci = None
+    out["char_interval"] = ci
+    if cls == "Cause":
+        raw = attrs.get("code")
+        code = canonical_code(raw)
+        if raw is not None and code is None:
+            issues.append(f"Cause: unknown code {raw!r}")
+        elif code is not None:
+            if attrs.get("category") not in (None, CODE_CATEGORIES[code]):
+                issues.append(f"Cause: category {attrs.get('category')!r} does not match code {code}")
+            attrs["code"], attrs["category"] = code, CODE_CATEGORIES[code]
+    out["attributes"] = attrs
+    return out
+
+def normalize_record(doc):
+    """Record with normalized Extractions, Primary_Cause and Schema_Version (new dict)."""
+    doc = dict(doc)
+    text = str(doc.get("text") or "")
+    issues = []
+    exts = [normalize_extraction(e, text, issues) for e in doc.get("Extractions") or []]
+    doc["Extractions"] = [e for e in exts if e is not None]
+    doc["Primary_Cause"] = primary_cause(doc["Extractions"])
+    doc["Schema_Version"] = SCHEMA_VERSION
+    if issues:
+        doc["Schema_Issues"] = issues
+    else:
+        doc.pop("Schema_Issues", None)
+    return doc
+
+def is_normalized(doc):
+    return (doc or {}).get("Schema_Version") == SCHEMA_VERSION
+
+def ensure_normalized(doc):
+    return doc if is_normalized(doc) else normalize_record(doc)
+
+def primary_cause_of(doc):
+    """Stored Primary_Cause of a normalized record, computed for older ones."""
+    return ensure_normalized(doc).get("Primary_Cause")
+
+def main():
+    ap = argparse.ArgumentParser(description="Validate / normalize an extraction JSONL against the schema.")
+    ap.add_argument("jsonl")
+    ap.add_argument("--write", action="store_true", help="rewrite the file with normalized records")
+    args = ap.parse_args()
+
+    docs, changed, issues = [], 0, {}
+    with open(args.jsonl, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            doc = json.loads(line)
+            norm = normalize_record(doc)
+            changed += norm != doc
+            for msg in norm.get("Schema_Issues", []):
+                key = re.sub(r"'[^']*'|\{.*\}|\b(?:MA|MI|CF|NA)[-\w]*$", "…", msg)
+                issues[key] = issues.get(key, 0) + 1
+            docs.append(norm)
+    print(f"{len(docs)} records, {changed} changed by normalization")
+    for k, n in sorted(issues.items(), key=lambda x: -x[1]):
+        print(f"  {n:5d}  {k}")
+    if args.write:
+        tmp = args.jsonl + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for doc in docs:
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+        os.replace(tmp, args.jsonl)
+        print(f"Wrote {args.jsonl}")
+
+if __name__ == "__main__":
+    main()
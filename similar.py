@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# similar.py
+"""
+"Find similar LERs": a local TF-IDF index over each record's abstract plus
+its extracted Condition / Cause / Outcome spans (and a `cause-<code>` token
+per Cause code), CPU only.
+
+The weighting is text_index.TfidfIndex; the index is stored as a
+document-term CSR matrix in `<jsonl>.sim.npz` and rebuilt when the JSONL's
+size or mtime changes. Queries are approximate nearest-neighbour in two steps:
+candidates are scored from the `max_terms` heaviest query terms, each reading
+only its `max_postings` highest-weighted postings (impact order), then the
+best candidates are re-ranked by their exact cosine similarity.
+
+  python similar.py build extracted_text.jsonl --k 5          # -> .sim.npz + <jsonl>.similar.json
+  python similar.py query extracted_text.jsonl "loss of offsite power, diesel generator failed to start"
+  python similar.py ler extracted_text.jsonl 0252023001R00
+"""
+import argparse, json, os, time
+
+# NumPy is loaded by the functions that build / query the index, not at import
+
+from doc_loader import DocStore
+from text_index import TfidfIndex
+
+INDEX_SUFFIX = ".sim.npz"
+NEIGHBORS_SUFFIX = ".similar.json"
+SPAN_CLASSES = ("Condition", "Cause", "Outcome")
+
+def document_text(doc):
+    """Abstract + Condition/Cause/Outcome spans + cause-<code> tokens."""
+    parts = [doc.get("text") or ""]
+    for e in doc.get("Extractions") or []:
+        if (e or {}).get("extraction_class") not in SPAN_CLASSES:
+            continue
+        parts.append(str(e.get("extraction_text") or ""))
+        code = (e.get("attributes") or {}).get("code")
+        if e.get("extraction_class") == "Cause" and code:
+            parts.append(f"cause-{code}")
+    return "\n".join(parts)
+
+def _stat_signature(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+def _signature(path):
+    import numpy as np
+    return np.array(_stat_signature(path), dtype=np.int64)
+
+class SimilarityIndex:
+    def __init__(self, lers, titles, terms, idf, indptr, indices, data, postings=None, max_terms=32, max_postings=5000):
+        import numpy as np
+        self.lers = [str(x) for x in lers]
+        self.titles = [str(x) for x in titles]
+        self.terms = {t: i for i, t in enumerate(terms)}
+        self.weigher = TfidfIndex()
+        self.weigher.idf = {t: float(w) for t, w in zip(terms, idf)}
+        self.indptr, self.indices, self.data = indptr, indices, data
+        self.max_terms = max_terms
+        self.max_postings = max_postings
+        self.pos = {l: i for i, l in enumerate(self.lers)}
+        self._dense = np.zeros(len(terms), dtype=np.float32)
+        # term -> postings in impact order (CSC sorted by descending weight inside each term)
+        if postings is None:
+            order = np.lexsort((-data, indices))
+            postings = (np.repeat(np.arange(len(lers), dtype=np.int32), np.diff(indptr))[order], data[order],
+                        np.concatenate([[0], np.cumsum(np.bincount(indices, minlength=len(terms)))]))
+        self.post_docs, self.post_w, self.post_ptr = postings
+
+    def __len__(self):
+        return len(self.lers)
+
+    @classmethod
+    def build(cls, docs, **kw):
+        """docs: iterable of JSONL records."""
+        import numpy as np
+        lers, titles, texts = [], [], []
+        for doc in docs:
+            lers.append(str(doc.get("ler") or doc.get("LER") or len(lers)))
+            titles.append(str(doc.get("Title") or ""))
+            texts.append(document_text(doc))
+        tf = TfidfIndex(texts)
+        terms = sorted(tf.idf)
+        tid = {t: i for i, t in enumerate(terms)}
+        indptr = np.zeros(len(texts) + 1, dtype=np.int64)
+        indices, data = [], []
+        for i, vec in enumerate(tf.vectors):
+            items = sorted((tid[t], w) for t, w in vec.items())
+            indices.extend(j for j, _ in items)
+            data.extend(w for _, w in items)
+            indptr[i + 1] = len(indices)
+        return cls(lers, titles, terms, np.array([tf.idf[t] for t in terms], dtype=np.float32), indptr,
+                   np.array(indices, dtype=np.int32), np.array(data, dtype=np.float32), **kw)
+
+    @classmethod
+    def for_jsonl(cls, jsonl_path, rebuild=False, **kw):
+        """Index of a JSONL file, loaded from `<jsonl>.sim.npz` while the file is unchanged."""
+        import numpy as np
+        path = str(jsonl_path) + INDEX_SUFFIX
+        sig = _signature(jsonl_path)
+        if not rebuild and os.path.exists(path):
+            try:
+                z = np.load(path, allow_pickle=False)
+                if np.array_equal(z["signature"], sig):
+                    return cls(z["lers"], z["titles"], z["terms"], z["idf"], z["indptr"], z["indices"], z["data"],
+                               (z["post_docs"], z["post_w"], z["post_ptr"]), **kw)
+            except Exception:
+                pass
+        with DocStore(jsonl_path) as store:
+            index = cls.build(store.iter_docs(["ler", "Title", "text", "Extractions"]), **kw)
+        try:
+            index.save(path, sig)
+        except OSError:
+            pass  # read-only location: keep the in-memory index
+        return index
+
+    def save(self, path, signature):
+        import numpy as np
+        terms = sorted(self.terms, key=self.terms.get)
+        with open(path, "wb") as f:
+            np.savez_compressed(f, signature=signature, lers=np.array(self.lers, dtype=str),
+                                titles=np.array(self.titles, dtype=str), terms=np.array(terms, dtype=str),
+                                idf=np.array([self.weigher.idf[t] for t in terms], dtype=np.float32),
+                                indptr=self.indptr, indices=self.indices, data=self.data,
+                                post_docs=self.post_docs, post_w=self.post_w, post_ptr=self.post_ptr)
+
+    def _row(self, i):
+        a, b = self.indptr[i], self.indptr[i + 1]
+        return self.indices[a:b], self.data[a:b]
+
+    def vector(self, text):
+        import numpy as np
+        vec = self.weigher.transform(text)
+        ids = np.array([self.terms[t] for t in vec], dtype=np.int32)
+        return ids, np.array(list(vec.values()), dtype=np.float32)
+
+    def _search(self, ids, weights, k, exclude=None):
+        import numpy as np
+        if not len(ids) or not len(self.lers):
+            return []
+        top = np.argsort(-weights, kind="stable")[: self.max_terms]
+        docs, contrib = [], []
+        for j, qw in zip(ids[top], weights[top]):
+            a = self.post_ptr[j]
+            b = min(self.post_ptr[j + 1], a + self.max_postings)
+            docs.append(self.post_docs[a:b])
+            contrib.append(self.post_w[a:b] * qw)
+        acc = np.bincount(np.concatenate(docs), np.concatenate(contrib), minlength=len(self.lers))
+        if exclude is not None:
+            acc[exclude] = 0.0
+        n_cand = min(len(acc), max(50, 5 * k))
+        cand = np.argpartition(-acc, n_cand - 1)[:n_cand] if n_cand < len(acc) else np.arange(len(acc))
+        cand = cand[acc[cand] > 0]
+        if not len(cand):
+            return []
+        # exact cosine of the candidates
+        self._dense[ids] = weights
+        starts, lens = self.indptr[cand], np.diff(self.indptr)[cand]
+        seg = np.repeat(np.arange(len(cand)), lens)
+        at = np.arange(lens.sum()) - np.repeat(np.cumsum(lens) - lens, lens) + np.repeat(starts, lens)
+        exact = np.bincount(seg, self.data[at] * self._dense[self.indices[at]], minlength=len(cand))
+        self._dense[ids] = 0.0
+        best = np.lexsort((cand, -exact))[:k]
+        return [(int(cand[b]), float(exact[b])) for b in best if exact[b] > 0]
+
+    def query(self, text, k=5):
+        """[(ler, title, score)] for free text."""
+        ids, w = self.vector(text)
+        return [(self.lers[i], self.titles[i], s) for i, s in self._search(ids, w, k)]
+
+    def similar_to(self, ler, k=5):
+        i = self.pos[str(ler)]
+        ids, w = self._row(i)
+        return [(self.lers[j], self.titles[j], s) for j, s in self._search(ids, w, k, exclude=i)]
+
+    def all_neighbors(self, k=5):
+        """{ler: [[ler, score], ...]} for every indexed record."""
+        out = {}
+        for i, ler in enumerate(self.lers):
+            ids, w = self._row(i)
+            out[ler] = [[self.lers[j], round(s, 4)] for j, s in self._search(ids, w, k, exclude=i)]
+        return out
+
+def load_neighbors(jsonl_path):
+    """`<jsonl>.similar.json` written by `similar.py build`; {} when absent or the JSONL changed since."""
+    path = str(jsonl_path) + NEIGHBORS_SUFFIX
+    if not os.path.exists(path) or not os.path.exists(jsonl_path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("signature") != _stat_signature(jsonl_path):
+        return {}
+    return data.get("neighbors", {})
+
+def main():
+    ap = argparse.ArgumentParser(description="Local similar-LER index (TF-IDF, CPU only).")
+    ap.add_argument("command", choices=["build", "query", "ler"])
+    ap.add_argument("jsonl", nargs="?", default="extracted_text.jsonl")
+    ap.add_argument("q", nargs="?", default=None, help="query text (query) or LER number (ler)")
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--rebuild", action="store_true")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    index = SimilarityIndex.for_jsonl(args.jsonl, rebuild=args.rebuild)
+    t1 = time.perf_counter()
+    if args.command == "build":
+        neighbors = index.all_neighbors(args.k)
+        with open(args.jsonl + NEIGHBORS_SUFFIX, "w", encoding="utf-8") as f:
+            json.dump({"k": args.k, "signature": _stat_signature(args.jsonl), "neighbors": neighbors}, f,
+                      ensure_ascii=False)
+        print(f"{len(index)} LERs, {len(index.terms)} terms: index {t1 - t0:.2f}s, "
+              f"neighbors {time.perf_counter() - t1:.2f}s -> {args.jsonl + NEIGHBORS_SUFFIX}")
+        return
+    if not args.q:
+        ap.error("missing query text / LER number")
+    if args.command == "ler" and args.q not in index.pos:
+        ap.error(f"LER {args.q} is not in {args.jsonl}")
+    hits = index.query(args.q, args.k) if args.command == "query" else index.similar_to(args.q, args.k)
+    t2 = time.perf_counter()
+    for ler, title, score in hits:
+        print(f"{score:.3f}  {ler}  {title}")
+    print(f"({(t2 - t1) * 1000:.1f} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# span_align.py
+"""
+Validates and repairs `char_interval` of extractions against the document text.
+
+For every extraction `text[start:end]` must equal `extraction_text`. When it
+does not (or the interval is missing), the span is re-located:
+
+  1. exact / case-insensitive occurrences of all extraction texts of the
+     document, found in one pass with an Aho-Corasick automaton; the one
+     closest to the original start wins,
+  2. otherwise a fuzzy search (difflib) within FUZZY_WINDOW chars of the
+     original start (the whole text when there is none).
+
+Each extraction gets `alignment_status` (match_exact, match_relocated,
+match_lesser = case-insensitive, match_fuzzy, unaligned) and per-LER quality
+metrics are collected. Records are aligned once when written
+(extraction_core.combine_row); 02_vis.py only aligns older records that carry
+no `alignment_status`, and `--write` repairs such a file in place.
+
+  python span_align.py extracted_text.jsonl -o extracted_text.aligned.jsonl --metrics alignment_metrics.csv
+  python span_align.py extracted_text.jsonl --write
+"""
+import argparse, csv, difflib, json, os
+from collections import deque
+
+from doc_loader import DocStore
+
+FUZZY_MIN_RATIO = 0.8
+FUZZY_WINDOW = 200   # chars searched on either side of the original span
+STATUSES = ["match_exact", "match_relocated", "match_lesser", "match_fuzzy", "unaligned"]
+
+class AhoCorasick:
+    """Multi-pattern exact matcher; `find_all` is linear in text length + matches."""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        self.patterns = list(patterns)
+        for pid, pat in enumerate(self.patterns):
+            if not pat:
+                continue
+            node = 0
+            for ch in pat:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = nxt
+            self.out[node].append(pid)
+        # breadth-first failure links
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                cand = self.goto[f].get(ch, 0)
+                self.fail[nxt] = cand if cand != nxt else 0
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def find_all(self, text):
+        """{pattern id: [start positions]}"""
+        hits = {}
+        node = 0
+        goto, fail, out, pats = self.goto, self.fail, self.out, self.patterns
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for pid in out[node]:
+                hits.setdefault(pid, []).append(i - len(pats[pid]) + 1)
+        return hits
+
+def _pos(ci, key):
+    """Integer position of a char_interval, None when missing / null."""
+    v = (ci or {}).get(key)
+    return int(v) if v is not None else None
+
+def _closest(positions, hint):
+    if hint is None:
+        return positions[0]
+    return min(positions, key=lambda p: (abs(p - hint), p))
+
+def _fuzzy_locate(text, pat, hint=None, min_ratio=0.0, window=FUZZY_WINDOW):
+    """
+    Best window of len(pat) around the longest common block; (start, end, ratio) or None.
+    With a start hint only `window` chars on either side of the original span are searched;
+    candidates whose quick_ratio() cannot reach min_ratio / the best so far are skipped.
+    """
+    if not pat or not text:
+        return None
+    n = len(pat)
+    lo, hi = 0, len(text)
+    if hint is not None and 0 <= hint <= len(text):
+        lo, hi = max(0, hint - window), min(len(text), hint + n + window)
+    sm = difflib.SequenceMatcher(None, autojunk=False)
+    sm.set_seq2(pat)   # pat is indexed once; only the text side changes below
+    sm.set_seq1(text[lo:hi])
+    m = sm.find_longest_match(0, hi - lo, 0, n)
+    if m.size == 0:
+        return None
+    # candidates nearest the anchor first, so the floor rises early; ties keep the scan
+    # order of (distance to the hint, delta, length)
+    anchor = lo + m.a - m.b
+    spread = max(3, n // 10)
+    best, best_key = None, None
+    for delta in sorted(range(-spread, spread + 1), key=abs):
+        s = max(0, anchor + delta)
+        for k, length in enumerate((n - 1, n, n + 1)):
+            t = min(len(text), s + length)
+            sm.set_seq1(text[s:t])
+            floor = min_ratio if best is None else max(min_ratio, best[2])
+            if sm.real_quick_ratio() < floor or sm.quick_ratio() < floor:
+                continue
+            r = sm.ratio()
+            key = (abs(s - hint) if hint is not None else 0, delta, k)
+            if best is None or r > best[2] or (r == best[2] and key < best_key):
+                best, best_key = (s, t, r), key
+    return best
+
+def align_document(doc, fuzzy_min_ratio=FUZZY_MIN_RATIO):
+    """
+    Returns (aligned extractions, metrics dict). The input doc is not modified.
+    """
+    text = doc.get("text") or ""
+    exts = [dict(e or {}) for e in doc.get("Extractions") or []]
+    counts = {s: 0 for s in STATUSES}
+    counts["missing_interval"] = 0
+    fuzzy_ratios = []
+
+    pending = []
+    for k, e in enumerate(exts):
+        ci = e.get("char_interval")
+        pat = e.get("extraction_text") or ""
+        if not ci:
+            counts["missing_interval"] += 1
+        else:
+            # langextract writes {"start_pos": null, ...} for spans it could not locate
+            s, t = _pos(ci, "start_pos"), _pos(ci, "end_pos")
+            if s is not None and t is not None and 0 <= s <= t <= len(text) and pat and text[s:t] == pat:
+                e["char_interval"] = {"start_pos": s, "end_pos": t}
+                e["alignment_status"] = "match_exact"
+                counts["match_exact"] += 1
+                continue
+        pending.append(k)
+
+    if pending:
+        pats = [exts[k].get("extraction_text") or "" for k in pending]
+        exact_hits = AhoCorasick(pats).find_all(text)
+        lower_hits = None
+        for j, k in enumerate(pending):
+            e, pat = exts[k], pats[j]
+            hint = _pos(e.get("char_interval"), "start_pos")
+            status, span = "unaligned", None
+            if j in exact_hits:
+                p = _closest(exact_hits[j], hint)
+                status, span = "match_relocated", (p, p + len(pat))
+            else:
+                if lower_hits is None:
+                    lower_hits = AhoCorasick([p.lower() for p in pats]).find_all(text.lower())
+                if j in lower_hits:
+                    p = _closest(lower_hits[j], hint)
+                    status, span = "match_lesser", (p, p + len(pat))
+                else:
+                    fz = _fuzzy_locate(text, pat, hint, fuzzy_min_ratio)
+                    if fz and fz[2] >= fuzzy_min_ratio:
+                        status, span = "match_fuzzy", (fz[0], fz[1])
+                        fuzzy_ratios.append(fz[2])
+            e["char_interval"] = {"start_pos": span[0], "end_pos": span[1]} if span else None
+            e["alignment_status"] = status
+            counts[status] += 1
+
+    total = len(exts)
+    aligned = total - counts["unaligned"]
+    metrics = {
+        "ler": doc.get("ler") or doc.get("LER"),
+        "extractions": total,
+        **counts,
+        "aligned_ratio": round(aligned / total, 4) if total else 1.0,
+        "exact_ratio": round(counts["match_exact"] / total, 4) if total else 1.0,
+        "mean_fuzzy_ratio": round(sum(fuzzy_ratios) / len(fuzzy_ratios), 4) if fuzzy_ratios else None,
+    }
+    return exts, metrics
+
+def is_aligned(doc):
+    """True when every extraction already carries a stored alignment_status."""
+    return all("alignment_status" in (e or {}) for e in doc.get("Extractions") or [])
+
+def main():
+    ap = argparse.ArgumentParser(description="Validate / repair char_interval of extractions.")
+    ap.add_argument("input", nargs="?", default="extracted_text.jsonl")
+    ap.add_argument("-o", "--output", default=None, help="aligned JSONL (기본: <input>.aligned.jsonl)")
+    ap.add_argument("--metrics", default="alignment_metrics.csv", help="per-LER alignment metrics CSV")
+    ap.add_argument("--fuzzy-min-ratio", type=float, default=FUZZY_MIN_RATIO)
+    ap.add_argument("--write", action="store_true", help="rewrite the input with the aligned records")
+    args = ap.parse_args()
+
+    if args.write:
+        output = args.input + ".tmp"
+    else:
+        output = args.output or (args.input[:-6] if args.input.endswith(".jsonl") else args.input) + ".aligned.jsonl"
+    rows, totals = [], {s: 0 for s in STATUSES + ["missing_interval", "extractions"]}
+    with DocStore(args.input) as store, open(output, "w", encoding="utf-8") as out:
+        for doc in store.iter_docs():
+            exts, m = align_document(doc, args.fuzzy_min_ratio)
+            doc = dict(doc)
+            doc["Extractions"] = exts
+            out.write(json.dumps(doc, ensure_ascii=False) + "\n")
+            rows.append(m)
+            for k in totals:
+                totals[k] += m[k]
+
+    if args.write:
+        os.replace(output, args.input)
+        output = args.input
+
+    with open(args.metrics, "w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else ["ler"])
+        w.writeheader()
+        w.writerows(rows)
+
+    n = max(1, totals["extractions"])
+    print(f"Wrote {len(rows)} documents -> {output}; metrics -> {args.metrics}")
+    print("Alignment:", {k: f"{v} ({v / n:.1%})" for k, v in totals.items() if k != "extractions"})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# span_index.py
+"""
+Span index over the located extractions (`char_interval`) of an
+extracted_*.jsonl file, for "which spans cover offset x / overlap [a, b) /
+are closest" questions without scanning every extraction.
+
+All spans of the corpus live in flat arrays (CSR by document, as in
+compact_corpus.py). Inside a document they are sorted by start and carry the
+running maximum of their ends, which makes the sorted arrays an interval index:
+
+    stabbing  x       spans with start <= x are a prefix (binary search on start),
+                      spans with running max end <= x a prefix too (binary search
+                      on maxend); only the candidates in between are checked
+    overlap   [a, b)  the same with start < b / maxend <= a
+    nearest   [a, b)  smallest character gap, optionally of one class
+
+Each span also records the sentence (text_index.sentence_spans) it starts in.
+The arrays are stored in `<jsonl>.spans.npz` and rebuilt when the JSONL's size
+or mtime changes. `pairs` / `cooccurrence` join the spans of two classes (or
+all classes) across the whole corpus in one vectorized pass, e.g. Conditions
+within 100 characters of a Human_Action, or in the same sentence.
+
+  python span_index.py build extracted_text.jsonl
+  python span_index.py at extracted_text.jsonl 0252023001R00 120
+  python span_index.py overlap extracted_text.jsonl 0252023001R00 100 200
+  python span_index.py nearest extracted_text.jsonl 0252023001R00 120 --cls Cause
+  python span_index.py cooccur extracted_text.jsonl Condition Human_Action --within 100
+  python span_index.py cooccur extracted_text.jsonl --sentence          # documents per class pair
+"""
+import argparse, json, os, time
+
+# numpy (and compact_corpus, which needs it) are imported inside the functions,
+# so the CLI's --help does not pay for them
+
+from schema import canonical_class
+from text_index import sentence_spans
+
+INDEX_SUFFIX = ".spans.npz"
+
+def _signature(path):
+    import numpy as np
+    st = os.stat(path)
+    return np.array([st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+def _expand(lo, hi):
+    """Flat positions of the ranges [lo[i], hi[i]) and the i each one belongs to."""
+    import numpy as np
+    cnt = np.maximum(hi - lo, 0)
+    total = int(cnt.sum())
+    owner = np.repeat(np.arange(len(lo)), cnt)
+    return owner, np.repeat(lo, cnt) + np.arange(total) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+
+class SpanIndex:
+    def __init__(self, lers, class_names, doc_ptr, start, end, cls, row, sent):
+        import numpy as np
+        self.lers = [str(x) for x in lers]
+        self.class_names = [str(x) for x in class_names]
+        self.class_ids = {c: i for i, c in enumerate(self.class_names)}
+        self.doc_ptr = np.asarray(doc_ptr, dtype=np.int64)
+        self.start = np.asarray(start, dtype=np.int32)
+        self.end = np.asarray(end, dtype=np.int32)
+        self.cls = np.asarray(cls, dtype=np.int16)
+        self.row = np.asarray(row, dtype=np.int32)      # position in the document's Extractions
+        self.sent = np.asarray(sent, dtype=np.int32)    # sentence the span starts in (-1: none)
+        self.doc = np.repeat(np.arange(len(self.lers)), np.diff(self.doc_ptr))
+        self.pos = {l: i for i, l in enumerate(self.lers)}
+        # running max of end inside each document (documents are offset so the max never crosses them)
+        self.stride = int(self.end.max()) + 1 if len(self.end) else 1
+        base = self.doc * self.stride
+        self.maxend = (np.maximum.accumulate(base + self.end) - base if len(self.end)
+                       else np.zeros(0, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.lers)
+
+    @property
+    def n_spans(self):
+        return len(self.start)
+
+    # ---------------------------
+    # building / persistence
+    # ---------------------------
+    @classmethod
+    def from_corpus(cls, corpus):
+        """Index of a CompactCorpus built with keep_text=True (texts give the sentences)."""
+        import numpy as np
+        a = corpus.numpy()
+        ptr = a["doc_ptr"]
+        doc, start, end = a["doc"], a["start"].astype(np.int64), a["end"].astype(np.int64)
+        row = np.arange(len(doc)) - ptr[doc]
+        names, raw_to_id = [], []
+        for name in corpus.class_names:
+            c = canonical_class(name) or name
+            if c not in names:
+                names.append(c)
+            raw_to_id.append(names.index(c))
+        ok = (start >= 0) & (end >= start)
+        doc, start, end, row = doc[ok], start[ok], end[ok], row[ok]
+        klass = np.asarray(raw_to_id, dtype=np.int16)[a["cls"][ok]] if names else np.zeros(0, np.int16)
+        order = np.lexsort((end, start, doc))
+        doc, start, end, row, klass = doc[order], start[order], end[order], row[order], klass[order]
+
+        # sentence of each span: the last sentence start <= span start, per document
+        texts = corpus.doc_texts or [""] * len(corpus)
+        sent_starts = [[s for s, _ in sentence_spans(t)] for t in texts]
+        n_sent = np.array([len(s) for s in sent_starts], dtype=np.int64)
+        stride = int(max(end.max() if len(end) else 0, max(map(len, texts), default=0))) + 1
+        sent_key = np.concatenate([np.asarray(s, dtype=np.int64) + i * stride
+                                   for i, s in enumerate(sent_starts)] or [np.zeros(0, np.int64)])
+        k = np.searchsorted(sent_key, doc * stride + start, "right") - 1
+        first = np.concatenate([[0], np.cumsum(n_sent)])[doc]
+        sent = np.where(k >= first, k - first, -1)
+
+        doc_ptr = np.zeros(len(corpus) + 1, dtype=np.int64)
+        doc_ptr[1:] = np.cumsum(np.bincount(doc, minlength=len(corpus)))
+        return cls(corpus.lers, names, doc_ptr, start, end, klass, row, sent)
+
+    @classmethod
+    def for_jsonl(cls, jsonl_path, rebuild=False):
+        """Index of a JSONL file, loaded from `<jsonl>.spans.npz` while the file is unchanged."""
+        import numpy as np
+        path = str(jsonl_path) + INDEX_SUFFIX
+        sig = _signature(jsonl_path)
+        if not rebuild and os.path.exists(path):
+            try:
+                z = np.load(path, allow_pickle=False)
+                if np.array_equal(z["signature"], sig):
+                    return cls(z["lers"], z["class_names"], z["doc_ptr"], z["start"], z["end"],
+                               z["cls"], z["row"], z["sent"])
+            except Exception:
+                pass
+        from compact_corpus import CompactCorpus
+        index = cls.from_corpus(CompactCorpus.from_jsonl(jsonl_path, keep_text=True))
+        try:
+            index.save(path, sig)
+        except OSError:
+            pass  # read-only location: keep the in-memory index
+        return index
+
+    def save(self, path, signature):
+        import numpy as np
+        with open(path, "wb") as f:
+            np.savez_compressed(f, signature=signature, lers=np.array(self.lers, dtype=str),
+                                class_names=np.array(self.class_names, dtype=str), doc_ptr=self.doc_ptr,
+                                start=self.start, end=self.end, cls=self.cls, row=self.row, sent=self.sent)
+
+    # ---------------------------
+    # per-document queries
+    # ---------------------------
+    def _doc(self, ler):
+        i = self.pos[str(ler)]
+        return int(self.doc_ptr[i]), int(self.doc_ptr[i + 1])
+
+    def _spans(self, idx):
+        return [(int(self.start[k]), int(self.end[k]), self.class_names[self.cls[k]], int(self.row[k]))
+                for k in idx]
+
+    def _range(self, a, b, lo_pos, hi_pos, side):
+        import numpy as np
+        lo = a + int(np.searchsorted(self.maxend[a:b], lo_pos, "right"))
+        hi = a + int(np.searchsorted(self.start[a:b], hi_pos, side))
+        idx = np.arange(lo, max(lo, hi))
+        return idx[self.end[idx] > lo_pos]
+
+    def at(self, ler, x):
+        """(start, end, class, row) of the spans of `ler` covering offset x."""
+        a, b = self._doc(ler)
+        return self._spans(self._range(a, b, x, x, "right"))
+
+    def overlap(self, ler, start, end):
+        """(start, end, class, row) of the spans of `ler` intersecting [start, end)."""
+        a, b = self._doc(ler)
+        if end <= start:
+            return self.at(ler, start)
+        return self._spans(self._range(a, b, start, end, "left"))
+
+    def nearest(self, ler, start, end=None, cls=None, k=1, exclude_row=None):
+        """(gap, start, end, class, row) of the k spans closest to [start, end) (gap 0 = overlap)."""
+        import numpy as np
+        a, b = self._doc(ler)
+        end = start if end is None else end
+        idx = np.arange(a, b)
+        if cls is not None:
+            idx = idx[self.cls[idx] == self.class_ids.get(canonical_class(cls) or cls, -1)]
+        if exclude_row is not None:
+            idx = idx[self.row[idx] != exclude_row]
+        gap = np.maximum(0, np.maximum(self.start[idx] - end, start - self.end[idx]))
+        best = np.lexsort((self.start[idx], gap))[:k]
+        return [(int(gap[j]), *s) for j, s in zip(best, self._spans(idx[best]))]
+
+    # ---------------------------
+    # corpus-wide
+    # ---------------------------
+    def _class_sel(self, name):
+        import numpy as np
+        if name is None:
+            return np.arange(self.n_spans)
+        return np.flatnonzero(self.cls == self.class_ids.get(canonical_class(name) or name, -1))
+
+    def pairs(self, a=None, b=None, within=None, same_sentence=False):
+        """
+        (ia, ib, gap) for every pair of a class-`a` and a class-`b` span (None: any
+        class) of the same document whose character gap is <= `within` (None: any)
+        and, with same_sentence=True, that start in the same sentence. A span is
+        not paired with itself.
+        """
+        import numpy as np
+        sa, sb = self._class_sel(a), self._class_sel(b)
+        if not len(sa) or not len(sb):
+            return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0, np.int64)
+        w = -1 if within is None else int(within)
+        stride = self.stride + 2 * max(w, 0) + 1
+        base_b = self.doc[sb] * stride + max(w, 0)
+        key_b = base_b + self.start[sb]
+        if w < 0:
+            # whole document
+            lo = np.searchsorted(key_b, self.doc[sa] * stride, "left")
+            hi = np.searchsorted(key_b, (self.doc[sa] + 1) * stride, "left")
+        else:
+            # b spans start <= a.end + w (sorted start) and end >= a.start - w (running max end)
+            maxend_b = np.maximum.accumulate(base_b + self.end[sb])
+            base_a = self.doc[sa] * stride + w
+            lo = np.searchsorted(maxend_b, base_a + self.start[sa] - w, "left")
+            hi = np.searchsorted(key_b, base_a + self.end[sa] + w, "right")
+        owner, at = _expand(lo, hi)
+        ia, ib = sa[owner], sb[at]
+        gap = np.maximum(0, np.maximum(self.start[ib] - self.end[ia], self.start[ia] - self.end[ib])).astype(np.int64)
+        keep = ia != ib
+        if w >= 0:
+            keep &= gap <= w
+        if same_sentence:
+            keep &= (self.sent[ia] == self.sent[ib]) & (self.sent[ia] >= 0)
+        return ia[keep], ib[keep], gap[keep]
+
+    def cooccurrence(self, a, b, within=None, same_sentence=False):
+        """Documents / spans of class `a` with a class-`b` partner under the `pairs` conditions."""
+        import numpy as np
+        ia, ib, gap = self.pairs(a, b, within, same_sentence)
+        sa, sb = self._class_sel(a), self._class_sel(b)
+        docs_a, docs_b = np.unique(self.doc[sa]), np.unique(self.doc[sb])
+        docs_pair = np.unique(self.doc[ia])
+        return {
+            "a": a, "b": b, "within": within, "same_sentence": same_sentence,
+            "pairs": int(len(ia)),
+            "spans_a": int(len(sa)),
+            "spans_a_with_partner": int(len(np.unique(ia))),
+            "docs_with_both": int(len(np.intersect1d(docs_a, docs_b, assume_unique=True))),
+            "docs_with_pair": int(len(docs_pair)),
+            "median_gap": float(np.median(gap)) if len(gap) else None,
+        }
+
+    def cooccurrence_matrix(self, within=None, same_sentence=False):
+        """{class a: {class b: documents with a pair}} for all class pairs in one pass."""
+        import numpy as np
+        ia, ib, _ = self.pairs(None, None, within, same_sentence)
+        n = len(self.class_names)
+        key = np.unique((self.doc[ia] * n + self.cls[ia]) * n + self.cls[ib])
+        counts = np.bincount(key % (n * n), minlength=n * n).reshape(n, n)
+        return {ca: {cb: int(counts[i, j]) for j, cb in enumerate(self.class_names)}
+                for i, ca in enumerate(self.class_names)}
+
+def _print_spans(spans):
+    for s in spans:
+        print("  ".join(str(v) for v in s))
+    if not spans:
+        print("(none)")
+
+def main():
+    ap = argparse.ArgumentParser(description="Span index over char_interval (stabbing / overlap / nearest / co-occurrence).")
+    ap.add_argument("command", choices=["build", "at", "overlap", "nearest", "cooccur"])
+    ap.add_argument("jsonl", nargs="?", default="extracted_text.jsonl")
+    ap.add_argument("args", nargs="*", help="LER and offset(s) (at / overlap / nearest), two classes (cooccur)")
+    ap.add_argument("--cls", default=None, help="nearest: only spans of this class")
+    ap.add_argument("--k", type=int, default=3)
+    ap.add_argument("--within", type=int, default=None, help="cooccur: max character gap (기본: 문서 전체)")
+    ap.add_argument("--sentence", action="store_true", help="cooccur: same sentence only")
+    ap.add_argument("--json", action="store_true")
+    ap.add_argument("--rebuild", action="store_true")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    index = SpanIndex.for_jsonl(args.jsonl, rebuild=args.rebuild or args.command == "build")
+    t1 = time.perf_counter()
+    if args.command == "build":
+        print(f"{len(index)} LERs, {index.n_spans} located spans, {len(index.class_names)} classes: "
+              f"{t1 - t0:.2f}s -> {args.jsonl + INDEX_SUFFIX}")
+        return
+    if args.command == "cooccur":
+        if len(args.args) not in (0, 2):
+            ap.error("cooccur takes two classes or none (all class pairs)")
+        if args.args:
+            out = index.cooccurrence(*args.args, within=args.within, same_sentence=args.sentence)
+        else:
+            out = index.cooccurrence_matrix(within=args.within, same_sentence=args.sentence)
+        t2 = time.perf_counter()
+        if args.json or args.args:
+            print(json.dumps(out, ensure_ascii=False, indent=2))
+        else:
+            names = index.class_names
+            print("documents with a pair (row within / same sentence as column)")
+            print(" " * 24 + "".join(f"{n[:10]:>11}" for n in names))
+            for a in names:
+                print(f"{a:<24}" + "".join(f"{out[a][b]:>11}" for b in names))
+        print(f"({(t2 - t1) * 1000:.1f} ms)")
+        return
+
+    if len(args.args) < 2:
+        ap.error(f"{args.command} needs an LER and an offset")
+    ler, nums = args.args[0], [int(v) for v in args.args[1:3]]
+    if ler not in index.pos:
+        ap.error(f"LER {ler} is not in {args.jsonl}")
+    if args.command == "at":
+        spans = index.at(ler, nums[0])
+    elif args.command == "overlap":
+        spans = index.overlap(ler, nums[0], nums[1] if len(nums) > 1 else nums[0] + 1)
+    else:
+        spans = index.nearest(ler, nums[0], nums[1] if len(nums) > 1 else None, cls=args.cls, k=args.k)
+    t2 = time.perf_counter()
+    _print_spans(spans)
+    print(f"({(t2 - t1) * 1000:.2f} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# system_resolver.py
+"""
+Compiled lookup of EIIS system codes -> (system category, base code).
+
+`system_codes.json` is compiled once into a single key table (codes and
+aliases, upper-case) and pickled next to the JSON as `<json>.resolver.pkl`;
+the pickle is reused while the JSON's content hash is unchanged.
+
+Resolution order per distinct value:
+    exact   code or alias (case-insensitive, as the old analyze.py mapping)
+    ocr     after OCR repair (digits read as letters, stray punctuation/space)
+    prefix  longest known code that the value starts with (e.g. "SJX" -> "SJ")
+    fuzzy   closest known code (difflib, same length +-1)
+    unknown
+The ocr / prefix / fuzzy steps only run with fuzzy=True (analyze.py --system-fuzzy),
+so the default System_Category values do not change.
+
+`resolve(series)` resolves each distinct value once and returns the category
+and base-code arrays for the whole column in one call.
+"""
+import difflib, hashlib, json, os, pickle, re
+
+import numpy as np
+import pandas as pd
+
+CACHE_SUFFIX = ".resolver.pkl"
+CACHE_VERSION = 1
+OCR_DIGITS = str.maketrans({"0": "O", "1": "I", "5": "S", "8": "B", "6": "G", "2": "Z"})
+FUZZY_CUTOFF = 0.75
+
+class SystemResolver:
+    def __init__(self, table, fuzzy=False):
+        self.table = table                         # KEY -> (category, base code)
+        self.codes = sorted({base for _, base in table.values()}, key=lambda c: (-len(c), c))
+        self.fuzzy = fuzzy
+        self._memo = {}
+
+    @classmethod
+    def compile(cls, data, fuzzy=False):
+        table = {}
+        for s in data.get("systems", []):
+            code = (s.get("code") or "").upper()
+            if not code:
+                continue
+            table[code] = (s.get("category", "unknown"), code)
+        # aliases never shadow a real code (later systems win)
+        real = set(table)
+        for s in data.get("systems", []):
+            code = (s.get("code") or "").upper()
+            if not code:
+                continue
+            for a in s.get("aliases") or []:
+                if a.upper() not in real:
+                    table[a.upper()] = table[code]
+        return cls(table, fuzzy)
+
+    @classmethod
+    def from_json(cls, path, fuzzy=False, cache=True):
+        with open(path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        cache_path = str(path) + CACHE_SUFFIX
+        if cache and os.path.exists(cache_path):
+            try:
+                with open(cache_path, "rb") as f:
+                    blob = pickle.load(f)
+                if blob.get("version") == CACHE_VERSION and blob.get("digest") == digest:
+                    return cls(blob["table"], fuzzy)
+            except Exception:
+                pass
+        resolver = cls.compile(json.loads(raw.decode("utf-8")), fuzzy)
+        if cache:
+            try:
+                with open(cache_path, "wb") as f:
+                    pickle.dump({"version": CACHE_VERSION, "digest": digest, "table": resolver.table}, f,
+                                protocol=pickle.HIGHEST_PROTOCOL)
+            except OSError:
+                pass
+        return resolver
+
+    def resolve_one(self, value):
+        """(category, base code or None, method)"""
+        if not isinstance(value, str) or not value.strip():
+            return "unknown", None, "missing"
+        hit = self._memo.get(value)
+        if hit is not None:
+            return hit
+        key = value.strip().upper() if self.fuzzy else value.upper()
+        out = None
+        if key in self.table:
+            out = (*self.table[key], "exact")
+        if out is None and self.fuzzy:
+            repaired = re.sub(r"[^A-Z]", "", key.translate(OCR_DIGITS))
+            if repaired and repaired in self.table:
+                out = (*self.table[repaired], "ocr")
+        if out is None and self.fuzzy:
+            for code in self.codes:          # longest first
+                if len(code) >= 2 and repaired.startswith(code):
+                    out = (*self.table[code], "prefix")
+                    break
+            if out is None and len(repaired) >= 2:
+                cands = [c for c in self.codes if abs(len(c) - len(repaired)) <= 1]
+                close = difflib.get_close_matches(repaired, cands, n=1, cutoff=FUZZY_CUTOFF)
+                if close:
+                    out = (*self.table[close[0]], "fuzzy")
+        if out is None:
+            out = ("unknown", None, "unknown")
+        self._memo[value] = out
+        return out
+
+    def resolve(self, series, with_method=False):
+        """Vectorized: (categories, base codes[, methods]) as object arrays aligned with `series`."""
+        s = pd.Series(series, dtype=object)
+        codes, uniq = pd.factorize(s, use_na_sentinel=True)
+        resolved = [self.resolve_one(v) for v in uniq] + [("unknown", None, "missing")]
+        cats = np.array([r[0] for r in resolved], dtype=object)[codes]
+        bases = np.array([r[1] for r in resolved], dtype=object)[codes]
+        if with_method:
+            return cats, bases, np.array([r[2] for r in resolved], dtype=object)[codes]
+        return cats, bases
@@ -0,0 +1,152 @@
+# telemetry.py
+"""
+Per-call instrumentation for the extraction scripts.
+
+Each model call becomes one JSON line in `<dir>/<run_name>_calls.jsonl`
+(wall time, retries, prompt/response sizes, number of extractions and
+failure class). The scripts call the model one abstract at a time, so there
+is no queue to measure; queue wait is reported by extract_service.py's
+/stats.
+
+`finish()` writes a Prometheus text-format file and a summary JSON
+(p50/p95/p99 latency, throughput, error rate) and prints it.
+"""
+import json, os, time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+def failure_class(exc):
+    """Coarse failure bucket used for error-rate breakdowns."""
+    if exc is None:
+        return None
+    msg = f"{type(exc).__name__} {exc}".lower()
+    if "timeout" in msg or "timed out" in msg or "deadline" in msg:
+        return "timeout"
+    if "429" in msg or ("rate" in msg and "limit" in msg) or "quota" in msg or "resource_exhausted" in msg:
+        return "rate_limit"
+    if "401" in msg or "403" in msg or "api key" in msg or "permission" in msg:
+        return "auth"
+    if "json" in msg or "parse" in msg or "decode" in msg:
+        return "parse"
+    if "connection" in msg or "unavailable" in msg or "503" in msg or "500" in msg:
+        return "server"
+    return "other"
+
+class ExtractionTelemetry:
+    def __init__(self, outdir="metrics", run_name="extraction"):
+        self.outdir = Path(outdir)
+        self.outdir.mkdir(parents=True, exist_ok=True)
+        self.run_name = run_name
+        self.calls_path = self.outdir / f"{run_name}_calls.jsonl"
+        self._fh = open(self.calls_path, "w", encoding="utf-8")
+        self.records = []
+        self.started = time.time()
+
+    @contextmanager
+    def call(self, key, prompt_chars=0, prompt_tokens=0, **extra):
+        """
+        Times one extraction (including retries). The body fills in
+        `rec["response_chars"]`, `rec["extractions"]` and `rec["retries"]`.
+        """
+        t0 = time.perf_counter()
+        rec = {
+            "key": key,
+            "ts": time.time(),
+            "prompt_chars": prompt_chars,
+            "prompt_tokens_est": prompt_tokens,
+            "response_chars": 0,
+            "extractions": 0,
+            "retries": 0,
+            "status": "ok",
+            "failure_class": None,
+            **extra,
+        }
+        try:
+            yield rec
+        except Exception as e:
+            rec["status"] = "error"
+            rec["failure_class"] = failure_class(e)
+            rec["error"] = str(e)[:300]
+            raise
+        finally:
+            rec["wall_s"] = round(time.perf_counter() - t0, 6)
+            self.records.append(rec)
+            self._fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self._fh.flush()
+
+    def summary(self):
+        recs = self.records
+        elapsed = max(time.time() - self.started, 1e-9)
+        lat = np.array([r["wall_s"] for r in recs], dtype=float)
+        errors = [r for r in recs if r["status"] != "ok"]
+        by_class = {}
+        for r in errors:
+            by_class[r["failure_class"]] = by_class.get(r["failure_class"], 0) + 1
+        pct = (lambda q: round(float(np.percentile(lat, q)), 4)) if len(lat) else (lambda q: None)
+        return {
+            "calls": len(recs),
+            "errors": len(errors),
+            "error_rate": round(len(errors) / len(recs), 4) if recs else 0.0,
+            "errors_by_class": by_class,
+            "retries": int(sum(r["retries"] for r in recs)),
+            "latency_p50_s": pct(50),
+            "latency_p95_s": pct(95),
+            "latency_p99_s": pct(99),
+            "latency_mean_s": round(float(lat.mean()), 4) if len(lat) else None,
+            "throughput_per_min": round(len(recs) / elapsed * 60.0, 3),
+            "elapsed_s": round(elapsed, 3),
+            "prompt_tokens_est_total": int(sum(r["prompt_tokens_est"] for r in recs)),
+            "prompt_chars_total": int(sum(r["prompt_chars"] for r in recs)),
+            "response_chars_total": int(sum(r["response_chars"] for r in recs)),
+            "extractions_total": int(sum(r["extractions"] for r in recs)),
+        }
+
+    def write_prometheus(self, path, summary):
+        name = "visler_" + self.run_name.replace("-", "_")
+        lines = [
+            f"# HELP {name}_calls_total Extraction calls.",
+            f"# TYPE {name}_calls_total counter",
+            f'{name}_calls_total{{status="ok"}} {summary["calls"] - summary["errors"]}',
+        ]
+        for cls, n in sorted(summary["errors_by_class"].items(), key=lambda x: str(x[0])):
+            lines.append(f'{name}_calls_total{{status="error",failure_class="{cls}"}} {n}')
+        lines += [
+            f"# HELP {name}_retries_total Retries across all calls.",
+            f"# TYPE {name}_retries_total counter",
+            f"{name}_retries_total {summary['retries']}",
+            f"# HELP {name}_latency_seconds Wall time per call.",
+            f"# TYPE {name}_latency_seconds summary",
+        ]
+        for q, key in ((0.5, "latency_p50_s"), (0.95, "latency_p95_s"), (0.99, "latency_p99_s")):
+            if summary[key] is not None:
+                lines.append(f'{name}_latency_seconds{{quantile="{q}"}} {summary[key]}')
+        lines += [
+            f"{name}_latency_seconds_sum {round(sum(r['wall_s'] for r in self.records), 6)}",
+            f"{name}_latency_seconds_count {summary['calls']}",
+        ]
+        for metric, key, help_ in (
+            ("prompt_tokens_estimated_total", "prompt_tokens_est_total", "Estimated prompt tokens."),
+            ("prompt_chars_total", "prompt_chars_total", "Prompt characters sent."),
+            ("response_chars_total", "response_chars_total", "Serialized response characters."),
+            ("extractions_total", "extractions_total", "Extractions returned."),
+        ):
+            lines += [f"# HELP {name}_{metric} {help_}", f"# TYPE {name}_{metric} counter",
+                      f"{name}_{metric} {summary[key]}"]
+        Path(path).write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    def finish(self):
+        self._fh.close()
+        summary = self.summary()
+        self.write_prometheus(self.outdir / f"{self.run_name}.prom", summary)
+        (self.outdir / f"{self.run_name}_summary.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+        print(f"\n[Telemetry] {summary['calls']} calls, error rate {summary['error_rate']:.1%}, "
+              f"latency p50/p95/p99 = {summary['latency_p50_s']}/{summary['latency_p95_s']}/{summary['latency_p99_s']} s, "
+              f"{summary['throughput_per_min']} calls/min, ~{summary['prompt_tokens_est_total']:,} prompt tokens")
+        print(f"[Telemetry] metrics written to '{self.outdir}'")
+        return summary
+
+def from_env(run_name):
+    """Telemetry writer configured by TELEMETRY_DIR (default: metrics)."""
+    return ExtractionTelemetry(os.getenv("TELEMETRY_DIR", "metrics"), run_name)
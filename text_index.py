@@ -0,0 +1,76 @@
+# text_index.py
+"""
+Small sparse TF-IDF index (no scikit-learn needed).
+
+Documents are tokenized into lowercase words, weighted with sublinear tf and
+smoothed idf, L2-normalized, and stored as an inverted index so a cosine query
+only touches the postings of its own terms.
+"""
+import math, re
+from collections import Counter, defaultdict
+
+_TOKEN = re.compile(r"[a-z][a-z0-9\-]+|\d+")
+STOPWORDS = {
+    "the", "and", "was", "were", "for", "with", "this", "that", "from", "are", "has",
+    "had", "have", "been", "which", "during", "due", "not", "its", "into", "per",
+    "event", "unit", "plant", "reportable", "under", "cfr",
+}
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(str(text or "").lower()) if t not in STOPWORDS]
+
+# a sentence ends at "." / ";" followed by a capital / "(" / quote or the end of the text
+# ("50.73(a)" is not a sentence end); written as an unrolled loop, ~3x faster than `.*?` + lookahead
+_SENTENCE = re.compile(r"\S[^.;]*(?:[.;](?!\s+[A-Z(\"]|\s*$)[^.;]*)*(?:[.;]|$)")
+
+def sentence_spans(text):
+    """(start, end) of each sentence, trailing whitespace excluded."""
+    return [(m.start(), m.start() + len(m.group(0).rstrip())) for m in _SENTENCE.finditer(text)]
+
+class TfidfIndex:
+    def __init__(self, texts=(), min_df=1):
+        self.min_df = min_df
+        self.idf = {}
+        self.vectors = []                    # list of {term: weight}
+        self.postings = defaultdict(list)    # term -> [(doc, weight)]
+        if texts:
+            self.fit(texts)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def fit(self, texts):
+        tfs = [Counter(tokenize(t)) for t in texts]
+        df = Counter(term for tf in tfs for term in tf)
+        n = len(tfs)
+        self.idf = {t: math.log((1 + n) / (1 + c)) + 1.0 for t, c in df.items() if c >= self.min_df}
+        self.vectors, self.postings = [], defaultdict(list)
+        for i, tf in enumerate(tfs):
+            vec = self._weigh(tf)
+            self.vectors.append(vec)
+            for term, w in vec.items():
+                self.postings[term].append((i, w))
+        return self
+
+    def _weigh(self, tf):
+        vec = {t: (1.0 + math.log(c)) * self.idf[t] for t, c in tf.items() if t in self.idf}
+        norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+        return {t: w / norm for t, w in vec.items()}
+
+    def transform(self, text):
+        return self._weigh(Counter(tokenize(text)))
+
+    def scores(self, text_or_vec):
+        """Cosine similarity of the query against every indexed document."""
+        q = self.transform(text_or_vec) if isinstance(text_or_vec, str) else text_or_vec
+        acc = defaultdict(float)
+        for term, qw in q.items():
+            for doc, w in self.postings.get(term, ()):
+                acc[doc] += qw * w
+        return acc
+
+    def top_k(self, text_or_vec, k=5, exclude=None):
+        acc = self.scores(text_or_vec)
+        if exclude is not None:
+            acc.pop(exclude, None)
+        return sorted(acc.items(), key=lambda x: (-x[1], x[0]))[:k]
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# visler.py
+"""
+Single command-line entry point for the VisLER scripts.
+
+Only the standard library is imported at startup; each subcommand imports its
+module when it runs, so `--help` and small commands (one LER, one chart) do not
+load pandas / NumPy / matplotlib / langextract.
+
+  python visler.py --help
+  python visler.py extract --variant keyword                # 01_run_keyword.py
+  python visler.py graph --input extracted_text.jsonl       # build_graph.py
+  python visler.py vis extracted_text.jsonl --site site/    # 02_vis.py
+  python visler.py analyze --outdir ./out_extracted_code
+  python visler.py chart cat_counts                         # redraw one PNG from analyze.py's CSVs
+  python visler.py ler 0252023001R00                        # title, facility, primary Cause, classes
+  python visler.py <command> --help                         # options of the underlying script
+"""
+import argparse, importlib, json, os, runpy, sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+# command -> (module, help); module.main() gets the remaining arguments
+MODULES = {
+    "analyze": ("analyze", "merged tables, plots and statistics (out_extracted_code/)"),
+    "compare": ("compare_variants", "compare the text and keyword extractions"),
+    "similar": ("similar", "similar-LER index: build / query / ler"),
+    "spans": ("span_index", "span index: stabbing / overlap / nearest / co-occurrence"),
+    "schema": ("schema", "validate / normalize an extraction JSONL"),
+    "cascade": ("cascade", "cross-validate the cascade's Cause-code classifier"),
+    "rules": ("rule_extract", "rule-based Operating_Mode / Power_Level report"),
+    "align": ("span_align", "validate / repair char_interval of extractions"),
+    "profile": ("profiling", "show / compare / trend stage profiles"),
+    "service": ("extract_service", "extraction service: serve / fake-model"),
+    "watch": ("watch", "incrementally process newly arrived LERs"),
+    "bench": ("benchmark", "offline pipeline benchmark"),
+    "cube": ("cause_cube", "query the pre-aggregated cause cube"),
+    "dedup": ("dedup", "near-duplicate LER clusters of an abstract CSV"),
+    "examples": ("example_select", "few-shot example selection tools"),
+    "codec": ("graph_codec", "compact graph encoding report"),
+}
+# command -> (script, help); run as __main__ with the remaining arguments
+SCRIPTS = {
+    "vis": ("02_vis.py", "HTML viewer or sharded static site"),
+    "pipeline": ("preprocessing/pipeline.py", "merge -> preprocess -> filter"),
+    "cf": ("preprocessing/extract_component_failure.py", "component failure records from LER texts"),
+}
+EXTRACT_SCRIPTS = {"text": "01_run.py", "keyword": "01_run_keyword.py"}
+
+def _argv(command, argv):
+    sys.argv = [f"{Path(sys.argv[0]).name} {command}", *argv]
+
+def run_module(command, argv):
+    _argv(command, argv)
+    rc = importlib.import_module(MODULES[command][0]).main()
+    return rc if isinstance(rc, int) else 0
+
+def run_script(path, command, argv):
+    path = ROOT / path
+    sys.path.insert(0, str(path.parent))
+    _argv(command, argv)
+    runpy.run_path(str(path), run_name="__main__")
+    return 0
+
+def cmd_extract(args):
+    return run_script(EXTRACT_SCRIPTS[args.variant], "extract", [])
+
+def cmd_graph(args):
+    # build_graph.py reads its paths from the environment at import
+    for key, value in (("EXTRACTED_JSONL_PATH", args.input), ("GRAPH_SCHEMA_PATH", args.schema),
+                       ("GRAPH_OUTPUT_PATH", args.output)):
+        if value:
+            os.environ[key] = value
+    import build_graph
+    build_graph.main()
+    return 0
+
+def cmd_ler(args):
+    from doc_loader import DocStore
+    from schema import canonical_class, primary_cause_of
+    if not os.path.exists(args.jsonl):
+        print(f"Error: {args.jsonl} not found.")
+        return 1
+    with DocStore(args.jsonl) as store:
+        doc = store.get(args.ler)
+    if doc is None:
+        print(f"{args.ler}: not in {args.jsonl}")
+        return 1
+    classes = {}
+    for e in doc.get("Extractions") or []:
+        cls = canonical_class(e.get("extraction_class")) or e.get("extraction_class")
+        classes[cls] = classes.get(cls, 0) + 1
+    info = {
+        "ler": doc.get("ler"),
+        "title": doc.get("Title"),
+        "facility": doc.get("Facility_Name"),
+        "unit": doc.get("Unit"),
+        "event_date": doc.get("Event_Date"),
+        "primary_cause": primary_cause_of(doc),
+        "classes": classes,
+    }
+    if args.json:
+        print(json.dumps(info, ensure_ascii=False, indent=2))
+        return 0
+    cause = info["primary_cause"] or {}
+    print(f"{info['ler']}  {info['title']}")
+    print(f"  facility: {info['facility']} (unit {info['unit']}), event date {info['event_date']}")
+    print(f"  primary cause: {cause.get('code') or '-'} {cause.get('category') or ''}  {cause.get('text') or ''}".rstrip())
+    print("  classes: " + (", ".join(f"{c}={n}" for c, n in classes.items()) or "-"))
+    return 0
+
+def cmd_chart(args):
+    from analyze import redraw_chart
+    try:
+        print(redraw_chart(args.name, args.outdir))
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+def build_parser():
+    ap = argparse.ArgumentParser(prog=Path(sys.argv[0]).name, description="VisLER command-line tools.",
+                                 epilog="`<command> --help` shows the options of the underlying script.")
+    sub = ap.add_subparsers(dest="command", metavar="<command>")
+
+    p = sub.add_parser("extract", help="run the model extraction (01_run.py / 01_run_keyword.py)")
+    p.add_argument("--variant", choices=list(EXTRACT_SCRIPTS), default="text")
+    p.set_defaults(func=cmd_extract)
+
+    p = sub.add_parser("graph", help="per-document graphs (build_graph.py)")
+    p.add_argument("--input", help="extraction JSONL (기본: EXTRACTED_JSONL_PATH)")
+    p.add_argument("--schema", help="graph schema (기본: GRAPH_SCHEMA_PATH)")
+    p.add_argument("--output", help="graph JSON (기본: GRAPH_OUTPUT_PATH)")
+    p.set_defaults(func=cmd_graph)
+
+    p = sub.add_parser("ler", help="summary of one LER from an extraction JSONL")
+    p.add_argument("ler")
+    p.add_argument("--jsonl", default="extracted_text.jsonl")
+    p.add_argument("--json", action="store_true", help="print JSON")
+    p.set_defaults(func=cmd_ler)
+
+    p = sub.add_parser("chart", help="redraw one analyze.py chart from its CSVs")
+    p.add_argument("name", help="chart (PNG) name, e.g. cat_counts")
+    p.add_argument("--outdir", default="./out_extracted_code")
+    p.set_defaults(func=cmd_chart)
+
+    # listed for --help only; dispatched in main() before parsing
+    for name, (_, text) in {**SCRIPTS, **MODULES}.items():
+        sub.add_parser(name, help=text, add_help=False)
+    return ap
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in MODULES:
+        return run_module(argv[0], argv[1:])
+    if argv and argv[0] in SCRIPTS:
+        return run_script(SCRIPTS[argv[0]][0], argv[0], argv[1:])
+    ap = build_parser()
+    args = ap.parse_args(argv)
+    if args.command is None:
+        ap.print_help()
+        return 0
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
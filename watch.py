@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# watch.py
+"""
+Watch mode: pushes newly arrived LERs through every stage incrementally.
+
+Polls (every --interval seconds)
+  - the LER text folder (`*.txt`, one file per LER) -> component failure
+    record (extract_component_failure.extract_one + clean_record),
+  - the merged CSV(s) -> rows whose `File Name` has not been seen yet go
+    through preprocess_df / filter_df and are extracted,
+
+and then updates, only for the LERs that changed,
+  - component_failure.json / .cleaned.json (upsert by `ler`),
+  - the extraction JSONL (appended),
+  - the graph JSON (new graphs appended),
+  - index.html (rendered documents are cached; only new ones are rendered),
+  - out_extracted_code: merged_metadata_with_extracted.csv, cube.npz and
+    cat_monthly_counts.csv (the touched LERs' rows are replaced and the cube
+    is adjusted by their difference).
+The full analyze.py run (bootstraps, plots) is refreshed every --analyze-every seconds.
+
+  python watch.py --texts data/ler_texts --merged preprocessing/01_merged.csv
+  python watch.py --service http://127.0.0.1:8100 --once      # one pass, extraction via extract_service.py
+"""
+import argparse, glob, importlib, json, os, subprocess, sys, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT / "preprocessing"))
+
+# pandas / NumPy and the stage modules are imported by the methods that use them,
+# so `--help` and an idle start stay cheap
+from doc_loader import iter_jsonl
+from extraction_core import VARIANTS
+
+STATE_NAME = ".watch_state.json"
+
+def file_signature(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+def write_atomic(path, data):
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    mode = "wb" if isinstance(data, bytes) else "w"
+    with open(tmp, mode, **({} if mode == "wb" else {"encoding": "utf-8"})) as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def make_backend(args):
+    """callable(text, ler) -> extraction dicts"""
+    from extract_service import HttpBackend, LangextractBackend, ServiceBackend
+    if args.service:
+        return ServiceBackend(args.service)
+    from example_select import ExampleSelector
+    from extraction_core import MODEL_ID, load_examples
+    from rule_extract import apply_rules, with_rules
+    variant = VARIANTS[args.variant]
+    examples, _ = load_examples(args.examples or variant["examples"])
+    prompt, examples = apply_rules(variant["prompt"], examples)
+    selector = ExampleSelector(examples, k=int(os.getenv("EXAMPLE_TOP_K", "0")),
+                               token_budget=int(os.getenv("PROMPT_TOKEN_BUDGET", "0")) or None,
+                               prompt_description=prompt)
+    if args.backend == "langextract":
+        backend = LangextractBackend(prompt, selector, MODEL_ID)
+    else:
+        backend = HttpBackend(args.backend, prompt, selector)
+    backend = with_rules(backend)
+    return lambda text, ler=None: backend(text)
+
+class Watcher:
+    def __init__(self, args):
+        self.args = args
+        self.state_path = Path(args.state)
+        self.state = json.loads(self.state_path.read_text(encoding="utf-8")) if self.state_path.exists() else {}
+        self.state.setdefault("files", {})
+        self.state.setdefault("rows_seen", [])
+        self.rows_seen = set(self.state["rows_seen"])
+        from build_graph import load_schema
+        from system_resolver import SystemResolver
+        self.backend = None
+        self.vis = importlib.import_module("02_vis")
+
+        self.jsonl = Path(args.jsonl or VARIANTS[args.variant]["output"])
+        self.docs = list(iter_jsonl(self.jsonl)) if self.jsonl.exists() else []
+        self.lers = {d.get("ler") for d in self.docs}
+        self.cf_raw = self._load_json_list(args.cf_raw)
+        self.cf = {r["ler"]: r for r in self._load_json_list(args.cf) if r.get("ler")}
+
+        self.schema = load_schema(args.schema) if os.path.exists(args.schema) else None
+        self.graphs = self._load_json_list(args.graph) if self.schema else []
+        self.graph_index = self.vis.load_graph_index(args.vis_graph)
+        self.fragments, self.neighbors = None, None
+
+        self.outdir = Path(args.outdir)
+        self.resolver = SystemResolver.from_json(args.sys, fuzzy=args.system_fuzzy) if os.path.exists(args.sys) else None
+        self.merged, self.cube = None, None
+        self.last_analyze = time.time() if args.analyze_every else None
+
+    @staticmethod
+    def _load_json_list(path):
+        if not path or not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_state(self):
+        self.state["rows_seen"] = sorted(self.rows_seen)
+        write_atomic(self.state_path, json.dumps(self.state))
+
+    # ---------------- detection ----------------
+    def changed_files(self, paths):
+        out = []
+        for p in paths:
+            sig = file_signature(p)
+            if self.state["files"].get(str(p)) != sig:
+                out.append((p, sig))
+        return out
+
+    def poll(self):
+        texts = sorted(Path(self.args.texts).glob("*.txt")) if self.args.texts and os.path.isdir(self.args.texts) else []
+        merged = sorted({Path(p) for pat in self.args.merged for p in glob.glob(pat)})
+        return self.changed_files(texts), self.changed_files(merged)
+
+    # ---------------- stages ----------------
+    def update_component_failures(self, text_files):
+        from extract_component_failure import clean_record, extract_one
+        touched = set()
+        raw = {r.get("ler"): r for r in self.cf_raw}
+        for p, sig in text_files:
+            rec = extract_one(p.read_text(encoding="utf-8", errors="ignore"))
+            self.state["files"][str(p)] = sig
+            if not rec:
+                print(f"[Watch] no component failure line in {p.name}")
+                continue
+            rec = {"ler": p.stem, **rec}
+            raw[p.stem] = rec
+            self.cf[p.stem] = clean_record(rec)
+            touched.add(p.stem)
+        if touched:
+            self.cf_raw = list(raw.values())
+            write_atomic(self.args.cf_raw, json.dumps(self.cf_raw, ensure_ascii=False, indent=2))
+            write_atomic(self.args.cf, json.dumps(list(self.cf.values()), ensure_ascii=False, indent=2))
+        return touched
+
+    def new_rows(self, merged_files):
+        import pandas as pd
+        from filter import filter_df
+        from preprocessing import preprocess_df
+        frames = []
+        for p, sig in merged_files:
+            df = pd.read_csv(p)
+            fresh = ~df["File Name"].astype(str).isin(self.rows_seen | self.lers)
+            if fresh.any():
+                frames.append(df[fresh])
+        if not frames:
+            return None
+        df = pd.concat(frames, ignore_index=True).drop_duplicates("File Name", keep="last")
+        self.rows_seen.update(df["File Name"].astype(str))
+        return filter_df(preprocess_df(df))
+
+    def extract_rows(self, rows):
+        import pandas as pd
+        from extraction_core import combine_row
+        if self.backend is None:
+            self.backend = make_backend(self.args)
+        new_docs = []
+        for _, row in rows.iterrows():
+            text = "" if pd.isna(row["abstract"]) else str(row["abstract"])
+            try:
+                exts = self.backend(text, str(row["file_name"]))
+            except Exception as e:
+                print(f"[Watch] extraction failed for {row['file_name']}: {e}")
+                exts = []
+            new_docs.append(combine_row(row, exts))
+        with open(self.jsonl, "a", encoding="utf-8") as f:
+            for doc in new_docs:
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+        first = len(self.docs)
+        self.docs.extend(new_docs)
+        self.lers.update(d["ler"] for d in new_docs)
+        return first
+
+    def update_graph(self, first):
+        if not self.schema:
+            return
+        from build_graph import build_graph_for_doc
+        for idx in range(min(first, len(self.graphs)), len(self.docs)):   # catch up when the file lags behind
+            doc = self.docs[idx]
+            ler, graph = doc.get("ler") or f"doc_{idx}", build_graph_for_doc(doc, self.schema, idx)
+            self.graphs.append({"ler": ler, "graph": graph})
+            if graph.get("nodes"):       # the viewer shows the schema graph, not the fallback
+                self.graph_index[str(ler)] = graph
+        write_atomic(self.args.graph, json.dumps(self.graphs, ensure_ascii=False, indent=2))
+
+    def update_viewer(self, first):
+        from similar import load_neighbors
+        neighbors = load_neighbors(self.jsonl)   # similar.py build; re-render everything when it changes
+        if neighbors != self.neighbors:
+            self.neighbors, self.fragments = neighbors, None
+        if self.fragments is None:       # first update: render the existing documents once
+            first = 0
+            self.fragments = []
+        titles = {str(d.get("ler")): d.get("Title") for d in self.docs} if neighbors else {}
+        href = lambda n: f"#ler-{n}" if n in titles else None
+        for idx in range(first, len(self.docs)):
+            doc = self.docs[idx]
+            self.fragments.append(self.vis.render_document(
+                doc, idx, self.graph_index, similar=self.vis.neighbor_list(doc.get("ler"), neighbors, titles, href)))
+        dashboard = self.vis.dashboard_html(str(self.outdir / "dashboard.json"))   # from the last full analyze.py run
+        write_atomic(self.args.html, self.vis.assemble_page(self.fragments, dashboard))
+
+    def _merged_rows(self, lers):
+        import pandas as pd
+        from analyze import (CORPUS_FIELDS, META_FIELDS, extract_cause_from_corpus, merge_tables,
+                             tidy_dates, to_df_jsonl_meta)
+        from compact_corpus import CompactCorpus
+        cf = pd.DataFrame([self.cf[l] for l in lers if l in self.cf])
+        if cf.empty:
+            return pd.DataFrame()
+        docs = [d for d in self.docs if d.get("ler") in lers]
+        corpus = CompactCorpus.from_docs(docs, meta_fields=CORPUS_FIELDS)
+        meta = tidy_dates(to_df_jsonl_meta(corpus.meta) if docs else pd.DataFrame(columns=META_FIELDS))
+        _, primary = extract_cause_from_corpus(corpus)
+        return merge_tables(cf, meta, primary, self.resolver)
+
+    def update_analysis(self, touched):
+        if self.resolver is None:
+            return
+        import pandas as pd
+        from cause_cube import CauseCube
+        self.outdir.mkdir(parents=True, exist_ok=True)
+        if self.merged is None:          # first update: one full merge, later only the touched LERs
+            self.merged = self._merged_rows(set(self.cf))
+            self.cube = CauseCube.from_frame(self.merged)
+        else:
+            old = self.merged[self.merged["ler"].isin(touched)]
+            new = self._merged_rows(touched)
+            if not old.empty:
+                self.cube = self.cube.merge(CauseCube.from_frame(old), sign=-1)
+            if not new.empty:
+                self.cube = self.cube.merge(CauseCube.from_frame(new))
+            self.merged = pd.concat([self.merged[~self.merged["ler"].isin(touched)], new], ignore_index=True)
+        self.merged.to_csv(self.outdir / "merged_metadata_with_extracted.csv", index=False)
+        self.cube.save(self.outdir / "cube.npz")
+        if "Extracted_Cause_Category" in self.cube.dims and "Event_YYYYMM" in self.cube.dims:
+            self.cube.rollup(["Event_YYYYMM", "Extracted_Cause_Category"]) \
+                .to_csv(self.outdir / "cat_monthly_counts.csv", index=False)
+
+    def full_analyze(self):
+        cmd = [sys.executable, str(ROOT / "analyze.py"), "--cf", self.args.cf, "--sys", self.args.sys,
+               "--ler", str(self.jsonl), "--outdir", str(self.outdir)] + (["--system-fuzzy"] if self.args.system_fuzzy else [])
+        subprocess.run(cmd, check=False, env={**os.environ, "MPLBACKEND": "Agg"})
+        self.last_analyze = time.time()
+
+    # ---------------- loop ----------------
+    def cycle(self):
+        t0 = time.perf_counter()
+        text_files, merged_files = self.poll()
+        touched = self.update_component_failures(text_files)
+        rows = self.new_rows(merged_files)
+        first = len(self.docs)
+        if rows is not None and len(rows):
+            first = self.extract_rows(rows)
+            touched.update(d["ler"] for d in self.docs[first:])
+        for p, sig in merged_files:
+            self.state["files"][str(p)] = sig
+        if len(self.docs) > first or (self.fragments is None and touched):
+            self.update_graph(first)
+            self.update_viewer(first)
+        if touched:
+            self.update_analysis(touched)
+            print(f"[Watch] {len(touched)} LER(s) updated ({len(self.docs) - first} extracted) "
+                  f"in {time.perf_counter() - t0:.2f}s")
+        if self.last_analyze and time.time() - self.last_analyze >= self.args.analyze_every and touched:
+            self.full_analyze()
+        self._save_state()
+        return touched
+
+    def run(self):
+        print(f"[Watch] {len(self.docs)} documents in {self.jsonl}; polling every {self.args.interval}s")
+        while True:
+            try:
+                self.cycle()
+            except KeyboardInterrupt:
+                raise
+            except Exception as e:
+                print(f"[Watch] cycle failed: {type(e).__name__}: {e}")
+            time.sleep(self.args.interval)
+
+def main():
+    ap = argparse.ArgumentParser(description="Incrementally process newly arrived LERs.")
+    ap.add_argument("--texts", default="data/ler_texts", help="LER text folder (*.txt)")
+    ap.add_argument("--merged", nargs="*", default=["preprocessing/01_merged.csv"], help="merged CSV path(s)/globs")
+    ap.add_argument("--cf-raw", default="preprocessing/component_failure.json")
+    ap.add_argument("--cf", default="preprocessing/component_failure.cleaned.json")
+    ap.add_argument("--variant", choices=list(VARIANTS), default="text")
+    ap.add_argument("--jsonl", default=None, help="extraction JSONL (default: the variant's output)")
+    ap.add_argument("--examples", default=None)
+    ap.add_argument("--backend", default="langextract", help="`langextract` or a model endpoint URL")
+    ap.add_argument("--service", default=None, help="URL of a running extract_service.py (overrides --backend)")
+    ap.add_argument("--schema", default=os.environ.get("GRAPH_SCHEMA_PATH", "data/graph_schema.json"))
+    ap.add_argument("--graph", default=os.environ.get("GRAPH_OUTPUT_PATH", "graph_text.json"))
+    ap.add_argument("--vis-graph", default="graph.json", help="graph JSON read by the viewer (as 02_vis.py)")
+    ap.add_argument("--html", default="index.html")
+    ap.add_argument("--sys", default="./data/system_codes.json")
+    ap.add_argument("--system-fuzzy", action="store_true", help="as analyze.py --system-fuzzy")
+    ap.add_argument("--outdir", default="./out_extracted_code")
+    ap.add_argument("--analyze-every", type=float, default=600, help="seconds between full analyze.py runs (0: never)")
+    ap.add_argument("--interval", type=float, default=5.0)
+    ap.add_argument("--state", default=STATE_NAME)
+    ap.add_argument("--once", action="store_true", help="process what is new and exit")
+    args = ap.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    watcher = Watcher(args)
+    if args.once:
+        watcher.cycle()
+        return
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        print("[Watch] stopped")
+
+if __name__ == "__main__":
+    main()